@@ -0,0 +1,60 @@
+"""
+Comparing the ansible runner profiles on a local SSH stand-in.
+
+The inventory is made of N aliases of the local host (so every alias is a separate ansible host
+with its own SSH connections) and the playbook runs a few trivial tasks on all of them, like the
+many short tasks of `pre_install`. Requires a local sshd that accepts the configured private key:
+
+    WORKSPACE=/tmp/ws python benchmarks/bench_ansible_profiles.py --hosts 30 --user $USER
+"""
+import os
+import time
+import logging
+import argparse
+import tempfile
+
+from openshift_pool.playbooks import run_ansible_playbook, RunnerProfile
+
+
+PLAYBOOK = """---
+- hosts: nodes
+  gather_facts: false
+  strategy: "{{ runner_strategy | default('linear') }}"
+  tasks:
+%s
+"""
+TASK = """    - name: "Task %d"
+      command: "true"
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hosts', type=int, default=30, help='The number of local host aliases')
+    parser.add_argument('--tasks', type=int, default=10, help='The number of tasks in the playbook')
+    parser.add_argument('--user', default=os.environ.get('USER', 'root'), help='The SSH user')
+    parser.add_argument('--port', type=int, default=22, help='The local sshd port')
+    parser.add_argument('--profiles', default=','.join(RunnerProfile.BUILTIN_PROFILES.keys()))
+    args = parser.parse_args()
+
+    logger = logging.getLogger('bench_ansible_profiles')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        inventory_path = os.path.join(tmp_dir, 'inventory')
+        with open(inventory_path, 'w') as f:
+            f.write('[nodes]\n')
+            for i in range(args.hosts):
+                f.write(f'node-{i} ansible_host=127.0.0.1 ansible_port={args.port}\n')
+        playbook_path = os.path.join(tmp_dir, 'bench.yaml')
+        with open(playbook_path, 'w') as f:
+            f.write(PLAYBOOK % ''.join(TASK % i for i in range(args.tasks)))
+
+        print(f'hosts={args.hosts}; tasks={args.tasks}')
+        for profile in args.profiles.split(','):
+            start = time.monotonic()
+            result = run_ansible_playbook(playbook_path, inventory_path, logger, profile=profile,
+                                          options=dict(remote_user=args.user, become=False, verbosity=0))
+            print(f'{profile:>10}: {time.monotonic() - start:7.2f}s (rc={result})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Measuring the encoding of large documents (e.g. per-host probe results and per-phase timings):
+the codec of the DB (cached type dispatch, iterative) against the recursive isinstance based encoder
+that it replaced, and the decoding back to the python types.
+
+    WORKSPACE=/tmp/ws python benchmarks/bench_codec.py --hosts 2000 --runs 5
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openshift_pool.common import NodeType  # noqa: E402
+from openshift_pool.db import CODEC  # noqa: E402
+from openshift_pool.instrumentation import Span  # noqa: E402
+
+
+def legacy_encode(node):
+    """The recursive encoder that DB.bson_encode used to be"""
+    if isinstance(node, dict):
+        return {key: legacy_encode(value) for key, value in node.items()}
+    elif isinstance(node, (list, tuple)):
+        return [legacy_encode(item) for item in node]
+    elif isinstance(node, CODEC.native_types):
+        return node
+    return str(node)
+
+
+def large_document(hosts):
+    now = datetime.now()
+    return {
+        'name': 'cluster-a',
+        'created_at': now,
+        'hosts': {
+            f'host-{i}.example.com': {
+                'node_type': list(NodeType)[i % 3],
+                'probes': [{'check': check, 'ok': True, 'latency': 0.01 * i, 'at': now,
+                            'timeout': timedelta(seconds=30)} for check in ('ssh', 'dns', 'docker', 'origin-node')],
+                'facts': {'cpus': 4, 'memory_mb': 16384, 'disks': ['/dev/vda', '/dev/vdb']},
+            } for i in range(hosts)
+        },
+        'phases': [Span('cluster-a', f'phase-{i}', now, 1.5, None) for i in range(hosts // 10)],
+    }
+
+
+def measure(func, document, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func(document)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hosts', type=int, default=2000, help='The number of hosts in the document')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    document = large_document(args.hosts)
+    encoded = CODEC.encode(document)
+    print(f'legacy encode: {measure(legacy_encode, document, args.runs):8.2f}ms (rich types stringified)')
+    print(f'codec encode:  {measure(CODEC.encode, document, args.runs):8.2f}ms')
+    print(f'codec decode:  {measure(CODEC.decode, encoded, args.runs):8.2f}ms')
+    assert CODEC.decode(encoded)['hosts']['host-0.example.com']['node_type'] is NodeType.MASTER
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Measuring the logging layer as the number of Loggable objects grows: the time a caller spends on a log call,
+the throughput until the records are written, the open file descriptors and the handlers of the loggers.
+The descriptors and the handlers should stay flat, however many objects are created.
+
+    WORKSPACE=/tmp/ws python benchmarks/bench_logging.py --objects 1 10 100 1000 --records 10000
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openshift_pool.env import LOG_REGISTRY  # noqa: E402
+from openshift_pool.common import Loggable  # noqa: E402
+
+
+class BenchObject(Loggable):
+    pass
+
+
+def open_fds():
+    return len(os.listdir('/proc/self/fd'))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--objects', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--records', type=int, default=10000, help='The number of records per run')
+    parser.add_argument('--clusters', type=int, default=3, help='The number of log files the objects write to')
+    args = parser.parse_args()
+
+    # Only the files are measured
+    LOG_REGISTRY._stream_handler = None
+    workdir = tempfile.mkdtemp()
+    paths = [os.path.join(workdir, f'cluster-{i}.log') for i in range(args.clusters)]
+    fds_before = open_fds()
+    print(f'{"objects":>8} {"call us":>9} {"records/s":>11} {"fds":>5} {"handlers":>9}')
+    for count in args.objects:
+        objects = [BenchObject(paths[i % len(paths)]) for i in range(count)]
+        start = time.perf_counter()
+        for i in range(args.records):
+            objects[i % count].log.info(f'record {i}')
+        called = time.perf_counter() - start
+        LOG_REGISTRY.flush()
+        written = time.perf_counter() - start
+        handlers = sum(len(logging.getLogger(obj.log.name).handlers) for obj in objects[:len(paths)])
+        print(f'{count:>8} {called / args.records * 1e6:>9.2f} {args.records / written:>11.0f} '
+              f'{open_fds() - fds_before:>5} {handlers:>9}')
+
+
+if __name__ == '__main__':
+    main()
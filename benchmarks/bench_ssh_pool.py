@@ -0,0 +1,67 @@
+"""
+Measuring the handshakes that the SSH pool avoids: polling hosts (as the prober and the cluster queries do)
+with a new client per command, as before the pool, against the pooled connections.
+The hosts are local SSH servers that answer every command with the command itself.
+
+    WORKSPACE=/tmp/ws python benchmarks/bench_ssh_pool.py --hosts 4 --polls 20
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import paramiko  # noqa: E402
+
+from openshift_pool.openshift.ssh_pool import SSHConnectionPool  # noqa: E402
+from tests.ssh_server import SSHTestServer  # noqa: E402
+
+
+def fresh_client_command(server, command):
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    try:
+        client.connect('127.0.0.1', port=server.port, username='root', password=server.password,
+                       allow_agent=False, look_for_keys=False)
+        return client.exec_command(command)[1].read()
+    finally:
+        client.close()
+
+
+def run(servers, polls, command):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(len(servers)) as executor:
+        for i in range(polls):
+            list(executor.map(lambda server: command(server, f'oc get nodes # {i}'), servers))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hosts', type=int, default=4)
+    parser.add_argument('--polls', type=int, default=20, help='The number of commands per host')
+    args = parser.parse_args()
+
+    fresh_servers = [SSHTestServer() for _ in range(args.hosts)]
+    fresh = run(fresh_servers, args.polls, fresh_client_command)
+    pool = SSHConnectionPool()
+    pooled_servers = [SSHTestServer() for _ in range(args.hosts)]
+    pooled = run(pooled_servers, args.polls,
+                 lambda server, command: pool.exec_command('127.0.0.1', command, password=server.password,
+                                                           port=server.port))
+    commands = args.hosts * args.polls
+    print(f'{"":<14}{"handshakes":>12}{"total (s)":>12}{"per command (ms)":>18}')
+    print(f'{"fresh clients":<14}{sum(s.handshakes for s in fresh_servers):>12}{fresh:>12.2f}'
+          f'{fresh / commands * 1000:>18.1f}')
+    print(f'{"ssh pool":<14}{sum(s.handshakes for s in pooled_servers):>12}{pooled:>12.2f}'
+          f'{pooled / commands * 1000:>18.1f}')
+    print(f'pool stats: {pool.stats}')
+    pool.close()
+    for server in fresh_servers + pooled_servers:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
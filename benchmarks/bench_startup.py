@@ -0,0 +1,71 @@
+"""
+Measuring the CLI startup: the cumulative import time of `cli` (by `python -X importtime`) and the wall time
+of `cli.py --help`, in fresh processes. Exits with status 1 when the median import time is over the budget,
+or when a heavy dependency is imported on startup (they should be imported by the operations that use them).
+
+    WORKSPACE=/tmp/ws python benchmarks/bench_startup.py --runs 10 --budget-ms 150
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+import statistics
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('ansible', 'heatclient', 'keystoneclient', 'keystoneauth1', 'novaclient', 'glanceclient',
+                 'paramiko', 'pymongo', 'bson', 'yaml', 'jinja2')
+
+
+def import_times(module):
+    """Return the cumulative import time (microseconds) of every module that importing the module imported.
+    The modules that the interpreter imports on startup are not included.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=ROOT_DIR,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    baseline = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'pass'], cwd=ROOT_DIR,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+
+    def parse(output):
+        times = {}
+        for line in output.decode().splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            times[name.strip()] = int(cumulative)
+        return times
+
+    startup_modules = parse(baseline.stderr)
+    return {name: cumulative for name, cumulative in parse(result.stderr).items() if name not in startup_modules}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10, help='The number of processes')
+    parser.add_argument('--budget-ms', type=float, default=150, help='The budget of the cli import time')
+    parser.add_argument('--top', type=int, default=10, help='The number of slowest modules to show')
+    args = parser.parse_args()
+
+    runs = [import_times('cli') for _ in range(args.runs)]
+    cli_import = statistics.median(times['cli'] for times in runs) / 1000
+    help_times = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, 'cli.py', '--help'], cwd=ROOT_DIR, stdout=subprocess.DEVNULL, check=True)
+        help_times.append(time.perf_counter() - start)
+
+    print(f'cli import:  {cli_import:8.2f}ms (median of {args.runs}; budget: {args.budget_ms}ms)')
+    print(f'cli --help:  {statistics.median(help_times) * 1000:8.2f}ms (median of {args.runs})')
+    print(f'slowest modules:')
+    for name, cumulative in sorted(runs[0].items(), key=lambda item: -item[1])[1:args.top + 1]:
+        print(f'  {name:<48}{cumulative / 1000:8.2f}ms')
+    heavy = sorted(name for name in runs[0] if name.split('.')[0] in HEAVY_MODULES)
+    if heavy:
+        print(f'heavy modules imported on startup: {heavy}')
+    if heavy or cli_import > args.budget_ms:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
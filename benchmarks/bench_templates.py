@@ -0,0 +1,73 @@
+"""
+Measuring the cold import time of the templates, and the time to the first `ocp_stack` template, in fresh processes.
+
+    eager:            compiling all the templates on import (the former `templates` module)
+    lazy import:      importing the `templates` module
+    lazy cold cache:  importing and getting `ocp_stack` with an empty bytecode cache
+    lazy warm cache:  importing and getting `ocp_stack` with the bytecode cache of a former process
+
+    python benchmarks/bench_templates.py --runs 20
+"""
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TIMER = 'import time; start = time.perf_counter()\n{code}\nprint(time.perf_counter() - start)'
+EAGER = """
+import glob, os
+from jinja2 import Template
+import openshift_pool.openshift
+templates = {}
+for template_path in glob.glob('openshift_pool/openshift/templates/*.j2'):
+    with open(template_path, 'r') as template:
+        templates[os.path.basename(template_path).split('.')[0]] = Template(template.read())
+templates['ocp_stack']
+"""
+LAZY_IMPORT = 'from openshift_pool.openshift.templates import templates'
+LAZY_FIRST_TEMPLATE = LAZY_IMPORT + '\ntemplates.ocp_stack'
+
+
+def measure(code, runs, env=None, setup=None):
+    timings = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        output = subprocess.check_output([sys.executable, '-c', TIMER.format(code=code)], cwd=ROOT_DIR,
+                                         env=dict(os.environ, **(env or {})))
+        timings.append(float(output.decode().split()[-1]))
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=20, help='The number of processes per scenario')
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp()
+    env = dict(OPENSHIFT_POOL_JINJA_CACHE=cache_dir)
+
+    def clear_cache():
+        shutil.rmtree(cache_dir)
+        os.makedirs(cache_dir)
+
+    try:
+        results = [
+            ('eager', measure(EAGER, args.runs)),
+            ('lazy import', measure(LAZY_IMPORT, args.runs, env)),
+            ('lazy cold cache', measure(LAZY_FIRST_TEMPLATE, args.runs, env, setup=clear_cache)),
+            ('lazy warm cache', measure(LAZY_FIRST_TEMPLATE, args.runs, env)),
+        ]
+    finally:
+        shutil.rmtree(cache_dir)
+    for name, median in results:
+        print(f'{name:>16}: {median * 1000:8.2f}ms (median of {args.runs})')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,22 @@
 import re
+import json
 import argparse
+from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 from openshift_pool.openshift.cluster import OpenshiftClusterBuilder
 from openshift_pool.env import config_workspace_as_cwd
-from openshift_pool.common import NodeType, pgrep, set_proc_name
+from openshift_pool.common import NodeType, set_proc_name
 from openshift_pool.openshift.stack import StackBuilder
+from openshift_pool.openshift.golden_images import GoldenImages
+from openshift_pool.openshift.metadata_store import get_metadata_store
+from openshift_pool.openshift.health import ClusterStatus, CheckResult
+from openshift_pool.exceptions import StackNotFoundException
+from openshift_pool.scheduler import JobScheduler
+from openshift_pool.warm_pool import WarmPool
+from openshift_pool.instrumentation import Tracer, PrometheusTextfileExporter
+from config import CONFIG_DATA
 
 
 config_workspace_as_cwd()
@@ -17,29 +29,243 @@ parser = argparse.ArgumentParser()
 operation_subparser = parser.add_subparsers(dest='operation', help='operation')
 
 create_parser = operation_subparser.add_parser('create', help='Creating a cluster stack without deploy')
-create_parser.add_argument('cluster_name', action='store', help='The name of the cluster')
+create_parser.add_argument('cluster_name', action='store',
+                           help='The name of the cluster (comma separated names for several clusters)')
 create_parser.add_argument('node_types', action='store',
                            help='The type of type nodes, all of them should be master, infra or compute')
 
 deploy_parser = operation_subparser.add_parser('deploy', help='Deploying a cluster')
-deploy_parser.add_argument('cluster_name', action='store', help='The name of the cluster')
+deploy_parser.add_argument('cluster_name', action='store',
+                           help='The name of the cluster (comma separated names for several clusters)')
 deploy_parser.add_argument('node_types', action='store',
                            help='The type of type nodes, all of them should be master, infra or compute')
 deploy_parser.add_argument('version', action='store', help='The openshift version to deploy')
 
 delete_parser = operation_subparser.add_parser('delete', help='Deleting a cluster')
-delete_parser.add_argument('cluster_name', action='store', help='The name of the cluster')
+delete_parser.add_argument('cluster_name', action='store',
+                           help='The name of the cluster (comma separated names for several clusters)')
 delete_parser.add_argument('-f', '--force', dest='force', required=False, action='store_true',
                            help='Force operation without prompt')
 
+stats_parser = operation_subparser.add_parser('stats', help='Showing the durations of the cluster lifecycle phases')
+stats_parser.add_argument('--json', dest='json', required=False, action='store_true',
+                          help='Print the statistics as JSON')
+stats_parser.add_argument('--prometheus', dest='prometheus', required=False, action='store',
+                          help='Write the statistics to a Prometheus textfile (for the node exporter); '
+                               'default: metrics.textfile in the config')
+
+bake_parser = operation_subparser.add_parser('bake', help='Baking golden images (pre-installed instances)')
+bake_parser.add_argument('version', action='store',
+                         help='The openshift version of the image (comma separated versions for several images)')
+
+images_parser = operation_subparser.add_parser('images', help='Showing the golden images')
+images_parser.add_argument('--prune', dest='prune', required=False, action='store_true',
+                           help='Delete the stale images')
+
+list_parser = operation_subparser.add_parser('list', help='Listing the clusters of the pool by their metadata')
+list_parser.add_argument('--owner', dest='owner', required=False, action='store', help='The owner of the clusters')
+list_parser.add_argument('--version', dest='version', required=False, action='store',
+                         help='The openshift version of the clusters')
+list_parser.add_argument('--flavor', dest='flavor', required=False, action='store', help='The flavor of the clusters')
+
+status_parser = operation_subparser.add_parser('status', help='Checking the health of clusters')
+status_parser.add_argument('cluster_name', action='store',
+                           help='The name of the cluster (comma separated names for several clusters)')
+status_parser.add_argument('--checks', dest='checks', required=False, action='store',
+                           help='Comma separated checks to run (default: all)')
+status_parser.add_argument('--refresh', dest='refresh', required=False, action='store_true',
+                           help='Run the checks even if their results are cached')
+status_parser.add_argument('--json', dest='json', required=False, action='store_true',
+                           help='Print the results as json')
+
+warm_parser = operation_subparser.add_parser('warm', help='Building the missing clusters of the warm pool')
+warm_parser.add_argument('--no-wait', dest='no_wait', required=False, action='store_true',
+                         help='Only reclaim the stale builds and show the pool, without building')
+
+claim_parser = operation_subparser.add_parser('claim', help='Claiming a ready cluster from the warm pool')
+claim_parser.add_argument('node_types', action='store',
+                          help='The type of type nodes, all of them should be master, infra or compute')
+claim_parser.add_argument('version', action='store', help='The openshift version of the cluster')
+claim_parser.add_argument('--owner', dest='owner', required=False, action='store', help='The owner of the cluster')
+
+
+def create_stack(cluster_name, node_types):
+    print(f'Creating stack {cluster_name}.')
+    stack = StackBuilder().create(
+        cluster_name, OpenshiftClusterBuilder().gen_node_names(node_types), node_types)
+    print(f'\nStack {cluster_name} has successfully created.')
+    print('-'*50)
+    for node in stack.instances:
+        print(node.fqdn)
+    print('-'*50)
+
+
+def deploy_cluster(cluster_name, node_types, version):
+    cluster = OpenshiftClusterBuilder().create(cluster_name, node_types, version)
+    print(f'Openshift cluster {cluster_name} has successfully deployed.')
+    print('-'*50)
+    print(cluster.master_nodes[0].exec_command('oc version').stdout)
+    print('Nodes:')
+    print(cluster.master_nodes[0].exec_command('oc get nodes').stdout)
+    print('-'*50)
+
+
+def delete_cluster(cluster_name):
+    cluster = OpenshiftClusterBuilder().get(cluster_name)
+    OpenshiftClusterBuilder().delete(cluster)
+    print(f'\nCluster {cluster_name} has been successfully deleted.')
+
+
+def run_jobs(operation, cluster_names, func, *args):
+    """Running the operation on all the clusters concurrently and waiting for them to finish"""
+    scheduler_config = CONFIG_DATA.get('scheduler', {})
+    scheduler = JobScheduler(max_concurrent=scheduler_config.get('max_concurrent', 4),
+                             max_per_tenant=scheduler_config.get('max_per_tenant', 4))
+    tenant = CONFIG_DATA['openstack']['tenant_name']
+    futures = {
+        cluster_name: scheduler.submit(cluster_name, func, cluster_name, *args, operation=operation, tenant=tenant)
+        for cluster_name in cluster_names
+    }
+    for cluster_name, future in futures.items():
+        try:
+            future.result()
+        except BaseException as e:
+            print(f'Failed to {operation} cluster {cluster_name}: {e}')
+
+
+def show_stats(as_json=False, prometheus_path=None):
+    stats = Tracer().pool_stats()
+    prometheus_path = prometheus_path or CONFIG_DATA.get('metrics', {}).get('textfile')
+    if prometheus_path:
+        PrometheusTextfileExporter(prometheus_path).export(stats)
+    if as_json:
+        print(json.dumps(stats, indent=2))
+        return
+    print(f'{"phase":<24}{"count":>8}{"failures":>10}{"p50 (s)":>12}{"p95 (s)":>12}')
+    print('-'*66)
+    for phase, phase_stats in stats.items():
+        print(f'{phase:<24}{phase_stats["count"]:>8}{phase_stats["failures"]:>10}'
+              f'{phase_stats["p50"]:>12.1f}{phase_stats["p95"]:>12.1f}')
+
+
+def bake_image(version):
+    doc = OpenshiftClusterBuilder().bake_image(version)
+    print(f'Golden image of version {version} has successfully baked: {doc["image_name"]} ({doc["image_id"]})')
+
+
+def show_images(prune=False):
+    golden_images = GoldenImages()
+    if prune:
+        for doc in golden_images.prune():
+            print(f'Deleted stale image {doc["image_name"]} ({doc["image_id"]})')
+    print(f'{"version":<10}{"image":<36}{"baked at":<22}{"stale"}')
+    print('-'*90)
+    for doc in golden_images.list():
+        print(f'{doc["version"]:<10}{doc["image_name"]:<36}{doc["baked_at"]:%Y-%m-%d %H:%M:%S}{"":<3}'
+              f'{doc["stale_reason"] or "-"}')
+
+
+def list_clusters(owner=None, version=None, flavor=None):
+    store = get_metadata_store()
+    store.migrate_workspace()
+    print(f'{"name":<32}{"owner":<16}{"version":<10}{"flavor":<16}{"created at"}')
+    print('-'*100)
+    for doc in store.clusters(owner=owner, version=version, flavor=flavor):
+        print(f'{doc["name"]:<32}{doc["owner"] or "-":<16}{doc["version"] or "-":<10}{doc["flavor"] or "-":<16}'
+              f'{doc["created_at"] or "-"}')
+
+
+def cluster_status(cluster_name, checks=None, refresh=False):
+    try:
+        return OpenshiftClusterBuilder().get(cluster_name).status(checks, refresh)
+    except (Exception, StackNotFoundException) as e:
+        return ClusterStatus(cluster_name, False, OrderedDict(
+            cluster=CheckResult('cluster', False, str(e), 0.0, datetime.now(), False)), 0.0)
+
+
+def show_status(cluster_names, checks=None, refresh=False, as_json=False):
+    with ThreadPoolExecutor(max_workers=len(cluster_names)) as executor:
+        statuses = list(executor.map(lambda name: cluster_status(name, checks, refresh), cluster_names))
+    if as_json:
+        print(json.dumps([dict(status._asdict(), checks=[check._asdict() for check in status.checks.values()])
+                          for status in statuses], indent=2, default=str))
+        return
+    for status in statuses:
+        print(f'{status.name}: {"healthy" if status.healthy else "UNHEALTHY"} ({status.elapsed:.2f}s)')
+        for check in status.checks.values():
+            print(f'  {check.name:<10}{"ok" if check.ok else "FAILED":<8}{check.elapsed:>7.2f}s'
+                  f'{" (cached)" if check.cached else "":<10}{check.detail}')
+
+
+def warm_pool(no_wait=False):
+    pool = WarmPool()
+    if no_wait:
+        pool.reclaim()
+    else:
+        submitted = pool.replenish()
+        print(f'Building {len(submitted)} clusters: {", ".join(submitted) or "-"}')
+        pool.wait()
+    stats = pool.stats
+    print(f'Warm pool: {stats["ready"]} ready; {stats["building"]} building')
+
+
+def claim_cluster(node_types, version, owner=None):
+    # The claimed cluster is replaced by the next `warm` run (this process does not wait for builds)
+    cluster = WarmPool().claim(version, node_types, owner, replenish=False)
+    if cluster is None:
+        print(f'No ready cluster of version {version} ({",".join(t.value for t in node_types)}) in the warm pool.')
+        return
+    print(f'Claimed cluster {cluster.name}.')
+
+
+def parse_node_types(value):
+    """Return the node types of the comma separated value, or None if one of them is invalid"""
+    try:
+        return [next(nt for nt in NodeType if nt.value == node_type.lower()) for node_type in value.split(',')]
+    except StopIteration:
+        print(f'Node types are invalid! {value.split(",")}')
+
 
 def parse_commend(namespace):
+    if namespace.operation == 'warm':
+        warm_pool(namespace.no_wait)
+        return
+    if namespace.operation == 'claim':
+        node_types = parse_node_types(namespace.node_types)
+        if node_types:
+            claim_cluster(node_types, namespace.version, namespace.owner)
+        return
+    if namespace.operation == 'status':
+        names = [name.strip() for name in namespace.cluster_name.split(',') if name.strip()]
+        if not names:
+            print(f'Cluster names are invalid! {namespace.cluster_name.split(",")}')
+            return
+        checks = [check.strip() for check in namespace.checks.split(',')] if namespace.checks else None
+        show_status(names, checks, namespace.refresh, namespace.json)
+        return
+    if namespace.operation == 'list':
+        list_clusters(namespace.owner, namespace.version, namespace.flavor)
+        return
+    if namespace.operation == 'stats':
+        show_stats(namespace.json, namespace.prometheus)
+        return
+    if namespace.operation == 'images':
+        show_images(namespace.prune)
+        return
+    if namespace.operation == 'bake':
+        versions = [version.strip() for version in namespace.version.split(',') if version.strip()]
+        unsupported = [version for version in versions
+                       if version not in OpenshiftClusterBuilder().SUPPORTED_VERSIONS]
+        if unsupported:
+            print(f'Unsupported versions: {unsupported}. '
+                  f'Supported versions: {", ".join(OpenshiftClusterBuilder().SUPPORTED_VERSIONS)}')
+            return
+        run_jobs('bake', versions, bake_image)
+        return
+    cluster_names = [name.strip() for name in namespace.cluster_name.split(',') if name.strip()]
     if namespace.operation in ('create', 'deploy'):
-        try:
-            node_types = [next(nt for nt in NodeType if nt.value == node_type.lower())
-                          for node_type in namespace.node_types.split(',')]
-        except StopIteration:
-            print(f'Node types are invalid! {namespace.node_types.split(",")}')
+        node_types = parse_node_types(namespace.node_types)
+        if not node_types:
             return
 
         for node_type in NodeType:
@@ -47,52 +273,33 @@ def parse_commend(namespace):
                 print(f'Cluster must include at least one `{node_type.value}` node!')
                 return
 
-        if StackBuilder().is_stack(namespace.cluster_name):
-            print(f'Cluster with the given name "{namespace.cluster_name}" is already exists!')
-            return
+        for cluster_name in cluster_names:
+            if StackBuilder().is_stack(cluster_name):
+                print(f'Cluster with the given name "{cluster_name}" is already exists!')
+                return
 
         if namespace.operation == 'deploy':
 
             version = re.match('\d\.\d', namespace.version)
             if not version or version.group() not in OpenshiftClusterBuilder().SUPPORTED_VERSIONS:
-                print(f'Unsupported version: {version.group()}. '
+                print(f'Unsupported version: {namespace.version}. '
                       f'Supported versions: {", ".join(OpenshiftClusterBuilder().SUPPORTED_VERSIONS)}')
                 return
 
-            cluster = OpenshiftClusterBuilder().create(
-                namespace.cluster_name, node_types, namespace.version
-            )
-            print('Openshift cluster has successfully deployed.')
-            print('-'*50)
-            print(cluster.master_nodes[0].ssh.exec_command('oc version')[1].read())
-            print('Nodes:')
-            print(cluster.master_nodes[0].ssh.exec_command('oc get nodes')[1].read())
-            print('-'*50)
+            run_jobs('deploy', cluster_names, deploy_cluster, node_types, namespace.version)
 
         elif namespace.operation == 'create':
-            print(f'Creating stack {namespace.cluster_name}.')
-            stack = StackBuilder().create(
-                namespace.cluster_name, OpenshiftClusterBuilder().gen_node_names(node_types), node_types)
-            print('\nStack has successfully created.')
-            print('-'*50)
-            for node in stack.instances:
-                print(node.fqdn)
-            print('-'*50)
+            run_jobs('create', cluster_names, create_stack, node_types)
 
     if namespace.operation == 'delete':
-        cluster = OpenshiftClusterBuilder().get(namespace.cluster_name)
         if namespace.force and input(
-                f'Are you sure you want to delete cluster {namespace.cluster_name}? (y/n) ').lower() != 'y':
+                f'Are you sure you want to delete cluster {", ".join(cluster_names)}? (y/n) ').lower() != 'y':
             print('Canceling operation.')
             return
-        OpenshiftClusterBuilder().delete(cluster)
-        print(f'\nCluster {namespace.cluster_name} has been successfully deleted.')
+        run_jobs('delete', cluster_names, delete_cluster)
 
 
 def main():
-    if pgrep(PROCESS_NAME):
-        print('Can only run 1 process at once.')
-        return
     set_proc_name(PROCESS_NAME.encode())
     parse_commend(parser.parse_args())
 
@@ -1,6 +1,40 @@
 import os
-import yaml
+import threading
+from collections.abc import Mapping
 
 CONFIG_DIR = os.path.dirname(__file__)
-with open(os.path.join(CONFIG_DIR, 'config.yaml'), 'r') as f:
-    CONFIG_DATA = yaml.load(f.read())
+CONFIG_FILE = os.path.join(CONFIG_DIR, 'config.yaml')
+
+
+class LazyConfig(Mapping):
+    """The config data, parsed from the config file on the first access (so importing the config is free)"""
+
+    def __init__(self, path):
+        self._path = path
+        self._data = None
+        self._lock = threading.Lock()
+
+    @property
+    def data(self):
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    import yaml
+                    with open(self._path, 'r') as f:
+                        self._data = yaml.load(f.read())
+        return self._data
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return '<{} {}; loaded={}>'.format(self.__class__.__name__, self._path, self._data is not None)
+
+
+CONFIG_DATA = LazyConfig(CONFIG_FILE)
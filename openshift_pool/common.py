@@ -1,11 +1,9 @@
 import subprocess as sp
-import logging
 from ctypes import cdll, byref, create_string_buffer
 
 from enum import Enum
 
-from openshift_pool.env import LOG_LEVEL, setup_logger, LOG_FORMATTER,\
-    MAIN_LOG_FILE
+from openshift_pool.env import LOG_LEVEL, LOG_REGISTRY, MAIN_LOG_FILE, setup_logger
 
 
 class Singleton(type):
@@ -69,12 +67,14 @@ class Loggable:
     This class provides a logging ability to the inherit object.
     """
     def __init__(self, log_file=None):
-        self._logger = setup_logger(f'{self.__class__.__name__}_log', log_file or MAIN_LOG_FILE, LOG_LEVEL)
+        name = f'{self.__class__.__name__}_log'
+        if log_file:
+            # A logger per log file, so the records of each object are routed to its own file (e.g. a cluster's log.log)
+            name = f'{name}:{log_file}'
+        self._logger = setup_logger(name, log_file or MAIN_LOG_FILE, LOG_LEVEL)
 
     def add_logging_file(self, log_file: str):
-        handler = logging.FileHandler(log_file)
-        handler.setFormatter(LOG_FORMATTER)
-        self._logger.addHandler(handler)
+        LOG_REGISTRY.add_route(self._logger.name, log_file)
 
     @property
     def log(self):
@@ -1,32 +1,201 @@
-from pymongo.mongo_client import MongoClient
-from bson import _ENCODERS as bson_encoders
+import threading
+from datetime import date, timedelta
 
-from openshift_pool.common import Singleton
+from openshift_pool.common import Singleton, NodeType
+
+
+# The index/sort directions (the values of pymongo.ASCENDING/DESCENDING, without importing pymongo)
+ASCENDING = 1
+DESCENDING = -1
+
+
+class Codec(object):
+    """
+    Encoding documents to bson encodable documents and decoding them back to the python types.
+
+    The registered types are encoded to tagged documents (`{'__type__': <name>, 'value': <value>}`), so they
+    are decoded back to the same type. The handling of each type is resolved once and cached (a dict
+    lookup per value instead of isinstance checks), and the documents are walked with an explicit stack,
+    so deep documents do not recurse. Values of unknown types are encoded as their str.
+    """
+    TYPE_KEY = '__type__'
+    VALUE_KEY = 'value'
+    NATIVE, DICT, LIST, CODEC, STR = range(5)
+
+    def __init__(self):
+        self._codecs = {}
+        self._decoders = {}
+        self._dispatch = {}
+        self._native_types = None
+        self._codec_options = None
+        self._lock = threading.Lock()
+
+    def register(self, python_type, name, to_value, from_value):
+        """Registering a type.
+            @param python_type: `type` The type (and its subclasses).
+            @param name: `str` The name of the type in the tagged documents.
+            @param to_value: `callable` Converting an object of the type to an encodable value.
+            @param from_value: `callable` Converting the decoded value back to an object of the type.
+        """
+        with self._lock:
+            self._codecs[python_type] = (name, to_value)
+            self._decoders[name] = from_value
+            self._dispatch.clear()
+            self._codec_options = None
+
+    def register_enum(self, enum_type):
+        self.register(enum_type, enum_type.__name__, lambda member: member.value, enum_type)
+
+    def register_namedtuple(self, tuple_type):
+        self.register(tuple_type, tuple_type.__name__, lambda value: value._asdict(), lambda value: tuple_type(**value))
+
+    @property
+    def native_types(self):
+        """The types that bson encodes natively (bson is imported on the first call)"""
+        if self._native_types is None:
+            from bson import _ENCODERS as bson_encoders
+            self._native_types = tuple(bson_encoders.keys())
+        return self._native_types
+
+    def _resolve(self, python_type):
+        if python_type in self._codecs:
+            return self.CODEC, self._codecs[python_type]
+        if issubclass(python_type, dict):
+            return self.DICT, None
+        if issubclass(python_type, (list, tuple)):
+            return self.LIST, None
+        if issubclass(python_type, self.native_types):
+            return self.NATIVE, None
+        for base in python_type.__mro__[1:]:
+            if base in self._codecs:
+                return self.CODEC, self._codecs[base]
+        return self.STR, None
+
+    def _handler(self, python_type):
+        handler = self._dispatch.get(python_type)
+        if handler is None:
+            handler = self._dispatch[python_type] = self._resolve(python_type)
+        return handler
+
+    def encode(self, document):
+        """Return the bson encodable copy of the document"""
+        native, as_dict, as_list, as_codec = self.NATIVE, self.DICT, self.LIST, self.CODEC
+        dispatch, resolve = self._dispatch.get, self._handler
+        root = [None]
+        stack = [(document, root, 0)]
+        pop, push = stack.pop, stack.append
+        while stack:
+            value, parent, key = pop()
+            kind, codec = dispatch(type(value)) or resolve(type(value))
+            if kind == as_dict:
+                result = parent[key] = {}
+                for item_key, item in value.items():
+                    if type(item_key) is not str:
+                        item_key = str(item_key)
+                    # The native leaves are copied on the way, only the nodes are pushed
+                    if (dispatch(type(item)) or resolve(type(item)))[0] == native:
+                        result[item_key] = item
+                    else:
+                        result[item_key] = None
+                        push((item, result, item_key))
+            elif kind == as_list:
+                result = parent[key] = list(value)
+                for index, item in enumerate(result):
+                    if (dispatch(type(item)) or resolve(type(item)))[0] != native:
+                        push((item, result, index))
+            elif kind == native:
+                parent[key] = value
+            elif kind == as_codec:
+                name, to_value = codec
+                result = parent[key] = {self.TYPE_KEY: name, self.VALUE_KEY: None}
+                push((to_value(value), result, self.VALUE_KEY))
+            else:
+                parent[key] = str(value)
+        return root[0]
+
+    def decode(self, document):
+        """Return the copy of the (decoded bson) document with the registered types decoded back"""
+        type_key, value_key, decoders = self.TYPE_KEY, self.VALUE_KEY, self._decoders
+        root = [None]
+        # The entries with a decoder are completed after their value (pushed above them) is decoded
+        stack = [(document, root, 0, None)]
+        pop, push = stack.pop, stack.append
+        while stack:
+            value, parent, key, decoder = pop()
+            if decoder is not None:
+                parent[key] = decoder(value[0])
+                continue
+            value_type = type(value)
+            if value_type is dict or isinstance(value, dict):
+                decoder = decoders.get(value[type_key]) if type_key in value else None
+                if decoder is not None:
+                    holder = [None]
+                    push((holder, parent, key, decoder))
+                    push((value[value_key], holder, 0, None))
+                    continue
+                result = parent[key] = {}
+                for item_key, item in value.items():
+                    result[item_key] = item
+                    if type(item) in (dict, list) or isinstance(item, (dict, list)):
+                        push((item, result, item_key, None))
+            elif value_type is list or isinstance(value, list):
+                result = parent[key] = list(value)
+                for index, item in enumerate(result):
+                    if type(item) in (dict, list) or isinstance(item, (dict, list)):
+                        push((item, result, index, None))
+            else:
+                parent[key] = value
+        return root[0]
+
+    @property
+    def codec_options(self):
+        """The pymongo codec options that encode the registered types (that bson does not encode natively)
+        to the same tagged documents, so the collections accept them as is"""
+        if self._codec_options is None:
+            from bson.codec_options import CodecOptions, TypeEncoder, TypeRegistry
+            encoders = []
+            for python_type, (name, to_value) in list(self._codecs.items()):
+                if issubclass(python_type, self.native_types):
+                    continue
+                encoder = type(f'{name}Encoder', (TypeEncoder, ), {
+                    'python_type': python_type,
+                    'transform_python': lambda _, value, name=name, to_value=to_value: {
+                        self.TYPE_KEY: name, self.VALUE_KEY: to_value(value)}
+                })
+                encoders.append(encoder())
+            self._codec_options = CodecOptions(type_registry=TypeRegistry(encoders, fallback_encoder=str))
+        return self._codec_options
+
+
+CODEC = Codec()
+CODEC.register_enum(NodeType)
+CODEC.register(date, 'date', date.isoformat, lambda value: date(*map(int, value.split('-'))))
+CODEC.register(timedelta, 'timedelta', timedelta.total_seconds, lambda value: timedelta(seconds=value))
+CODEC.register(set, 'set', list, set)
+CODEC.register(frozenset, 'frozenset', list, frozenset)
 
 
 class DB(metaclass=Singleton):
-    bson_types = tuple(bson_encoders.keys())
 
     def __init__(self):
+        from pymongo.mongo_client import MongoClient
         self.client = MongoClient()
 
     def __getattr__(self, name):
-        return getattr(self.client.db, name)
+        # The collections encode the registered types of the codec
+        return self.client.db.get_collection(name, codec_options=CODEC.codec_options)
+
+    @classmethod
+    def bson_types(cls):
+        """The types that bson encodes natively (bson is imported on the first call)"""
+        return CODEC.native_types
 
     @classmethod
     def bson_encode(cls, node):
-        """Verifying that all the object in the dict node are bson encodable.
-        The once that are not, converted to str"""
-        if isinstance(node, dict):
-            result = {}
-            for key, value in node.items():
-                result[key] = cls.bson_encode(value)
-        elif isinstance(node, (list, tuple)):
-            result = []
-            for item in node:
-                result.append(cls.bson_encode(item))
-        elif isinstance(node, cls.bson_types):
-            result = node
-        else:
-            result = str(node)
-        return result
+        """Return the bson encodable copy of the node (see `Codec.encode`)"""
+        return CODEC.encode(node)
+
+    @classmethod
+    def bson_decode(cls, node):
+        """Return the copy of the node with the registered types decoded back (see `Codec.decode`)"""
+        return CODEC.decode(node)
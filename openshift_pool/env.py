@@ -1,8 +1,8 @@
 import os
-import sys
 import logging
 
 from openshift_pool.exceptions import EnvarNotDefinedException
+from openshift_pool.log_registry import LogRegistry
 
 ENV = {}
 
@@ -22,26 +22,22 @@ LOG_LEVEL = logging.INFO  # TODO: parameterize
 MAIN_LOG_FILE = f'{os.environ["WORKSPACE"]}/main_log.log'
 
 
-def setup_logger(name, log_file, level=LOG_LEVEL) -> logging.Logger:
-    """Function setup as many loggers as you want"""
+LOG_REGISTRY = LogRegistry(LOG_FORMATTER)
 
-    if not os.path.exists(log_file):
-        dr = os.path.dirname(log_file)
-        if not os.path.isdir(dr):
-            os.makedirs(dr)
-        with open(log_file, 'w'):
-            pass
-    file_handler = logging.FileHandler(log_file)
-    file_handler.setFormatter(LOG_FORMATTER)
-    stream_handler = logging.StreamHandler(sys.stdout)
-    stream_handler.setFormatter(LOG_FORMATTER)
 
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
-    logger.addHandler(file_handler)
-    logger.addHandler(stream_handler)
+def setup_logger(name, log_file=None, level=LOG_LEVEL) -> logging.Logger:
+    """Return the logger, writing to the stdout and to the log file.
+    The logger is configured once (by the log registry), no matter how many times it is set up.
+    """
+    return LOG_REGISTRY.get_logger(name, log_file, level)
 
-    return logger
 
+_main_log = None
 
-main_log = setup_logger('main_log', MAIN_LOG_FILE, level=LOG_LEVEL)
+
+def get_main_log() -> logging.Logger:
+    """Return the main logger (it is set up on the first call, so importing the env does not open log files)"""
+    global _main_log
+    if _main_log is None:
+        _main_log = setup_logger('main_log', MAIN_LOG_FILE, level=LOG_LEVEL)
+    return _main_log
@@ -19,6 +19,19 @@ class StackCreationFailedException(BaseException):
         return f'Failed to create stack "{self._stack_name}" - reason: {self._stack_status_reason}'
 
 
+class StackDeletionFailedException(BaseException):
+    def __init__(self, stack_name: str, stack_status_reason: str):
+        """
+        @param stack_name: `str` The name of the stack.
+        @param stack_status_reason: `str` The reason for the failure - could be reached via heatclient.
+        """
+        self._stack_name = stack_name
+        self._stack_status_reason = stack_status_reason
+
+    def __str__(self):
+        return f'Failed to delete stack "{self._stack_name}" - reason: {self._stack_status_reason}'
+
+
 class CannotDetectNodeTypeException(BaseException):
     def __init__(self, node_fqdn):
         self._node_fqdn = node_fqdn
@@ -53,6 +66,15 @@ class NameServerUpdateException(BaseException):
         return 'Could not update name server for stack "{}"'.format(self._stack_name)
 
 
+class InstanceNotReadyException(BaseException):
+    def __init__(self, stack_name, address):
+        self._stack_name = stack_name
+        self._address = address
+
+    def __str__(self):
+        return 'Instance {} of stack "{}" is not reachable over SSH'.format(self._address, self._stack_name)
+
+
 class EnvarNotDefinedException(BaseException):
     def __init__(self, envvar):
         self._envvar = envvar
@@ -66,3 +88,69 @@ class MissingConfiguragtion(BaseException):
 
     def __str__(self):
         return f"""The parameter "{self._missing_args}" is missing in the config file"""
+
+
+class ClusterLockedException(BaseException):
+    """Raises when trying to operate on a cluster that is locked by another operation"""
+    def __init__(self, cluster_name):
+        self._cluster_name = cluster_name
+
+    def __str__(self):
+        return f'Cluster "{self._cluster_name}" is locked by another operation'
+
+
+class PipelineStageFailedException(BaseException):
+    """Raises when a stage of a pipeline failed"""
+    def __init__(self, pipeline_name, stage_name, error):
+        self._pipeline_name = pipeline_name
+        self._stage_name = stage_name
+        self._error = error
+
+    @property
+    def error(self):
+        return self._error
+
+    def __str__(self):
+        return f'Stage "{self._stage_name}" of pipeline "{self._pipeline_name}" failed: {self._error}'
+
+
+class AnsibleRunFailedException(BaseException):
+    """Raises when an ansible playbook run crashed"""
+    def __init__(self, playbook_name, reason):
+        self._playbook_name = playbook_name
+        self._reason = reason
+
+    def __str__(self):
+        return f'Ansible playbook "{self._playbook_name}" crashed: {self._reason}'
+
+
+class ImageSnapshotFailedException(BaseException):
+    """Raises when a server snapshot did not become an active image"""
+    def __init__(self, image_id, reason):
+        self._image_id = image_id
+        self._reason = reason
+
+    def __str__(self):
+        return f'Image snapshot "{self._image_id}" failed: {self._reason}'
+
+
+class InvalidStateTransitionException(BaseException):
+    """Raises when a cluster of the pool is not in a state that can transition to the requested one"""
+    def __init__(self, cluster_name, to_state, state):
+        self._cluster_name = cluster_name
+        self._to_state = to_state
+        self._state = state
+
+    def __str__(self):
+        return f'Cluster "{self._cluster_name}" cannot transition to "{self._to_state}" from "{self._state}"'
+
+
+class CommandTimeoutException(BaseException):
+    """Raises when a remote command did not finish in time"""
+    def __init__(self, hostname, command, timeout):
+        self._hostname = hostname
+        self._command = command
+        self._timeout = timeout
+
+    def __str__(self):
+        return f'Command "{self._command}" on {self._hostname} timed out after {self._timeout}s'
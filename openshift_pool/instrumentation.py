@@ -0,0 +1,175 @@
+import os
+import time
+import math
+import functools
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+from collections import namedtuple
+
+from cached_property import cached_property
+
+from config import CONFIG_DATA
+from openshift_pool.common import Singleton, Loggable
+from openshift_pool.db import CODEC
+
+
+Span = namedtuple('Span', ['trace', 'phase', 'started_at', 'duration', 'error'])
+CODEC.register_namedtuple(Span)
+
+
+def percentile(values, q):
+    """Return the q-th percentile (nearest rank) of the values.
+        @param values: `list` of numbers.
+        @param q: `float` The percentile, between 0 and 100.
+    """
+    if not values:
+        return
+    ordered = sorted(values)
+    rank = max(1, int(math.ceil(q / 100.0 * len(ordered))))
+    return ordered[rank - 1]
+
+
+class Tracer(Loggable, metaclass=Singleton):
+    """
+    Collecting the timing spans of the cluster lifecycle phases.
+
+    The spans are grouped by trace (the name of the cluster/stack), kept in memory until they
+    are flushed to the `phase_timings` collection in the DB (when `instrumentation.store` is enabled).
+    The collection is on its own client with a short server selection timeout, so a cluster operation
+    does not wait for an unavailable DB.
+    """
+
+    def __init__(self):
+        Loggable.__init__(self)
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    @property
+    def config(self):
+        return CONFIG_DATA.get('instrumentation', {})
+
+    @cached_property
+    def phase_timings(self):
+        """The collection of the flushed spans"""
+        from pymongo.mongo_client import MongoClient
+        client = MongoClient(serverSelectionTimeoutMS=int(self.config.get('timeout', 2) * 1000))
+        return client.db.get_collection('phase_timings', codec_options=CODEC.codec_options)
+
+    @contextmanager
+    def span(self, trace, phase):
+        """Measuring the duration of the block as a span of the trace.
+            @param trace: `str` The name of the cluster/stack.
+            @param phase: `str` The name of the phase, e.g. 'stack.provision'.
+        """
+        started_at = datetime.now()
+        start = time.monotonic()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            span = Span(trace, phase, started_at, time.monotonic() - start, error)
+            with self._lock:
+                self._spans.setdefault(trace, []).append(span)
+            self.log.info(f'[{trace}] {phase} took {span.duration:.1f}s' + (f' (failed: {error})' if error else ''))
+
+    def spans(self, trace):
+        """Return the spans of the trace that were not flushed yet"""
+        with self._lock:
+            return list(self._spans.get(trace, []))
+
+    def flush(self, trace):
+        """Storing the spans of the trace in the DB (if the storage is enabled).
+            @param trace: `str` The name of the cluster/stack.
+            @rtype: `list` of `Span` The flushed spans.
+        """
+        with self._lock:
+            spans = self._spans.pop(trace, [])
+        if not spans or not self.config.get('store', False):
+            return spans
+        try:
+            self.phase_timings.insert_many([span._asdict() for span in spans])
+        except Exception as e:
+            self.log.error(f'Failed to store the phase timings of {trace}: {e}')
+        return spans
+
+    @staticmethod
+    def phase_stats(spans):
+        """Return the statistics of the phase durations.
+            @param spans: `iterable` of `dict`/`Span` The spans.
+            @rtype: `dict` of phase -> dict(count, sum, mean, p50, p95, failures)
+        """
+        durations = {}
+        failures = {}
+        for span in spans:
+            span = span if isinstance(span, dict) else span._asdict()
+            durations.setdefault(span['phase'], []).append(span['duration'])
+            failures[span['phase']] = failures.get(span['phase'], 0) + bool(span.get('error'))
+        return {
+            phase: dict(count=len(values), sum=sum(values), mean=sum(values) / len(values),
+                        p50=percentile(values, 50), p95=percentile(values, 95), failures=failures[phase])
+            for phase, values in sorted(durations.items())
+        }
+
+    def pool_stats(self):
+        """Return the statistics of the phase durations across all the clusters in the DB"""
+        return self.phase_stats(self.phase_timings.find({}, {'_id': False, 'phase': True, 'duration': True,
+                                                             'error': True}))
+
+
+def timed(phase):
+    """Decorating a builder method so each call is recorded as a span.
+    The trace is the name of the first argument (a stack, a cluster or a name).
+        @param phase: `str` The name of the phase.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, target, *args, **kwargs):
+            with Tracer().span(getattr(target, 'name', target), phase):
+                return func(self, target, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class PrometheusTextfileExporter(object):
+    """
+    Writing the phase statistics in the Prometheus text format,
+    to be collected by the node exporter textfile collector.
+    """
+    DURATION_METRIC = 'openshift_pool_phase_duration_seconds'
+    FAILURES_METRIC = 'openshift_pool_phase_failures_total'
+
+    def __init__(self, path):
+        """
+        @param path: `str` The path of the .prom file.
+        """
+        self._path = path
+
+    @property
+    def path(self):
+        return self._path
+
+    def render(self, stats):
+        """Return the statistics (as returned by `Tracer.phase_stats`) in the Prometheus text format"""
+        lines = [f'# HELP {self.DURATION_METRIC} Duration of the cluster lifecycle phases.',
+                 f'# TYPE {self.DURATION_METRIC} summary']
+        for phase, phase_stats in stats.items():
+            for quantile, key in (('0.5', 'p50'), ('0.95', 'p95')):
+                lines.append(f'{self.DURATION_METRIC}{{phase="{phase}",quantile="{quantile}"}} {phase_stats[key]}')
+            lines.append(f'{self.DURATION_METRIC}_sum{{phase="{phase}"}} {phase_stats["sum"]}')
+            lines.append(f'{self.DURATION_METRIC}_count{{phase="{phase}"}} {phase_stats["count"]}')
+        lines += [f'# HELP {self.FAILURES_METRIC} Failures of the cluster lifecycle phases.',
+                  f'# TYPE {self.FAILURES_METRIC} counter']
+        for phase, phase_stats in stats.items():
+            lines.append(f'{self.FAILURES_METRIC}{{phase="{phase}"}} {phase_stats["failures"]}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, stats):
+        """Writing the statistics atomically (the collector should never read a partial file)"""
+        tmp_path = f'{self._path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.render(stats))
+        os.replace(tmp_path, self._path)
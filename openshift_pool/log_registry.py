@@ -0,0 +1,143 @@
+import os
+import sys
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+
+class _RoutingHandler(logging.Handler):
+    """The handler of the listener thread: writing each record to the stream and to the files of its logger"""
+
+    def __init__(self, registry):
+        logging.Handler.__init__(self)
+        self._registry = registry
+
+    def handle(self, record):
+        self._registry._write(record)
+        return True
+
+
+class LogRegistry(object):
+    """
+    The logging layer of the package.
+
+    Every logger gets a single `QueueHandler`, however many objects ask for it, so the callers only put
+    the records on a queue. A single listener thread writes them to the stream and to the files that
+    are routed to the logger (e.g. the log.log of a cluster). There is one file handler per file, shared by
+    all the loggers that write to it, and it is opened on the first record (only if its directory exists).
+    """
+    def __init__(self, formatter, stream=sys.stdout):
+        """
+        @param formatter: `logging.Formatter` The formatter of the stream and the files.
+        @param stream: The stream that all the records are written to (None to write to the files only).
+        """
+        self._formatter = formatter
+        self._stream = stream
+        self._reset()
+        atexit.register(self.stop)
+        if hasattr(os, 'register_at_fork'):
+            # The listener thread does not survive a fork; the child starts its own (on a new queue)
+            os.register_at_fork(after_in_child=self._reset_in_child)
+
+    def _reset(self):
+        self._lock = threading.RLock()
+        self._queue = queue.Queue(-1)
+        self._queue_handlers = {}
+        self._routes = {}
+        self._file_handlers = {}
+        self._stream_handler = None
+        if self._stream is not None:
+            self._stream_handler = logging.StreamHandler(self._stream)
+            self._stream_handler.setFormatter(self._formatter)
+        self._listener = None
+
+    def _reset_in_child(self):
+        queue_handlers, routes = self._queue_handlers, self._routes
+        self._reset()
+        # The loggers and their routes are kept; the file handlers are reopened by the child
+        self._routes = routes
+        for name, handler in queue_handlers.items():
+            handler.queue = self._queue
+            self._queue_handlers[name] = handler
+        if self._queue_handlers:
+            self._start_listener()
+
+    def _start_listener(self):
+        if self._listener is None:
+            self._listener = QueueListener(self._queue, _RoutingHandler(self))
+            self._listener.start()
+
+    @property
+    def open_files(self):
+        """The paths of the files that have an open handler"""
+        with self._lock:
+            return [path for path, handler in self._file_handlers.items() if handler.stream is not None]
+
+    def get_logger(self, name, log_file=None, level=logging.INFO):
+        """Return the logger, configured once.
+            @param name: `str` The name of the logger.
+            @param log_file: `str` A file to route the records of the logger to.
+            @param level: The level of the logger.
+            @rtype: `logging.Logger`
+        """
+        logger = logging.getLogger(name)
+        with self._lock:
+            if name not in self._queue_handlers:
+                handler = QueueHandler(self._queue)
+                self._queue_handlers[name] = handler
+                logger.addHandler(handler)
+                logger.propagate = False
+            logger.setLevel(level)
+            if log_file:
+                self._routes.setdefault(name, set()).add(os.path.abspath(log_file))
+            self._start_listener()
+        return logger
+
+    def add_route(self, name, log_file):
+        """Writing the records of the logger to another file as well"""
+        with self._lock:
+            self._routes.setdefault(name, set()).add(os.path.abspath(log_file))
+
+    def _file_handler(self, path):
+        handler = self._file_handlers.get(path)
+        if handler is None:
+            handler = logging.FileHandler(path, delay=True)
+            handler.setFormatter(self._formatter)
+            self._file_handlers[path] = handler
+        return handler
+
+    def _write(self, record):
+        with self._lock:
+            handlers = [self._stream_handler] if self._stream_handler else []
+            for path in self._routes.get(record.name, ()):
+                handler = self._file_handler(path)
+                # The file is not created in a directory that does not exist (e.g. a deleted management env)
+                if handler.stream is not None or os.path.isdir(os.path.dirname(path)):
+                    handlers.append(handler)
+        for handler in handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def close_file(self, log_file):
+        """Closing the handler of the file (e.g. before its directory is deleted)"""
+        with self._lock:
+            handler = self._file_handlers.pop(os.path.abspath(log_file), None)
+        if handler is not None:
+            handler.close()
+
+    def flush(self):
+        """Waiting for all the queued records to be written"""
+        if self._listener is not None:
+            self._queue.join()
+
+    def stop(self):
+        """Writing the queued records and stopping the listener thread"""
+        with self._lock:
+            listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.stop()
+        with self._lock:
+            for handler in self._file_handlers.values():
+                handler.close()
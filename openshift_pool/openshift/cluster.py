@@ -1,5 +1,9 @@
 import os
 import re
+import json
+import time
+import uuid
+import threading
 from datetime import datetime
 
 from cached_property import cached_property
@@ -8,40 +12,197 @@ from config import CONFIG_DIR, CONFIG_DATA
 from openshift_pool.common import Singleton, NodeType, Loggable
 from openshift_pool.openshift.stack import Stack, StackBuilder, StackInstance
 from openshift_pool.openshift.templates import templates
-from openshift_pool.playbooks import run_ansible_playbook
-from openshift_pool.exceptions import StackNotFoundException, CannotDetectNodeTypeException
-from openshift_pool.openshift.management_env import PickleShelf
+from openshift_pool.playbooks import run_ansible_playbook, run_ansible_playbook_isolated
+from openshift_pool.openshift.golden_images import GoldenImages
+from openshift_pool.openshift import container_images
+from openshift_pool.openshift.fanout import FanOut
+from openshift_pool.openshift.health import get_health_engine
+from openshift_pool.pipeline import Pipeline
+from openshift_pool.instrumentation import Tracer, timed
+from openshift_pool.exceptions import (StackNotFoundException, CannotDetectNodeTypeException,
+                                       AnsibleRunFailedException)
+from openshift_pool.openshift.metadata_store import ClusterMetadata, get_metadata_store
 
 
 class OpenshiftClusterBuilder(Loggable, metaclass=Singleton):
     NODE_NAME_BASE_PATTERN = 'ocp-{node_type}'
     NODE_NAME_INDEX_PATTERN = '-{n}'
     SUPPORTED_VERSIONS = ['3.5', '3.6', '3.7', '3.9']
+    BAKE_NAME_PATTERN = 'bake-{version}-{suffix}'
+    GOLDEN_IMAGE_NAME_PATTERN = 'ocp-{version}-golden-{timestamp}'
+    # The pre-installation tasks that still run on instances of a golden image
+    GOLDEN_IMAGE_PRE_INSTALL_TAGS = ['subscription']
 
     def __init__(self):
         Loggable.__init__(self)
 
-    def _run_pre_install(self, cluster, version):
-        """Running the pre-installation ansible tasks.
+    @property
+    def rpm_cache_config(self):
+        return CONFIG_DATA.get('rpm_cache', {})
+
+    def _rpm_cache_host(self, cluster):
+        """Return the key of the host that serves the RPM cache of the cluster (the first master),
+        or None if the RPM cache mode is disabled.
             @param cluster: `OpenshiftCluster`
-            @param version: `str` the openshift version for the pre-installation.
         """
-        self.log.info(f'Running pre-installation ansible script on cluster {cluster.name}.')
+        if not self.rpm_cache_config.get('enabled', False):
+            return
+        return next(host.key for host in cluster.stack.outputs.hosts if host.instance_type == NodeType.MASTER.value)
+
+    def _write_pre_install_inventory(self, cluster):
         cluster.mgmt_env.write_file(
             'pre_install_inventory',
-            templates.pre_install_inventory.render(**cluster.stack.hosts_data)
+            templates.pre_install_inventory.render(rpm_cache_host=self._rpm_cache_host(cluster),
+                                                   **cluster.stack.hosts_data)
         )
-        return run_ansible_playbook(
-            'pre_install', cluster.mgmt_env.file_abspath('pre_install_inventory'), self.log, extra_vars=dict(
-                subscription_username=CONFIG_DATA['subscription_manager']['username'],
-                subscription_password=CONFIG_DATA['subscription_manager']['password'],
-                pool_id=CONFIG_DATA['subscription_manager']['pool'],
-                auth_server=CONFIG_DATA['subscription_manager']['auth_server'],
-                ocp_version=version,
-                config_dir=CONFIG_DIR
-            )
+        return cluster.mgmt_env.file_abspath('pre_install_inventory')
+
+    def _pre_install_vars(self, cluster, version):
+        """Return the extra vars of the pre-installation playbooks"""
+        rpm_stats_dir = cluster.mgmt_env.file_abspath('rpm_stats')
+        os.makedirs(rpm_stats_dir, exist_ok=True)
+        extra_vars = dict(
+            subscription_username=CONFIG_DATA['subscription_manager']['username'],
+            subscription_password=CONFIG_DATA['subscription_manager']['password'],
+            pool_id=CONFIG_DATA['subscription_manager']['pool'],
+            auth_server=CONFIG_DATA['subscription_manager']['auth_server'],
+            ocp_version=version,
+            config_dir=CONFIG_DIR,
+            rpm_stats_dir=rpm_stats_dir
+        )
+        rpm_cache_host = self._rpm_cache_host(cluster)
+        if rpm_cache_host:
+            port = self.rpm_cache_config.get('port', 81)
+            private_ip = cluster.stack.outputs.host(rpm_cache_host).private_ip
+            extra_vars.update(rpm_cache_port=port, rpm_cache_url=f'http://{private_ip}:{port}/rpm_cache')
+        return extra_vars
+
+    def _log_downloads(self, cluster, suffix='', limit=None):
+        """Logging the download volume and duration of the nodes (recorded by the pre-installation playbooks).
+            @param cluster: `OpenshiftCluster`
+            @param suffix: `str` The suffix of the records ('' for the pre-installation, '.rpm_cache' for the cache).
+            @param limit: `str` The node to log (default: all the nodes).
+        """
+        rpm_stats_dir = cluster.mgmt_env.file_abspath('rpm_stats')
+        fqdns = [limit] if limit else [node.fqdn for node in cluster.nodes]
+        for fqdn in fqdns:
+            path = os.path.join(rpm_stats_dir, f'{fqdn}{suffix}.json')
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r') as f:
+                stats = json.load(f)
+            message = (f'{"RPM cache" if suffix else "Pre-installation"} downloads of {fqdn}: '
+                       f'{stats["rx_bytes"] / 2 ** 20:.1f}MB in {stats["duration"]:.1f}s '
+                       f'(rpm cache: {stats["rpm_cache"]})')
+            self.log.info(message)
+            cluster.mgmt_env.log.info(message)
+
+    @timed('cluster.rpm_cache')
+    def _run_rpm_cache(self, cluster, version, isolated=False):
+        """Populating the RPM cache of the cluster on its cache host and serving it to the other nodes.
+        The cache host is subscribed first (the subscription tasks of the pre-installation) so it could download.
+            @param cluster: `OpenshiftCluster`
+            @param version: `str` the openshift version for the pre-installation.
+            @param isolated: `bool` Whether to run the playbooks in their own process (so they could run in parallel).
+        """
+        self.log.info(f'Populating the RPM cache of cluster {cluster.name}')
+        inventory_path = self._write_pre_install_inventory(cluster)
+        extra_vars = self._pre_install_vars(cluster, version)
+        runner = run_ansible_playbook_isolated if isolated else run_ansible_playbook
+        self._check_playbook_result('pre_install', runner(
+            'pre_install', inventory_path, self.log, extra_vars=extra_vars,
+            options=dict(tags=self.GOLDEN_IMAGE_PRE_INSTALL_TAGS), fact_cache=cluster.stack.fact_cache,
+            limit='rpm_cache'
+        ))
+        self._check_playbook_result('rpm_cache', runner(
+            'rpm_cache', inventory_path, self.log, extra_vars=extra_vars, fact_cache=cluster.stack.fact_cache
+        ))
+        self._log_downloads(cluster, suffix='.rpm_cache')
+
+    @timed('cluster.pre_install')
+    def _run_pre_install(self, cluster, version, limit=None, isolated=False, tags=None, bake=False):
+        """Running the pre-installation ansible tasks.
+            @param cluster: `OpenshiftCluster`
+            @param version: `str` the openshift version for the pre-installation.
+            @param limit: `str` Limit the run to the hosts matching the pattern (default: all the nodes).
+            @param isolated: `bool` Whether to run the playbook in its own process (so it could run in parallel).
+            @param tags: `list` of `str` Run only the tasks with these tags (default: all the tasks).
+            @param bake: `bool` Whether the instances are baked into a golden image afterwards.
+        """
+        self.log.info(f'Running pre-installation ansible script on cluster {cluster.name}. '
+                      f'limit={limit}; tags={tags}')
+        inventory_path = self._write_pre_install_inventory(cluster)
+        extra_vars = dict(self._pre_install_vars(cluster, version), golden_image_bake=bake)
+        if bake:
+            extra_vars.pop('rpm_cache_url', None)  # The cache is not populated on the bake stack
+        runner = run_ansible_playbook_isolated if isolated else run_ansible_playbook
+        result = runner(
+            'pre_install', inventory_path, self.log, extra_vars=extra_vars,
+            options=dict(tags=tags) if tags else {}, fact_cache=cluster.stack.fact_cache, limit=limit
         )
+        self._log_downloads(cluster, limit=limit)
+        return result
+
+    @property
+    def prepull_config(self):
+        return CONFIG_DATA.get('prepull', {})
 
+    @timed('cluster.prepull')
+    def _run_prepull(self, cluster, version, limit=None, isolated=False):
+        """Pulling the openshift images of the version on the nodes (all the images of a node at once).
+            @param cluster: `OpenshiftCluster`
+            @param version: `str` the openshift version of the images.
+            @param limit: `str` The node to pull on (default: all the nodes).
+            @param isolated: `bool` Whether to run the playbook in its own process (so it could run in parallel).
+        """
+        mirror = self.prepull_config.get('mirror')
+        nodes = [node for node in cluster.nodes if not limit or node.fqdn == limit]
+        self.log.info(f'Pre-pulling the images of version {version} on {[node.fqdn for node in nodes]} '
+                      f'(mirror: {mirror})')
+        prepull_stats_dir = cluster.mgmt_env.file_abspath('prepull_stats')
+        os.makedirs(prepull_stats_dir, exist_ok=True)
+        runner = run_ansible_playbook_isolated if isolated else run_ansible_playbook
+        result = runner(
+            'prepull', self._write_pre_install_inventory(cluster), self.log, extra_vars=dict(
+                prepull_images={
+                    node.fqdn: [dict(name=image, source=container_images.mirrored(image, mirror))
+                                for image in container_images.images(version, node.type)]
+                    for node in nodes
+                },
+                prepull_stats_dir=prepull_stats_dir,
+                prepull_timeout=self.prepull_config.get('timeout', 1800)
+            ), fact_cache=cluster.stack.fact_cache, limit=limit
+        )
+        self._log_pull_times(cluster, nodes)
+        return result
+
+    def _log_pull_times(self, cluster, nodes):
+        """Logging the pull time of each image (recorded by the prepull playbook) and the total time per node"""
+        for node in nodes:
+            path = os.path.join(cluster.mgmt_env.file_abspath('prepull_stats'), f'{node.fqdn}.json')
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r') as f:
+                pulls = [line.split() for line in json.load(f) if line]
+            for image, started_at, finished_at in pulls:
+                cluster.mgmt_env.log.info(
+                    f'Pulled {image} on {node.fqdn} in {float(finished_at) - float(started_at):.1f}s')
+            if pulls:
+                elapsed = max(float(p[2]) for p in pulls) - min(float(p[1]) for p in pulls)
+                message = f'Pre-pulled {len(pulls)} images on {node.fqdn} in {elapsed:.1f}s'
+                self.log.info(message)
+                cluster.mgmt_env.log.info(message)
+
+    def _try_prepull(self, cluster, version, limit=None, isolated=False):
+        """Pre-pulling the images without failing the deployment (the installation pulls the missing images)"""
+        try:
+            result = self._run_prepull(cluster, version, limit=limit, isolated=isolated)
+        except (Exception, AnsibleRunFailedException) as e:
+            result = e
+        if result != 0:
+            self.log.warning(f'Pre-pulling the images on {limit or cluster.name} failed: {result}')
+
+    @timed('cluster.install')
     def _run_install(self, cluster, version):
         """Running the installation ansible tasks.
             @param cluster: `OpenshiftCluster`
@@ -53,16 +214,20 @@ class OpenshiftClusterBuilder(Loggable, metaclass=Singleton):
             templates.install_inventory.render(
                 deployer_host_fqdn=[node.fqdn for node in cluster.nodes if node.type == NodeType.MASTER].pop())
         )
+        extra_vars = dict(
+            ocp_version=version,
+            logs_directory=cluster.mgmt_env.path,
+            openshift_master_default_subdomain='apps.{}'.format(cluster.stack.outputs.ocp_servers_domain),
+            master_nodes=[node.fqdn for node in cluster.nodes if node.type == NodeType.MASTER],
+            infra_nodes=[node.fqdn for node in cluster.nodes if node.type == NodeType.INFRA],
+            compute_nodes=[node.fqdn for node in cluster.nodes if node.type == NodeType.COMPUTE]
+        )
+        if self.prepull_config.get('enabled', False):
+            # The installation uses the pre-pulled images (otherwise the installer picks the tag of the RPMs)
+            extra_vars['openshift_image_tag'] = container_images.image_tag(version)
         return run_ansible_playbook(
             'install', cluster.mgmt_env.file_abspath('install_inventory'), self.log,
-            extra_vars=dict(
-                ocp_version=version,
-                logs_directory=cluster.mgmt_env.path,
-                openshift_master_default_subdomain='apps.{}'.format(cluster.stack.hosts_data['ocp_servers_domain']),
-                master_nodes=[node.fqdn for node in cluster.nodes if node.type == NodeType.MASTER],
-                infra_nodes=[node.fqdn for node in cluster.nodes if node.type == NodeType.INFRA],
-                compute_nodes=[node.fqdn for node in cluster.nodes if node.type == NodeType.COMPUTE]
-            )
+            extra_vars=extra_vars, fact_cache=cluster.stack.fact_cache
         )
 
     def _fetch_nodes_from_stack_instances(self, stack):
@@ -72,13 +237,9 @@ class OpenshiftClusterBuilder(Loggable, metaclass=Singleton):
         """
         self.log.info(f'Fetching nodes from {stack.name} instances')
         nodes = []
-        outputs = stack.stack_outputs
+        outputs = stack.outputs
         for instance in stack.instances:
-            instance_type = next(filter(bool, [
-                output.get('output_value')
-                for output in outputs
-                if output['output_key'] == '{}_instance_type'.format(instance.fqdn.split('.')[0])
-            ]))
+            instance_type = outputs.by_fqdn(instance.fqdn).instance_type
             node = None
             for node_type in NodeType:
                 if instance_type == node_type.value:
@@ -90,18 +251,33 @@ class OpenshiftClusterBuilder(Loggable, metaclass=Singleton):
         self.log.debug(f'Fetched Nodes: {[node.type.value for node in nodes]}')
         return nodes
 
-    def _create_metadata(self, cluster):
+    @timed('cluster.metadata')
+    def _create_metadata(self, cluster, version=None):
         """Building the metadata for the new created cluster.
             @param cluster: `OpenshiftCluster`
+            @param version: `str` The deployed openshift version.
+        """
+        cluster.metadata.update(
+            resource_type='OpenshiftCluster',
+            name=cluster.name,
+            created_at=datetime.now(),
+            owner=None,
+            version=version,
+            flavor=CONFIG_DATA['openstack']['parameters']['flavor'],
+        )
+
+    def _record_phases(self, name, cluster=None):
+        """Storing the phase timings of the cluster in the DB and in its metadata.
+            @param name: `str` The name of the cluster.
+            @param cluster: `OpenshiftCluster` The cluster (None if it was not created).
         """
-        cluster.metadata['resource_type'] = 'OpenshiftCluster'
-        cluster.metadata['name'] = cluster.name
-        cluster.metadata['created_at'] = datetime.now()
-        cluster.metadata['owner'] = None
-        # cluster.metadata['version'] = cluster.version
-        # cluster.metadata['xy_version'] = cluster.xy_version
-        cluster.metadata['flavor'] = CONFIG_DATA['openstack']['parameters']['flavor']
-        cluster.metadata.save()
+        spans = Tracer().flush(name)
+        if cluster is None or not spans:
+            return
+        cluster.metadata['phases'] = cluster.metadata.get('phases', []) + [
+            dict(phase=span.phase, started_at=span.started_at, duration=span.duration, error=span.error)
+            for span in spans
+        ]
 
     def gen_node_names(self, node_types):
         """Generate node names from node types.
@@ -137,14 +313,92 @@ class OpenshiftClusterBuilder(Loggable, metaclass=Singleton):
             @rtype: `OpenshiftCluster`
         """
         self.log.info(f'Deploying openshift cluster: {cluster.name} version={version}')
-        result = self._run_pre_install(cluster, version)
-        assert result == 0, 'Ansible playbook "{}" returned with status code: {}'.format(
-            'pre_install', result)  # TODO: better exception
-        result = self._run_install(cluster, version)
-        assert result == 0, 'Ansible playbook "{}" returned with status code: {}'.format(
-            'install', result)
+        rpm_cache_host = self._rpm_cache_host(cluster)
+        if rpm_cache_host:
+            self._run_rpm_cache(cluster, version)
+            # The cache host restarts at the end of its pre-installation, so it runs after the other nodes
+            rpm_cache_fqdn = cluster.stack.outputs.host(rpm_cache_host).fqdn
+            self._check_playbook_result('pre_install', self._run_pre_install(
+                cluster, version, limit=f'nodes:!{rpm_cache_fqdn}'))
+            self._check_playbook_result('pre_install', self._run_pre_install(cluster, version, limit=rpm_cache_fqdn))
+        else:
+            self._check_playbook_result('pre_install', self._run_pre_install(cluster, version))
+        if self.prepull_config.get('enabled', False):
+            self._try_prepull(cluster, version)
+        self._check_playbook_result('install', self._run_install(cluster, version))
         return cluster
 
+    @staticmethod
+    def _check_playbook_result(playbook_name, result):
+        assert result == 0, 'Ansible playbook "{}" returned with status code: {}'.format(
+            playbook_name, result)  # TODO: better exception
+
+    def deploy_pipeline(self, cluster, version, golden_image=False):
+        """Building the deployment pipeline of a new created stack.
+
+        The per-node work starts as soon as the node is reachable over SSH: the keys exchange and the
+        pre-installation of each node run on their own, in parallel with the DNS update and the metadata creation.
+        In the RPM cache mode, the pre-installation of the nodes waits for the cache to be populated,
+        and the cache host (that restarts at its end) is pre-installed after all the other nodes.
+        The images of each node are pre-pulled right after its pre-installation.
+        The installation starts once all of them completed.
+            @param cluster: (`OpenshiftCluster`) The Openshift cluster to deploy.
+            @param version: (`str`) The Openshift version to deploy.
+            @param golden_image: (`bool`) Whether the stack was created from a golden image
+                                 (so only the subscription tasks of the pre-installation run).
+            @rtype: `Pipeline`
+        """
+        pre_install_tags = self.GOLDEN_IMAGE_PRE_INSTALL_TAGS if golden_image else None
+        pipeline = Pipeline(f'deploy-{cluster.name}',
+                            max_workers=CONFIG_DATA.get('pipeline', {}).get('max_workers', 16))
+        stack_builder = StackBuilder()
+        pipeline.add('dns', lambda: stack_builder._create_domains(cluster.stack))
+        pipeline.add('metadata', lambda: self._create_metadata(cluster, version))
+        keys_stages = {}
+        for node in cluster.nodes:
+            def exchange_keys(fqdn=node.fqdn):
+                self._check_playbook_result('exchange_keys', stack_builder.exchange_keys(
+                    cluster.stack, limit=fqdn, isolated=True))
+
+            # The stack is created before the SSH daemons of its instances are up. The playbooks connect to
+            # the public IPs, since the domains are created meanwhile (by the dns stage)
+            ready_stage = pipeline.add(f'ready:{node.fqdn}', lambda fqdn=node.fqdn: stack_builder.wait_for_instance(
+                cluster.stack, cluster.stack.outputs.by_fqdn(fqdn).public_ip))
+            keys_stages[node.fqdn] = pipeline.add(f'exchange_keys:{node.fqdn}', exchange_keys, deps=[ready_stage])
+        rpm_cache_stages = []
+        rpm_cache_host = None if golden_image else self._rpm_cache_host(cluster)
+        rpm_cache_fqdn = None
+        if rpm_cache_host:
+            # All the nodes download from the RPM cache, so their pre-installation starts once it is served
+            rpm_cache_fqdn = cluster.stack.outputs.host(rpm_cache_host).fqdn
+            rpm_cache_stages.append(pipeline.add(
+                'rpm_cache', lambda: self._run_rpm_cache(cluster, version, isolated=True),
+                deps=[keys_stages[rpm_cache_fqdn]]
+            ))
+        pre_install_stages = {}
+        # The pre-installation of the cache host ends with a restart (that stops serving the cache),
+        # so it runs after the pre-installation of all the other nodes
+        for node in sorted(cluster.nodes, key=lambda n: n.fqdn == rpm_cache_fqdn):
+            def pre_install(fqdn=node.fqdn):
+                self._check_playbook_result('pre_install', self._run_pre_install(
+                    cluster, version, limit=fqdn, isolated=True, tags=pre_install_tags))
+
+            deps = [keys_stages[node.fqdn]] + rpm_cache_stages
+            if node.fqdn == rpm_cache_fqdn:
+                deps += list(pre_install_stages.values())
+            pre_install_stages[node.fqdn] = pipeline.add(f'pre_install:{node.fqdn}', pre_install, deps=deps)
+        prepull_stages = []
+        if self.prepull_config.get('enabled', False):
+            for node in cluster.nodes:
+                prepull_stages.append(pipeline.add(
+                    f'prepull:{node.fqdn}',
+                    lambda fqdn=node.fqdn: self._try_prepull(cluster, version, limit=fqdn, isolated=True),
+                    deps=[pre_install_stages[node.fqdn]]
+                ))
+        pipeline.add('install', lambda: self._check_playbook_result('install', self._run_install(cluster, version)),
+                     deps=['dns', 'metadata'] + list(pre_install_stages.values()) + prepull_stages)
+        return pipeline
+
     def create(self, name, node_types, version):
         """Creating a new openshift cluster. Creating the stack and deploy Openshift.
             @param name: (`str`) The name of the cluster.
@@ -158,19 +412,74 @@ class OpenshiftClusterBuilder(Loggable, metaclass=Singleton):
         assert any(filter(lambda t: t in node_types, [NodeType.INFRA, NodeType.COMPUTE])), \
             'Cluster must include at least 1 additional node except master'
         self.log.info(f'Creating cluster: {name} node_types={[t.value for t in node_types]}; version={version}')
-        stack = StackBuilder().create(name, self.gen_node_names(node_types), node_types)
-        cluster = OpenshiftCluster(stack, self._fetch_nodes_from_stack_instances(stack))
-        self._create_metadata(cluster)
-        self.deploy(cluster, version)
+        cluster = None
+        try:
+            with Tracer().span(name, 'cluster.create'):
+                golden_images = GoldenImages()
+                golden_image = golden_images.get(version) if golden_images.enabled else None
+                if golden_image:
+                    self.log.info(f'Using golden image {golden_image["image_name"]} of version {version}')
+                stack = StackBuilder().provision(name, self.gen_node_names(node_types), node_types,
+                                                 image=golden_image['image_id'] if golden_image else None)
+                cluster = OpenshiftCluster(stack, self._fetch_nodes_from_stack_instances(stack))
+                if golden_image:
+                    cluster.metadata['golden_image'] = golden_image['image_id']
+                report = self.deploy_pipeline(cluster, version, golden_image=bool(golden_image)).run()
+                cluster.mgmt_env.write_yaml('deploy_pipeline.yaml', {
+                    'elapsed': report.elapsed,
+                    'critical_path': report.critical_path,
+                    'stages': [dict(name=r.name, started_at=r.started_at, duration=r.duration)
+                               for r in report.results]
+                })
+        finally:
+            self._record_phases(name, cluster)
         return cluster
 
+    def bake_image(self, version):
+        """Baking a golden image of the version: creating a single instance stack, running the
+        pre-installation on it and snapshotting it into an image. The stack is deleted afterwards.
+            @param version: (`str`) The Openshift version.
+            @rtype: `dict` The record of the golden image (see `GoldenImages`).
+        """
+        assert version in self.SUPPORTED_VERSIONS, f'Unsupported version: {version}'
+        golden_images = GoldenImages()
+        name = self.BAKE_NAME_PATTERN.format(version=version.replace('.', ''), suffix=uuid.uuid4().hex[:6])
+        node_types = [NodeType.MASTER]
+        self.log.info(f'Baking a golden image of version {version} on stack {name}')
+        start = time.monotonic()
+        try:
+            with Tracer().span(name, 'cluster.bake'):
+                stack = StackBuilder().provision(name, self.gen_node_names(node_types), node_types)
+                try:
+                    cluster = OpenshiftCluster(stack, self._fetch_nodes_from_stack_instances(stack))
+                    self._check_playbook_result('exchange_keys', StackBuilder().exchange_keys(stack))
+                    self._check_playbook_result('pre_install', self._run_pre_install(cluster, version, bake=True))
+                    image_name = self.GOLDEN_IMAGE_NAME_PATTERN.format(
+                        version=version, timestamp=datetime.now().strftime('%Y%m%d%H%M%S'))
+                    image_id = golden_images.image_service.snapshot(
+                        cluster.master_nodes[0].fqdn, image_name, metadata={'ocp_version': version})
+                    golden_images.image_service.wait_active(
+                        image_id, timeout=golden_images.config.get('snapshot_timeout', 1800))
+                    doc = golden_images.record(version, image_id, image_name, bake_time=time.monotonic() - start)
+                finally:
+                    StackBuilder().delete(stack)
+        finally:
+            Tracer().flush(name)
+        return doc
+
     def delete(self, cluster):
         """Deleting the cluster and the stack
             @param cluster: (`OpenshiftCluster`)
             @rtype: `Stack`
         """
         self.log.info(f'Deleting cluster: {cluster.name}')
-        return StackBuilder().delete(cluster.stack)
+        try:
+            with Tracer().span(cluster.name, 'cluster.delete'):
+                stack = StackBuilder().delete(cluster.stack)
+                get_metadata_store().delete(cluster.name)
+                return stack
+        finally:
+            self._record_phases(cluster.name)
 
 
 class Node(object):
@@ -193,6 +502,10 @@ class Node(object):
     def ssh(self):
         return self._stack_instance.ssh
 
+    def exec_command(self, command, timeout=None):
+        """Running a command on the node (see `StackInstance.exec_command`)"""
+        return self._stack_instance.exec_command(command, timeout)
+
     @property
     def fqdn(self):
         return self._stack_instance.fqdn
@@ -206,6 +519,50 @@ class Node(object):
         return self._stack_instance
 
 
+class OpenshiftClusterProxy(object):
+    """
+    A lightweight handle of a cluster that is resolved on first use.
+
+    Getting a cluster requires the stack lookup, its outputs and the nodes construction,
+    so the proxy defers all of that until an attribute of the cluster is accessed.
+    """
+
+    def __init__(self, name: str):
+        """
+        @param name: `str` The name of the cluster.
+        """
+        self._name = name
+        self._cluster = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        if self._cluster is None:
+            return '<{} name="{}"; unresolved>'.format(self.__class__.__name__, self._name)
+        return '<{} {}>'.format(self.__class__.__name__, self._cluster)
+
+    def __getattr__(self, name):
+        # The private attributes are the proxy's own; they are missing only on a proxy that was not initialized
+        # (e.g. copied or unpickled), where resolving would look them up again without an end
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def resolved(self):
+        return self._cluster is not None
+
+    def resolve(self):
+        """Return the `OpenshiftCluster` (fetching it on the first call)"""
+        with self._lock:
+            if self._cluster is None:
+                self._cluster = OpenshiftClusterBuilder().get(self._name)
+        return self._cluster
+
+
 class OpenshiftCluster(object):
     """
     The openshift cluster class.
@@ -237,7 +594,7 @@ class OpenshiftCluster(object):
 
     @property
     def version(self):
-        raw_ver = str(self.master_nodes[0].ssh.exec_command('oc version')[1].read())
+        raw_ver = self.master_nodes[0].exec_command('oc version').stdout
         return re.search(r'oc v([\d\.]+)', raw_ver).group(1)
 
     @property
@@ -246,7 +603,10 @@ class OpenshiftCluster(object):
 
     @cached_property
     def metadata(self):
-        return PickleShelf(os.path.join(self.mgmt_env.path, '.metadata'))
+        store = get_metadata_store()
+        # The metadata of the clusters that were created before the store is imported from their pickle file
+        store.migrate_pickle(self.name, os.path.join(self.mgmt_env.path, '.metadata'))
+        return ClusterMetadata(store, self.name)
 
     @property
     def stack(self):
@@ -272,5 +632,27 @@ class OpenshiftCluster(object):
     def mgmt_env(self):
         return self.stack.mgmt_env
 
-    def status(self):
-        pass  # TODO: implement status checking of the cluster (stack exists, connections, ocp running, etc.)
+    def fan_out(self, command, node_types=None, on_output=None, on_result=None, timeout=None, max_workers=None):
+        """Running a command on the nodes of the cluster in parallel (see `FanOut.run`).
+            @param command: `str` The command.
+            @param node_types: (`list` of `NodeType`) Only the nodes of these types (all the nodes by default).
+            @param on_output: `callable` Called with the node, the stream name and each output line as it arrives.
+            @param on_result: `callable` Called with the `NodeResult` of each node as it finishes.
+            @param timeout: `float` The time limit (seconds) of the command on each node.
+            @param max_workers: `int` The maximum number of nodes that run the command at once.
+            @rtype: `dict` of fqdn -> `NodeResult`
+        """
+        config = CONFIG_DATA.get('fanout', {})
+        nodes = [node for node in self.nodes if node_types is None or node.type in node_types]
+        fan_out = FanOut(max_workers=max_workers or config.get('max_workers', 16), timeout=config.get('timeout', 300))
+        return fan_out.run(nodes, command, on_output=on_output, on_result=on_result, timeout=timeout)
+
+    def status(self, checks=None, refresh=False):
+        """Checking the health of the cluster: the heat stack, the DNS records, the SSH connectivity,
+        the readiness of the nodes and the router. The checks run concurrently, and their results are
+        cached for their TTL (the config `health.ttl`), so repeated calls are cheap.
+            @param checks: `list` of `str` Only these checks (see `health.CLUSTER_CHECKS`).
+            @param refresh: `bool` Whether to run the checks even if their results are cached.
+            @rtype: `ClusterStatus`
+        """
+        return get_health_engine().run(self.name, self, checks, refresh)
@@ -0,0 +1,58 @@
+from openshift_pool.common import NodeType
+
+
+REGISTRY = 'registry.access.redhat.com'
+
+# The images that the deployment pulls on the nodes, by the node type (images of every node are under None).
+IMAGES = {
+    None: ['openshift3/ose-pod', 'openshift3/ose-deployer', 'openshift3/ose-sti-builder',
+           'openshift3/ose-docker-builder'],
+    NodeType.MASTER: [],
+    NodeType.INFRA: ['openshift3/ose-haproxy-router', 'openshift3/ose-docker-registry',
+                     'openshift3/registry-console'],
+    NodeType.COMPUTE: []
+}
+
+# The images that were added in a version (and are pulled by the later versions as well).
+VERSION_IMAGES = {
+    '3.5': {},
+    '3.6': {},
+    '3.7': {NodeType.MASTER: ['openshift3/ose-service-catalog'],
+            NodeType.INFRA: ['openshift3/ose-template-service-broker']},
+    '3.9': {NodeType.MASTER: ['openshift3/ose-web-console']}
+}
+
+
+def image_tag(version):
+    """Return the tag of the images of the openshift version, e.g. 'v3.9'.
+    When the pre-pulling is enabled, the installation inventory sets it as `openshift_image_tag`,
+    so the installer uses the pre-pulled images.
+        @param version: `str` The openshift version.
+    """
+    return f'v{version}'
+
+
+def images(version, node_type):
+    """Return the images that the deployment of the version pulls on a node of the type.
+        @param version: `str` The openshift version.
+        @param node_type: `NodeType` The type of the node.
+        @rtype: `list` of `str` The full image names (registry/repository:tag).
+    """
+    if version not in VERSION_IMAGES:
+        raise KeyError(f'No image list of version {version}')
+    repositories = IMAGES[None] + IMAGES[node_type]
+    for added_in in sorted(VERSION_IMAGES, key=lambda v: tuple(int(n) for n in v.split('.'))):
+        repositories += VERSION_IMAGES[added_in].get(node_type, [])
+        if added_in == version:
+            break
+    return [f'{REGISTRY}/{repository}:{image_tag(version)}' for repository in repositories]
+
+
+def mirrored(image, mirror=None):
+    """Return the source of the image in the registry mirror.
+        @param image: `str` The full image name.
+        @param mirror: `str` The registry mirror (host:port). None to pull from the origin registry.
+    """
+    if not mirror or not image.startswith(f'{REGISTRY}/'):
+        return image
+    return f'{mirror}/{image[len(REGISTRY) + 1:]}'
@@ -0,0 +1,83 @@
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from openshift_pool.common import Loggable
+from openshift_pool.openshift.ssh_pool import get_ssh_pool
+from openshift_pool.exceptions import CommandTimeoutException
+
+
+NodeResult = namedtuple('NodeResult', ['fqdn', 'node_type', 'exit_status', 'stdout', 'stderr', 'elapsed', 'error'])
+
+
+class FanOut(Loggable):
+    """
+    Running a command on many nodes in parallel.
+
+    At most `max_workers` nodes run the command at once, each with its own timeout, over the pooled
+    SSH connections. The output lines are passed to the callback as they arrive (per node and stream),
+    and the failure of a node (an error or a timeout) is reported in its result instead of raised.
+    """
+
+    def __init__(self, max_workers=16, timeout=300, user='root', password=None, port=22, ssh_pool=None):
+        """
+        @param max_workers: `int` The maximum number of nodes that run the command at once.
+        @param timeout: `float` The time limit (seconds) of the command on each node.
+        @param user: `str` The SSH user.
+        @param password: `str` The SSH password (None for the key based authentication).
+        @param port: `int` The SSH port.
+        @param ssh_pool: `SSHConnectionPool` The pool of the SSH connections (The pool of the process by default).
+        """
+        Loggable.__init__(self)
+        self._max_workers = max_workers
+        self._timeout = timeout
+        self._user = user
+        self._password = password
+        self._port = port
+        self._ssh_pool = ssh_pool
+
+    @property
+    def ssh_pool(self):
+        if self._ssh_pool is None:
+            self._ssh_pool = get_ssh_pool()
+        return self._ssh_pool
+
+    def _run_node(self, node, command, on_output, timeout):
+        start = time.monotonic()
+        callback = None
+        if on_output is not None:
+            def callback(stream, line):
+                on_output(node, stream, line)
+        try:
+            result = self.ssh_pool.stream_command(node.fqdn, command, callback, self._user, self._password,
+                                                  self._port, timeout)
+        except (Exception, CommandTimeoutException) as e:
+            self.log.error(f'Command "{command}" failed on {node.fqdn}: {e}')
+            return NodeResult(node.fqdn, node.type, None, '', '', time.monotonic() - start, str(e))
+        return NodeResult(node.fqdn, node.type, result.exit_status, result.stdout, result.stderr,
+                          time.monotonic() - start, None)
+
+    def run(self, nodes, command, on_output=None, on_result=None, timeout=None):
+        """Running the command on the nodes.
+            @param nodes: (`list` of `Node`) The nodes (any objects with fqdn and type).
+            @param command: `str` The command.
+            @param on_output: `callable` Called with the node, the stream name ('stdout' or 'stderr') and each
+                output line, as the lines arrive (from the threads of the nodes).
+            @param on_result: `callable` Called with the `NodeResult` of each node as it finishes.
+            @param timeout: `float` The time limit (seconds) of the command on each node (instead of the default).
+            @rtype: `dict` of fqdn -> `NodeResult` (in the order of the nodes)
+        """
+        nodes = list(nodes)
+        if not nodes:
+            return {}
+        timeout = timeout or self._timeout
+        self.log.info(f'Running "{command}" on {len(nodes)} nodes')
+        results = {}
+        with ThreadPoolExecutor(max_workers=min(self._max_workers, len(nodes))) as executor:
+            futures = [executor.submit(self._run_node, node, command, on_output, timeout) for node in nodes]
+            for future in as_completed(futures):
+                result = future.result()
+                results[result.fqdn] = result
+                if on_result is not None:
+                    on_result(result)
+        return {node.fqdn: results[node.fqdn] for node in nodes}
@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+
+from cached_property import cached_property
+
+from config import CONFIG_DATA
+from openshift_pool.common import Loggable
+from openshift_pool.db import DB, ASCENDING, DESCENDING
+from openshift_pool.openshift.image_service import OpenstackImageService, get_local_image_service
+
+
+class GoldenImages(Loggable):
+    """
+    The registry of the golden images - images of instances that the pre-installation already ran on,
+    one per openshift version.
+
+    An image is stale once it is older than `max_age_days`, once the base image in the config changed
+    or once it is not active anymore in the image service. Stale images are not used
+    (the version should be baked again) and they are dropped by `prune`.
+    """
+    STATE_ACTIVE = 'active'
+    STATE_STALE = 'stale'
+
+    def __init__(self, collection=None, image_service=None):
+        """
+        @param collection: The mongo collection of the registry (default: `golden_images` in the DB).
+        @param image_service: `ImageService` (default: by the `golden_images.service` config).
+        """
+        Loggable.__init__(self)
+        self._collection = collection
+        if image_service is not None:
+            self.image_service = image_service
+
+    @cached_property
+    def db(self):
+        """The collection of the registry (the DB is not touched until the registry is used)"""
+        collection = DB().golden_images if self._collection is None else self._collection
+        collection.create_index([('version', ASCENDING), ('state', ASCENDING)])
+        return collection
+
+    @property
+    def config(self):
+        return CONFIG_DATA.get('golden_images', {})
+
+    @property
+    def enabled(self):
+        return self.config.get('enabled', False)
+
+    @property
+    def max_age(self):
+        return timedelta(days=self.config.get('max_age_days', 14))
+
+    @property
+    def base_image(self):
+        return CONFIG_DATA['openstack']['parameters']['image']
+
+    @cached_property
+    def image_service(self):
+        if self.config.get('service', 'openstack') == 'local':
+            return get_local_image_service()
+        openstack = CONFIG_DATA['openstack']
+        return OpenstackImageService(openstack['auth_url'], openstack['username'], openstack['password'],
+                                     openstack['tenant_name'])
+
+    def record(self, version, image_id, image_name, bake_time=None):
+        """Recording a new baked image of the version (replacing the active one).
+            @param version: `str` The openshift version.
+            @param image_id: `str` The id of the image.
+            @param image_name: `str` The name of the image.
+            @param bake_time: `float` The number of seconds that the bake took.
+            @rtype: `dict` The record.
+        """
+        self.db.update_many({'version': version, 'state': self.STATE_ACTIVE},
+                            {'$set': {'state': self.STATE_STALE, 'stale_reason': 'Replaced by a newer image'}})
+        doc = {
+            'version': version, 'image_id': image_id, 'image_name': image_name, 'base_image': self.base_image,
+            'state': self.STATE_ACTIVE, 'baked_at': datetime.now(), 'bake_time': bake_time
+        }
+        self.db.insert_one(doc)
+        self.log.info(f'Golden image of version {version}: {image_name} ({image_id})')
+        return doc
+
+    def stale_reason(self, doc):
+        """Return the reason that the image is stale or None if it is not.
+            @param doc: `dict` The record of the image.
+        """
+        if doc['state'] == self.STATE_STALE:
+            return doc.get('stale_reason') or 'Marked as stale'
+        if datetime.now() - doc['baked_at'] > self.max_age:
+            return f'Older than {self.max_age.days} days'
+        if doc['base_image'] != self.base_image:
+            return f'Baked from another base image ({doc["base_image"]})'
+        image = self.image_service.get(doc['image_id'])
+        if image is None or image['status'] != self.image_service.STATUS_ACTIVE:
+            return 'The image is not active ({})'.format(image['status'] if image else 'deleted')
+
+    def mark_stale(self, doc, reason):
+        self.log.warning(f'Golden image {doc["image_name"]} of version {doc["version"]} is stale: {reason}')
+        self.db.update_one({'image_id': doc['image_id']},
+                           {'$set': {'state': self.STATE_STALE, 'stale_reason': reason}})
+
+    def get(self, version):
+        """Return the active golden image of the version or None if there is no fresh one.
+            @param version: `str` The openshift version.
+            @rtype: `dict`
+        """
+        doc = self.db.find_one({'version': version, 'state': self.STATE_ACTIVE}, sort=[('baked_at', DESCENDING)])
+        if doc is None:
+            return
+        reason = self.stale_reason(doc)
+        if reason:
+            self.mark_stale(doc, reason)
+            return
+        return doc
+
+    def list(self):
+        """Return all the records, with their current staleness"""
+        docs = list(self.db.find({}, {'_id': False}).sort([('version', ASCENDING), ('baked_at', DESCENDING)]))
+        for doc in docs:
+            doc['stale_reason'] = self.stale_reason(doc)
+        return docs
+
+    def prune(self):
+        """Deleting the stale images from the image service and from the registry.
+            @rtype: `list` of `dict` The records of the deleted images.
+        """
+        pruned = []
+        for doc in self.db.find({}):
+            reason = self.stale_reason(doc)
+            if not reason:
+                continue
+            self.log.info(f'Pruning golden image {doc["image_name"]} of version {doc["version"]}: {reason}')
+            self.image_service.delete(doc['image_id'])
+            self.db.delete_one({'_id': doc['_id']})
+            pruned.append(doc)
+        return pruned
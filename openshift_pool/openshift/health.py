@@ -0,0 +1,221 @@
+import time
+import socket
+import sqlite3
+import threading
+from datetime import datetime
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from config import CONFIG_DATA
+from openshift_pool.common import Loggable
+from openshift_pool.openshift.metadata_store import get_metadata_store
+
+
+CheckResult = namedtuple('CheckResult', ['name', 'ok', 'detail', 'elapsed', 'checked_at', 'cached'])
+ClusterStatus = namedtuple('ClusterStatus', ['name', 'healthy', 'checks', 'elapsed'])
+
+
+def check_heat(cluster):
+    """The stack of the cluster exists and its creation completed"""
+    status = cluster.stack.status
+    return status == 'CREATE_COMPLETE', f'stack status: {status or "not found"}'
+
+
+def check_dns(cluster):
+    """The records of all the nodes resolve to their public IPs"""
+    failed = []
+    for host in cluster.stack.outputs.hosts:
+        try:
+            addresses = {info[4][0] for info in socket.getaddrinfo(host.fqdn, None)}
+        except socket.gaierror as e:
+            failed.append(f'{host.fqdn}: {e}')
+            continue
+        if host.public_ip not in addresses:
+            failed.append(f'{host.fqdn}: resolves to {sorted(addresses)} instead of {host.public_ip}')
+    return not failed, '; '.join(failed) or 'all the records resolve'
+
+
+def check_ssh(cluster):
+    """All the nodes are reachable over SSH"""
+    results = cluster.stack.probe_connections()
+    unreachable = [f'{hostname}: {result.reason}' for hostname, result in results.items() if not result.reachable]
+    return not unreachable, '; '.join(unreachable) or f'{len(results)} nodes are reachable'
+
+
+def check_nodes(cluster):
+    """All the nodes of the cluster are registered and Ready (by `oc get nodes` on the first master)"""
+    result = cluster.master_nodes[0].exec_command('oc get nodes --no-headers', timeout=60)
+    if result.exit_status:
+        return False, f'oc get nodes failed: {result.stderr.strip()}'
+    statuses = dict(line.split()[:2] for line in result.stdout.splitlines() if line.strip())
+    not_ready = [f'{name}: {status}' for name, status in statuses.items() if 'Ready' not in status.split(',')]
+    missing = [node.fqdn for node in cluster.nodes if node.fqdn not in statuses]
+    problems = not_ready + [f'{fqdn}: not registered' for fqdn in missing]
+    return not problems, '; '.join(problems) or f'{len(statuses)} nodes are Ready'
+
+
+def check_router(cluster):
+    """The router pods are Running and all their containers are ready"""
+    result = cluster.master_nodes[0].exec_command(
+        'oc get pods -n default -l deploymentconfig=router --no-headers', timeout=60)
+    if result.exit_status:
+        return False, f'oc get pods failed: {result.stderr.strip()}'
+    pods = [line.split() for line in result.stdout.splitlines() if line.strip()]
+    if not pods:
+        return False, 'no router pods'
+    problems = []
+    for name, ready, status in (pod[:3] for pod in pods):
+        ready_containers, containers = ready.split('/')
+        if status != 'Running' or ready_containers != containers:
+            problems.append(f'{name}: {status} ({ready})')
+    return not problems, '; '.join(problems) or f'{len(pods)} router pods are running'
+
+
+# The checks of a cluster, in the order of the results
+CLUSTER_CHECKS = OrderedDict([
+    ('heat', check_heat),
+    ('dns', check_dns),
+    ('ssh', check_ssh),
+    ('nodes', check_nodes),
+    ('router', check_router),
+])
+
+
+class HealthEngine(Loggable):
+    """
+    Running health checks concurrently, each with its own TTL cache.
+
+    The result of a check is cached per target (e.g. cluster name) for the TTL of the check, so
+    repeated status calls within the window only run the expired checks, and concurrent calls share
+    the checks that are already running. A check that raises is a failed check (with the error as its
+    detail), so one broken check does not hide the results of the others.
+    With a store, the results are persisted and loaded on the first run of their target,
+    so the processes (e.g. the one-shot CLI runs) share the cached results.
+    """
+
+    def __init__(self, checks=None, ttls=None, default_ttl=30, max_workers=8, clock=time.monotonic, store=None):
+        """
+        @param checks: `OrderedDict` of name -> `callable` The checks; each returns (ok, detail) for a target.
+        @param ttls: `dict` of name -> seconds The TTL of the result of each check.
+        @param default_ttl: `float` The TTL of the checks that are not in ttls.
+        @param max_workers: `int` The maximum number of checks that run at once.
+        @param clock: `callable` The monotonic clock of the TTLs.
+        @param store: `MetadataStore` The store that the results are persisted to (None to cache in memory only).
+        """
+        Loggable.__init__(self)
+        self._checks = OrderedDict(checks if checks is not None else CLUSTER_CHECKS)
+        self._ttls = dict(ttls or {})
+        self._default_ttl = default_ttl
+        self._clock = clock
+        self._store = store
+        self._cache = {}
+        self._loaded = set()
+        self._running = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    @property
+    def checks(self):
+        return list(self._checks)
+
+    def ttl(self, name):
+        return self._ttls.get(name, self._default_ttl)
+
+    def _run_check(self, key, name, target):
+        start = self._clock()
+        try:
+            ok, detail = self._checks[name](target)
+        except BaseException as e:
+            ok, detail = False, f'{e.__class__.__name__}: {e}'
+        result = CheckResult(name, bool(ok), detail, self._clock() - start, datetime.now(), False)
+        with self._lock:
+            self._cache[(key, name)] = (start + self.ttl(name), result)
+            self._running.pop((key, name), None)
+        if self._store is not None:
+            try:
+                self._store.set_check_result(key, name, result)
+            except sqlite3.Error as e:
+                self.log.warning(f'Failed to persist the {name} check result of {key}: {e}')
+        return result
+
+    def _load(self, key):
+        """Caching the persisted results of the target that did not expire (once per target; under the lock)"""
+        if self._store is None or key in self._loaded:
+            return
+        self._loaded.add(key)
+        try:
+            persisted = self._store.check_results(key)
+        except sqlite3.Error as e:
+            self.log.warning(f'Failed to load the persisted check results of {key}: {e}')
+            return
+        # The persisted results expire by the wall clock (the monotonic clock is per process)
+        now, clock = datetime.now(), self._clock()
+        for name in self._checks:
+            result = persisted.get(name)
+            if result is None or (key, name) in self._cache:
+                continue
+            remaining = self.ttl(name) - (now - result.checked_at).total_seconds()
+            if remaining > 0:
+                self._cache[(key, name)] = (clock + remaining, result)
+
+    def run(self, key, target, names=None, refresh=False):
+        """Return the status of the target, running the checks whose cached results expired.
+            @param key: `str` The cache key of the target (e.g. the cluster name).
+            @param target: The object that the checks get (e.g. `OpenshiftCluster`).
+            @param names: `list` of `str` Only these checks (all the checks by default).
+            @param refresh: `bool` Whether to ignore the cached results.
+            @rtype: `ClusterStatus`
+        """
+        start = self._clock()
+        names = list(names or self._checks)
+        unknown = [name for name in names if name not in self._checks]
+        assert not unknown, f'Unknown health checks: {unknown}'
+        results, futures = {}, {}
+        with self._lock:
+            self._load(key)
+            for name in names:
+                cached = self._cache.get((key, name))
+                if cached is not None and not refresh and cached[0] > start:
+                    results[name] = cached[1]._replace(cached=True)
+                    continue
+                future = self._running.get((key, name))
+                if future is None:
+                    future = self._running[(key, name)] = self._executor.submit(self._run_check, key, name, target)
+                futures[name] = future
+        for name, future in futures.items():
+            results[name] = future.result()
+        checks = OrderedDict((name, results[name]) for name in names)
+        status = ClusterStatus(key, all(result.ok for result in checks.values()), checks, self._clock() - start)
+        self.log.debug(f'Health of {key}: {status}')
+        return status
+
+    def invalidate(self, key=None):
+        """Dropping the cached results (of a target, or all of them)"""
+        with self._lock:
+            keys = {cache_key[0] for cache_key in self._cache} | self._loaded if key is None else {key}
+            if key is None:
+                self._cache.clear()
+            else:
+                self._cache = {cache_key: value for cache_key, value in self._cache.items() if cache_key[0] != key}
+        if self._store is None:
+            return
+        for target in keys:
+            self._store.delete_check_results(target)
+
+
+_health_engine = None
+_health_engine_lock = threading.Lock()
+
+
+def get_health_engine() -> HealthEngine:
+    """Return the health engine of the clusters (with the TTLs of the config)"""
+    global _health_engine
+    if _health_engine is None:
+        with _health_engine_lock:
+            if _health_engine is None:
+                config = CONFIG_DATA.get('health', {})
+                _health_engine = HealthEngine(CLUSTER_CHECKS, ttls=config.get('ttl', {}),
+                                              default_ttl=config.get('default_ttl', 30),
+                                              max_workers=config.get('max_workers', 16),
+                                              store=get_metadata_store() if config.get('persist', True) else None)
+    return _health_engine
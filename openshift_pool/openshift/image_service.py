@@ -0,0 +1,151 @@
+import time
+import uuid
+import threading
+from abc import ABC, abstractmethod
+
+from cached_property import cached_property
+
+from openshift_pool.common import Loggable
+from openshift_pool.exceptions import ImageSnapshotFailedException
+
+
+class ImageService(Loggable, ABC):
+    """
+    The interface of the compute/image APIs that are used to bake golden images.
+    An implementation that misses one of the abstract methods fails on its instantiation.
+    """
+    STATUS_ACTIVE = 'active'
+    FAILED_STATUSES = ('killed', 'deleted')
+
+    def __init__(self):
+        Loggable.__init__(self)
+
+    @abstractmethod
+    def snapshot(self, server_name, image_name, metadata=None):
+        """Snapshotting a server into an image.
+            @param server_name: `str` The name of the server.
+            @param image_name: `str` The name of the new image.
+            @param metadata: `dict` The properties of the new image.
+            @rtype: `str` The id of the image.
+        """
+
+    @abstractmethod
+    def get(self, image_id):
+        """Return the image (a dict with at least `id`, `name` and `status`) or None if it does not exist.
+            @param image_id: `str` The id of the image.
+        """
+
+    @abstractmethod
+    def delete(self, image_id):
+        """Deleting the image.
+            @param image_id: `str` The id of the image.
+        """
+
+    def wait_active(self, image_id, timeout=1800, interval=10):
+        """Waiting for the image to become active.
+            @param image_id: `str` The id of the image.
+            @param timeout: `int` The maximum number of seconds to wait.
+            @param interval: `int` The number of seconds between the checks.
+            @raise ImageSnapshotFailedException: If the image failed or the timeout expired.
+            @rtype: `dict` The image.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            image = self.get(image_id)
+            status = image['status'] if image else 'deleted'
+            if status == self.STATUS_ACTIVE:
+                return image
+            if status in self.FAILED_STATUSES:
+                raise ImageSnapshotFailedException(image_id, f'Image status: {status}')
+            if time.monotonic() >= deadline:
+                raise ImageSnapshotFailedException(image_id, f'Timed out (status: {status})')
+            time.sleep(interval)
+
+
+class OpenstackImageService(ImageService):
+    """The nova (snapshots) and glance (images) implementation of `ImageService`"""
+
+    def __init__(self, auth_url, username, password, tenant_name):
+        self._auth_kwargs = dict(auth_url=auth_url, username=username, password=password, tenant_name=tenant_name)
+        ImageService.__init__(self)
+
+    @cached_property
+    def session(self):
+        from keystoneauth1 import session
+        from keystoneauth1.identity import v2
+        return session.Session(auth=v2.Password(**self._auth_kwargs))
+
+    @cached_property
+    def nova(self):
+        from novaclient import client as nova_client
+        return nova_client.Client('2', session=self.session)
+
+    @cached_property
+    def glance(self):
+        from glanceclient import Client as GlanceClient
+        return GlanceClient('2', session=self.session)
+
+    def snapshot(self, server_name, image_name, metadata=None):
+        server = self.nova.servers.find(name=server_name)
+        self.log.info(f'Snapshotting server {server_name} ({server.id}) into image {image_name}')
+        return self.nova.servers.create_image(server, image_name, metadata=metadata)
+
+    def get(self, image_id):
+        from glanceclient.exc import HTTPNotFound
+        try:
+            image = self.glance.images.get(image_id)
+        except HTTPNotFound:
+            return
+        return dict(image)
+
+    def delete(self, image_id):
+        from glanceclient.exc import HTTPNotFound
+        self.log.info(f'Deleting image {image_id}')
+        try:
+            self.glance.images.delete(image_id)
+        except HTTPNotFound:
+            pass
+
+
+class LocalImageService(ImageService):
+    """An in-memory `ImageService`, standing in for the OpenStack APIs (for tests and dry runs)"""
+
+    def __init__(self):
+        self._images = {}
+        self._lock = threading.Lock()
+        ImageService.__init__(self)
+
+    @property
+    def images(self):
+        with self._lock:
+            return {image_id: dict(image) for image_id, image in self._images.items()}
+
+    def snapshot(self, server_name, image_name, metadata=None):
+        image_id = str(uuid.uuid4())
+        with self._lock:
+            self._images[image_id] = dict(id=image_id, name=image_name, status=self.STATUS_ACTIVE,
+                                          server=server_name, metadata=dict(metadata or {}))
+        return image_id
+
+    def get(self, image_id):
+        with self._lock:
+            image = self._images.get(image_id)
+            return dict(image) if image else None
+
+    def delete(self, image_id):
+        with self._lock:
+            self._images.pop(image_id, None)
+
+
+_local_image_service = None
+_local_image_service_lock = threading.Lock()
+
+
+def get_local_image_service() -> LocalImageService:
+    """Return the local image service of the process (shared, so the images outlive the objects that use it)"""
+    global _local_image_service
+    if _local_image_service is None:
+        with _local_image_service_lock:
+            if _local_image_service is None:
+                _local_image_service = LocalImageService()
+    return _local_image_service
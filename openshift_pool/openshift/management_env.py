@@ -1,10 +1,9 @@
 import os
 import shutil
-
-import yaml
 import pickle
+import threading
 
-from openshift_pool.env import ENV
+from openshift_pool.env import ENV, LOG_REGISTRY
 from openshift_pool.exceptions import ManagementEnvAlreadyExists
 from openshift_pool.common import Loggable
 
@@ -32,8 +31,11 @@ class PickleShelf(dict):
         self.update(obj)
 
     def save(self):
-        with open(self._path, 'wb') as f:
+        # Writing to a temporary file and renaming, so a crash never leaves a truncated file
+        tmp_path = f'{self._path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
             pickle.dump(self, f)
+        os.replace(tmp_path, self._path)
 
 
 class ManagementEnv(Loggable):
@@ -67,6 +69,8 @@ class ManagementEnv(Loggable):
 
     def delete(self):
         """Deleting the management env directory."""
+        LOG_REGISTRY.flush()
+        LOG_REGISTRY.close_file(self.file_abspath('log.log'))
         shutil.rmtree(self.path)
 
     def clear(self):
@@ -85,14 +89,19 @@ class ManagementEnv(Loggable):
             @param content: `str` The file content.
         """
         self.log.info(f'Writing file: {filename}')
-        with open(self.file_abspath(filename), 'w') as f:
+        path = self.file_abspath(filename)
+        # Writing to a temporary file and renaming, so concurrent readers never see a partial file
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
             f.write(content)
+        os.replace(tmp_path, path)
 
     def write_yaml(self, filename, data):
         """Writing a yaml file with data in the management env directory.
             @param filename: `str` The file name.
             @param content: `dict` The yaml data.
         """
+        import yaml
         return self.write_file(filename, yaml.dump(data, default_flow_style=False))
 
     def read_file(self, filename):
@@ -108,4 +117,5 @@ class ManagementEnv(Loggable):
             @param filename: `str` The file name.
             @rtype: dict
         """
+        import yaml
         return yaml.load(self.read_file(filename))
@@ -0,0 +1,266 @@
+import os
+import pickle
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+
+from config import CONFIG_DATA
+from openshift_pool.env import ENV
+from openshift_pool.common import Loggable
+
+
+class MetadataStore(Loggable):
+    """
+    The metadata of all the clusters of the pool, in a single SQLite database (in WAL mode).
+
+    Every key of a cluster is a row, so an update writes only that key (atomically, by the database
+    transaction) and concurrent writers (threads and forked processes) are serialized by the database lock.
+    The indexed keys (owner, version, flavor and created_at) are also kept in a table of the pool,
+    so listing the clusters by them is a single query. The health check results are kept in their own
+    table, since they are written for any stack (not only the clusters of the pool).
+    """
+    INDEXED_KEYS = ('owner', 'version', 'flavor', 'created_at')
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS metadata ('
+        'cluster TEXT NOT NULL, key TEXT NOT NULL, value BLOB, PRIMARY KEY (cluster, key))',
+        'CREATE TABLE IF NOT EXISTS clusters ('
+        'name TEXT PRIMARY KEY, owner TEXT, version TEXT, flavor TEXT, created_at TEXT)',
+        'CREATE TABLE IF NOT EXISTS health ('
+        'cluster TEXT NOT NULL, name TEXT NOT NULL, result BLOB, PRIMARY KEY (cluster, name))',
+    ) + tuple(f'CREATE INDEX IF NOT EXISTS clusters_{key} ON clusters ({key})' for key in INDEXED_KEYS)
+
+    def __init__(self, path, timeout=30):
+        """
+        @param path: `str` The path of the database file.
+        @param timeout: `float` The seconds to wait for the lock of another writer.
+        """
+        Loggable.__init__(self)
+        self._path = path
+        self._timeout = timeout
+        self._local = threading.local()
+        with self.transaction() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def __repr__(self):
+        return '<{} {}>'.format(self.__class__.__name__, self._path)
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def connection(self):
+        """The connection of the current thread (and process; a connection is not used across a fork)"""
+        conn = getattr(self._local, 'connection', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self._path, timeout=self._timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection, self._local.pid = conn, os.getpid()
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """A write transaction; the database write lock is taken on its beginning"""
+        conn = self.connection
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            # A failed COMMIT (e.g. SQLITE_BUSY) leaves the transaction open, so the connection of the thread
+            # would otherwise fail its next BEGIN
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+
+    @staticmethod
+    def _index_value(key, value):
+        if value is None:
+            return None
+        if key == 'created_at':
+            return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+        return str(value)
+
+    def _set_items(self, conn, cluster, items):
+        conn.executemany('INSERT OR REPLACE INTO metadata (cluster, key, value) VALUES (?, ?, ?)',
+                         [(cluster, key, pickle.dumps(value)) for key, value in items.items()])
+        conn.execute('INSERT OR IGNORE INTO clusters (name) VALUES (?)', (cluster, ))
+        for key in self.INDEXED_KEYS:
+            if key in items:
+                conn.execute(f'UPDATE clusters SET {key} = ? WHERE name = ?',
+                             (self._index_value(key, items[key]), cluster))
+
+    def get(self, cluster, key, default=None):
+        row = self.connection.execute('SELECT value FROM metadata WHERE cluster = ? AND key = ?',
+                                      (cluster, key)).fetchone()
+        return default if row is None else pickle.loads(row[0])
+
+    def set(self, cluster, key, value):
+        """Writing a single key of the cluster metadata"""
+        self.update(cluster, {key: value})
+
+    def update(self, cluster, items):
+        """Writing the keys of the cluster metadata in a single transaction
+            @param cluster: `str` The cluster name.
+            @param items: `dict` The keys and values.
+        """
+        with self.transaction() as conn:
+            self._set_items(conn, cluster, items)
+
+    def delete_key(self, cluster, key):
+        with self.transaction() as conn:
+            deleted = conn.execute('DELETE FROM metadata WHERE cluster = ? AND key = ?', (cluster, key)).rowcount
+            if key in self.INDEXED_KEYS:
+                conn.execute(f'UPDATE clusters SET {key} = NULL WHERE name = ?', (cluster, ))
+        if not deleted:
+            raise KeyError(key)
+
+    def keys(self, cluster):
+        return [row[0] for row in self.connection.execute(
+            'SELECT key FROM metadata WHERE cluster = ? ORDER BY key', (cluster, ))]
+
+    def items(self, cluster):
+        """Return all the metadata of the cluster
+            @rtype: `dict`
+        """
+        return {key: pickle.loads(value) for key, value in self.connection.execute(
+            'SELECT key, value FROM metadata WHERE cluster = ?', (cluster, ))}
+
+    def delete(self, cluster):
+        """Deleting all the metadata of the cluster"""
+        with self.transaction() as conn:
+            conn.execute('DELETE FROM metadata WHERE cluster = ?', (cluster, ))
+            conn.execute('DELETE FROM clusters WHERE name = ?', (cluster, ))
+            conn.execute('DELETE FROM health WHERE cluster = ?', (cluster, ))
+
+    def set_check_result(self, cluster, name, result):
+        """Writing the result of a health check of the cluster (see `HealthEngine`)"""
+        with self.transaction() as conn:
+            conn.execute('INSERT OR REPLACE INTO health (cluster, name, result) VALUES (?, ?, ?)',
+                         (cluster, name, pickle.dumps(result)))
+
+    def check_results(self, cluster):
+        """Return the health check results of the cluster
+            @rtype: `dict` of check name -> `CheckResult`
+        """
+        return {name: pickle.loads(result) for name, result in self.connection.execute(
+            'SELECT name, result FROM health WHERE cluster = ?', (cluster, ))}
+
+    def delete_check_results(self, cluster):
+        with self.transaction() as conn:
+            conn.execute('DELETE FROM health WHERE cluster = ?', (cluster, ))
+
+    def clusters(self, owner=None, version=None, flavor=None, created_after=None, created_before=None):
+        """Listing the clusters of the pool by the indexed keys.
+            @param owner: The owner of the clusters.
+            @param version: `str` The version of the clusters.
+            @param flavor: `str` The flavor of the clusters.
+            @param created_after: `datetime` Only the clusters that created after this time.
+            @param created_before: `datetime` Only the clusters that created before this time.
+            @rtype: `list` of `dict` The indexed keys of each cluster (created_at as an iso string), oldest first.
+        """
+        conditions, params = [], []
+        for key, value in (('owner', owner), ('version', version), ('flavor', flavor)):
+            if value is not None:
+                conditions.append(f'{key} = ?')
+                params.append(self._index_value(key, value))
+        if created_after is not None:
+            conditions.append('created_at > ?')
+            params.append(self._index_value('created_at', created_after))
+        if created_before is not None:
+            conditions.append('created_at < ?')
+            params.append(self._index_value('created_at', created_before))
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        cursor = self.connection.execute(
+            f'SELECT name, {", ".join(self.INDEXED_KEYS)} FROM clusters {where} ORDER BY created_at, name', params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def migrate_pickle(self, cluster, pickle_path):
+        """Importing the metadata of a cluster from its (old) pickle file.
+        The file is renamed to <path>.migrated, so it is imported once.
+            @param cluster: `str` The cluster name.
+            @param pickle_path: `str` The path of the pickle file.
+            @rtype: `bool` Whether the file was imported.
+        """
+        if not os.path.isfile(pickle_path):
+            return False
+        with open(pickle_path, 'rb') as f:
+            data = dict(pickle.load(f))
+        with self.transaction() as conn:
+            # The keys that were already written to the store are newer than the pickled ones
+            existing = {row[0] for row in conn.execute('SELECT key FROM metadata WHERE cluster = ?', (cluster, ))}
+            self._set_items(conn, cluster, {key: value for key, value in data.items() if key not in existing})
+        os.replace(pickle_path, f'{pickle_path}.migrated')
+        self.log.info(f'Migrated the metadata of {cluster} from {pickle_path} ({len(data)} keys)')
+        return True
+
+    def migrate_workspace(self, workspace=None):
+        """Importing the pickle files of all the management envs in the workspace
+            @rtype: `list` of `str` The migrated clusters.
+        """
+        workspace = workspace or ENV['WORKSPACE']
+        return [name for name in sorted(os.listdir(workspace))
+                if self.migrate_pickle(name, os.path.join(workspace, name, '.metadata'))]
+
+
+class ClusterMetadata(MutableMapping):
+    """
+    The metadata of a single cluster, as a dict whose items are written to the store on set.
+    """
+
+    def __init__(self, store: MetadataStore, cluster: str):
+        self._store = store
+        self._cluster = cluster
+
+    def __repr__(self):
+        return '<{} {}>'.format(self.__class__.__name__, self._cluster)
+
+    def __getitem__(self, key):
+        missing = object()
+        value = self._store.get(self._cluster, key, missing)
+        if value is missing:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._store.set(self._cluster, key, value)
+
+    def __delitem__(self, key):
+        self._store.delete_key(self._cluster, key)
+
+    def __iter__(self):
+        return iter(self._store.keys(self._cluster))
+
+    def __len__(self):
+        return len(self._store.keys(self._cluster))
+
+    def get(self, key, default=None):
+        return self._store.get(self._cluster, key, default)
+
+    def update(self, *args, **kwargs):
+        """Writing all the items in a single transaction"""
+        self._store.update(self._cluster, dict(*args, **kwargs))
+
+    def save(self):
+        """The items are written on set; kept for the PickleShelf interface"""
+        pass
+
+
+_metadata_store = None
+_metadata_store_lock = threading.Lock()
+
+
+def get_metadata_store() -> MetadataStore:
+    """Return the metadata store of the pool (it is opened on the first call)"""
+    global _metadata_store
+    if _metadata_store is None:
+        with _metadata_store_lock:
+            if _metadata_store is None:
+                config = CONFIG_DATA.get('metadata', {})
+                _metadata_store = MetadataStore(config.get('path') or os.path.join(ENV['WORKSPACE'], 'metadata.db'),
+                                                config.get('timeout', 30))
+    return _metadata_store
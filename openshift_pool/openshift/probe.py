@@ -0,0 +1,112 @@
+import time
+import socket
+import subprocess
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from openshift_pool.common import Loggable
+from openshift_pool.openshift.ssh_pool import get_ssh_pool
+
+
+ProbeResult = namedtuple('ProbeResult', ['hostname', 'reachable', 'tcp', 'ssh', 'ping', 'latency', 'elapsed', 'reason'])
+
+
+class ConnectivityProber(Loggable):
+    """
+    Probing the connectivity of many hosts concurrently.
+
+    Each host is checked by a cheap TCP connect to the SSH port first, and only if the
+    port is open the SSH handshake and the ping are done. Every step has a timeout so
+    the wall clock time of a probe is bounded by the slowest host rather than the sum of all hosts.
+    The SSH check reuses the connections of the SSH pool, so a host is not handshaked again on every poll.
+    """
+
+    def __init__(self, username, password, port=22, connect_timeout=5, max_workers=16, ping=True, ssh_pool=None):
+        """
+        @param username: `str` The SSH username.
+        @param password: `str` The SSH password.
+        @param port: `int` The SSH port.
+        @param connect_timeout: `int` The timeout (seconds) of each connectivity check.
+        @param max_workers: `int` The maximum number of hosts that are probed in parallel.
+        @param ping: `bool` Whether to ping the host as well.
+        @param ssh_pool: `SSHConnectionPool` The pool of the SSH connections (The pool of the process by default).
+        """
+        self._username = username
+        self._password = password
+        self._port = port
+        self._connect_timeout = connect_timeout
+        self._max_workers = max_workers
+        self._ping = ping
+        self._ssh_pool = ssh_pool
+        Loggable.__init__(self)
+
+    @property
+    def ssh_pool(self):
+        if self._ssh_pool is None:
+            self._ssh_pool = get_ssh_pool()
+        return self._ssh_pool
+
+    def _check_tcp(self, hostname):
+        """Return the TCP connect latency (seconds) to the SSH port.
+            @raise OSError: When the port is not reachable.
+        """
+        start = time.monotonic()
+        with socket.create_connection((hostname, self._port), timeout=self._connect_timeout):
+            return time.monotonic() - start
+
+    def _check_ssh(self, hostname):
+        client = self.ssh_pool.get(hostname, self._username, self._password, self._port,
+                                   timeout=self._connect_timeout)
+        return client.get_transport().is_active()
+
+    def _check_ping(self, hostname):
+        result = subprocess.run(['ping', '-c', '1', '-W', str(self._connect_timeout), hostname],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return not result.returncode
+
+    def probe_host(self, hostname):
+        """Probing a single host.
+            @param hostname: `str` The host to probe.
+            @rtype: `ProbeResult`
+        """
+        import paramiko
+        start = time.monotonic()
+        tcp = ssh = ping = False
+        latency = reason = None
+        try:
+            latency = self._check_tcp(hostname)
+            tcp = True
+            ssh = self._check_ssh(hostname)
+            if not ssh:
+                reason = 'ssh transport is not active'
+            elif self._ping:
+                ping = self._check_ping(hostname)
+                if not ping:
+                    reason = 'no ping response'
+        except socket.gaierror as e:
+            reason = f'dns resolution failed: {e}'
+        except OSError as e:
+            stage = 'ssh' if tcp else f'tcp:{self._port}'
+            reason = f'{stage} connection failed: {e}'
+        except paramiko.SSHException as e:
+            reason = f'ssh failed: {e}'
+        except Exception as e:
+            # Any other error (e.g. of the SSH pool or of paramiko internals) is a failed probe of this host,
+            # rather than an error of the whole probe
+            stage = 'ping' if ssh else 'ssh' if tcp else 'tcp'
+            reason = f'{stage} probe failed: {e.__class__.__name__}: {e}'
+        reachable = tcp and ssh and (ping or not self._ping)
+        result = ProbeResult(hostname, reachable, tcp, ssh, ping, latency, time.monotonic() - start, reason)
+        self.log.debug(f'Probe result: {result}')
+        return result
+
+    def probe(self, hostnames):
+        """Probing the hosts concurrently.
+            @param hostnames: `list` of `str` The hosts to probe.
+            @rtype: `dict` of hostname -> `ProbeResult`
+        """
+        hostnames = list(hostnames)
+        if not hostnames:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self._max_workers, len(hostnames))) as executor:
+            return dict(zip(hostnames, executor.map(self.probe_host, hostnames)))
@@ -0,0 +1,82 @@
+import time
+import random
+from collections import namedtuple
+
+from openshift_pool.common import Loggable
+
+
+ReadinessReport = namedtuple('ReadinessReport', ['ready', 'converged', 'attempts', 'not_ready', 'elapsed'])
+
+
+class ReadinessWaiter(Loggable):
+    """
+    Waiting for a set of hosts to reach a condition (e.g. reachable by their domain).
+
+    Every host is tracked separately: once a host satisfies the condition it is not probed again,
+    and the hosts that are not ready yet are re-probed with an exponential backoff (with jitter).
+    The waiter returns as soon as all the hosts are ready or when the deadline is reached.
+    """
+
+    def __init__(self, probe, deadline=200, poll_interval=2, max_interval=30, backoff=2, jitter=0.2,
+                 clock=time.monotonic, sleep=time.sleep):
+        """
+        @param probe: `callable` Gets a list of hostnames and returns a dict of hostname -> probe result.
+        @param deadline: `int` The total number of seconds to wait.
+        @param poll_interval: `int` The initial number of seconds between two probes of a host.
+        @param max_interval: `int` The maximum number of seconds between two probes of a host.
+        @param backoff: `int` The factor that the interval is multiplied by after each failed probe.
+        @param jitter: `float` The relative random jitter that is applied to each interval.
+        """
+        self._probe = probe
+        self._deadline = deadline
+        self._poll_interval = poll_interval
+        self._max_interval = max_interval
+        self._backoff = backoff
+        self._jitter = jitter
+        self._clock = clock
+        self._sleep = sleep
+        Loggable.__init__(self)
+
+    def _next_interval(self, interval):
+        return min(interval * self._backoff, self._max_interval)
+
+    def _jittered(self, interval):
+        return interval * (1 + random.uniform(-self._jitter, self._jitter))
+
+    def wait(self, hostnames, condition):
+        """Waiting for all the hosts to satisfy the condition.
+            @param hostnames: `list` of `str` The hosts to wait for.
+            @param condition: `callable` Gets a probe result and returns whether the host is ready.
+            @rtype: `ReadinessReport`
+        """
+        start = self._clock()
+        end = start + self._deadline
+        next_probe = {hostname: start for hostname in hostnames}
+        intervals = {hostname: self._poll_interval for hostname in hostnames}
+        attempts = {hostname: 0 for hostname in hostnames}
+        converged = {}
+
+        while next_probe:
+            now = self._clock()
+            due = [hostname for hostname, at in next_probe.items() if at <= now]
+            if due:
+                results = self._probe(due)
+                now = self._clock()
+                for hostname in due:
+                    attempts[hostname] += 1
+                    if condition(results[hostname]):
+                        converged[hostname] = now - start
+                        del next_probe[hostname]
+                        self.log.info(f'{hostname} is ready after {converged[hostname]:.1f}s '
+                                      f'({attempts[hostname]} attempts)')
+                    else:
+                        next_probe[hostname] = now + self._jittered(intervals[hostname])
+                        intervals[hostname] = self._next_interval(intervals[hostname])
+            if not next_probe or now >= end:
+                break
+            self._sleep(max(0, min(min(next_probe.values()), end) - self._clock()))
+
+        not_ready = sorted(next_probe.keys())
+        if not_ready:
+            self.log.warning(f'Hosts are not ready after {self._clock() - start:.1f}s: {not_ready}')
+        return ReadinessReport(not not_ready, converged, attempts, not_ready, self._clock() - start)
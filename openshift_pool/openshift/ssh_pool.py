@@ -0,0 +1,240 @@
+import os
+import time
+import select
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+from config import CONFIG_DATA
+from openshift_pool.common import Loggable
+from openshift_pool.exceptions import CommandTimeoutException
+
+
+CommandResult = namedtuple('CommandResult', ['exit_status', 'stdout', 'stderr'])
+
+
+class _Connection(object):
+    """A pooled client and the time it was last used"""
+
+    def __init__(self, client):
+        self.client = client
+        self.last_used = time.monotonic()
+
+    @property
+    def active(self):
+        transport = self.client.get_transport()
+        return transport is not None and transport.is_active()
+
+
+class SSHConnectionPool(Loggable):
+    """
+    A process-wide pool of SSH connections, keyed by (host, user, port).
+
+    A connection is opened on the first use and reused by all the callers, with a keepalive so it
+    survives idle periods. Before a connection that idled longer than the keepalive interval is reused
+    it is health checked, and a dead connection is reopened. The concurrent channels per host are
+    limited by a semaphore, so parallel callers do not exceed the sessions limit of the SSH server.
+    """
+
+    def __init__(self, keepalive=30, max_channels=8, connect_timeout=10):
+        """
+        @param keepalive: `int` The keepalive interval (seconds) of the connections.
+        @param max_channels: `int` The maximum number of concurrent channels per host.
+        @param connect_timeout: `int` The timeout (seconds) of the connection, the banner and the authentication.
+        """
+        Loggable.__init__(self)
+        self._keepalive = keepalive
+        self._max_channels = max_channels
+        self._connect_timeout = connect_timeout
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._connections = {}
+        self._key_locks = {}
+        self._semaphores = {}
+        self._stats = {'handshakes': 0, 'reuses': 0, 'reconnects': 0}
+
+    @property
+    def stats(self):
+        """The number of handshakes, the reuses of open connections and the reconnects of dead ones"""
+        with self._lock:
+            return dict(self._stats, connections=len(self._connections))
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def _key_lock(self, key):
+        if self._pid != os.getpid():
+            # The connections of the parent are not used across a fork
+            self._reset()
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _semaphore(self, host, port):
+        with self._lock:
+            return self._semaphores.setdefault((host, port), threading.BoundedSemaphore(self._max_channels))
+
+    def _connect(self, host, user, password, port, timeout):
+        import paramiko
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        try:
+            client.connect(host, port=port, username=user, password=password, timeout=timeout,
+                           banner_timeout=timeout, auth_timeout=timeout)
+        except BaseException:
+            client.close()
+            raise
+        client.get_transport().set_keepalive(self._keepalive)
+        self._count('handshakes')
+        return client
+
+    def _healthy(self, connection):
+        if not connection.active:
+            return False
+        if time.monotonic() - connection.last_used > self._keepalive:
+            try:
+                connection.client.get_transport().send_ignore()
+            except Exception:
+                return False
+        return True
+
+    def get(self, host, user='root', password=None, port=22, timeout=None):
+        """Return the open client of the host and user (connecting, or reconnecting a dead connection).
+            @param host: `str` The host name.
+            @param user: `str` The SSH user.
+            @param password: `str` The SSH password (None for the key based authentication).
+            @param port: `int` The SSH port.
+            @param timeout: `float` The connect timeout (seconds) instead of the one of the pool.
+            @rtype: `paramiko.SSHClient`
+        """
+        key = (host, user, port)
+        with self._key_lock(key):
+            connection = self._connections.get(key)
+            if connection is not None and self._healthy(connection):
+                self._count('reuses')
+            else:
+                if connection is not None:
+                    self.log.info(f'SSH connection to {user}@{host} is dead, reconnecting')
+                    connection.client.close()
+                    self._count('reconnects')
+                connection = self._connections[key] = _Connection(
+                    self._connect(host, user, password, port, timeout or self._connect_timeout))
+            connection.last_used = time.monotonic()
+            return connection.client
+
+    def discard(self, host, user='root', port=22):
+        """Closing the connection of the host and user (the next use reconnects)"""
+        with self._key_lock((host, user, port)):
+            connection = self._connections.pop((host, user, port), None)
+        if connection is not None:
+            connection.client.close()
+
+    @contextmanager
+    def channel(self, host, user='root', password=None, port=22):
+        """Holding one of the channels of the host while the client is used"""
+        with self._semaphore(host, port):
+            yield self.get(host, user, password, port)
+
+    def exec_command(self, host, command, user='root', password=None, port=22, timeout=None):
+        """Running a command on the host over the pooled connection.
+        A connection that died while it was idle is reopened and the command is retried once.
+            @param host: `str` The host name.
+            @param command: `str` The command.
+            @param timeout: `float` The timeout (seconds) of the command channel.
+            @rtype: `CommandResult`
+        """
+        import paramiko
+        for attempt in range(2):
+            try:
+                with self.channel(host, user, password, port) as client:
+                    _, stdout, stderr = client.exec_command(command, timeout=timeout)
+                    out, err = stdout.read().decode(), stderr.read().decode()
+                    return CommandResult(stdout.channel.recv_exit_status(), out, err)
+            except (paramiko.SSHException, EOFError, ConnectionError):
+                if attempt:
+                    raise
+                self.discard(host, user, port)
+
+    def stream_command(self, host, command, on_output=None, user='root', password=None, port=22, timeout=None):
+        """Running a command on the host over the pooled connection, passing its output lines as they arrive.
+            @param host: `str` The host name.
+            @param command: `str` The command.
+            @param on_output: `callable` Called with the stream name ('stdout' or 'stderr') and each output line.
+            @param timeout: `float` The time limit (seconds) of the command.
+            @raise CommandTimeoutException: If the command did not finish in time (its channel is closed).
+            @rtype: `CommandResult`
+        """
+        import paramiko
+        deadline = time.monotonic() + timeout if timeout else None
+        with self._semaphore(host, port):
+            for attempt in range(2):
+                try:
+                    channel = self.get(host, user, password, port).get_transport().open_session()
+                    channel.exec_command(command)
+                    break
+                except (paramiko.SSHException, EOFError, ConnectionError):
+                    if attempt:
+                        raise
+                    self.discard(host, user, port)
+            streams = {'stdout': (channel.recv_ready, channel.recv, []),
+                       'stderr': (channel.recv_stderr_ready, channel.recv_stderr, [])}
+            pending = {name: b'' for name in streams}
+            try:
+                while True:
+                    received = False
+                    for name, (ready, recv, chunks) in streams.items():
+                        if not ready():
+                            continue
+                        data = recv(32768)
+                        received = True
+                        chunks.append(data)
+                        lines = (pending[name] + data).split(b'\n')
+                        pending[name] = lines.pop()
+                        if on_output is not None:
+                            for line in lines:
+                                on_output(name, line.decode(errors='replace'))
+                    # The deadline is checked on every pass, so a command that keeps printing times out as well
+                    if deadline is not None and time.monotonic() > deadline:
+                        raise CommandTimeoutException(host, command, timeout)
+                    if received:
+                        continue
+                    if channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+                        break
+                    # The channel pipe is set when stdout data arrives; stderr is polled on the wait timeout
+                    select.select([channel], [], [], 0.05)
+                exit_status = channel.recv_exit_status()
+            finally:
+                channel.close()
+        if on_output is not None:
+            for name, rest in pending.items():
+                if rest:
+                    on_output(name, rest.decode(errors='replace'))
+        return CommandResult(exit_status, *(b''.join(streams[name][2]).decode(errors='replace')
+                                            for name in ('stdout', 'stderr')))
+
+    def close(self):
+        """Closing all the connections"""
+        with self._lock:
+            connections, self._connections = list(self._connections.values()), {}
+        for connection in connections:
+            connection.client.close()
+
+
+_ssh_pool = None
+_ssh_pool_lock = threading.Lock()
+
+
+def get_ssh_pool() -> SSHConnectionPool:
+    """Return the SSH connection pool of the process"""
+    global _ssh_pool
+    if _ssh_pool is None:
+        with _ssh_pool_lock:
+            if _ssh_pool is None:
+                config = CONFIG_DATA.get('ssh_pool', {})
+                _ssh_pool = SSHConnectionPool(keepalive=config.get('keepalive', 30),
+                                              max_channels=config.get('max_channels', 8),
+                                              connect_timeout=config.get('connect_timeout', 10))
+    return _ssh_pool
@@ -1,24 +1,29 @@
 import os
 import subprocess
 import json
-import paramiko
-import time
 
 from cached_property import cached_property
-import keystoneclient.v2_0.client as ksclient
-from heatclient.client import Client
-from wait_for import wait_for, TimedOutError
 
 from config import CONFIG_DATA, CONFIG_DIR
 from openshift_pool.openshift.templates import templates
 from openshift_pool.common import Singleton, NodeType, Loggable
 from openshift_pool.exceptions import (StackNotFoundException,
                                        NameServerUpdateException,
+                                       InstanceNotReadyException,
                                        StackAlreadyExistsException,
                                        StackCreationFailedException,
+                                       StackDeletionFailedException,
                                        MissingConfiguragtion)
 from openshift_pool.openshift.management_env import ManagementEnv
-from openshift_pool.playbooks import run_ansible_playbook
+from openshift_pool.openshift.stack_registry import StackRegistry
+from openshift_pool.openshift.stack_outputs import StackOutputs
+from openshift_pool.openshift.probe import ConnectivityProber
+from openshift_pool.openshift.ssh_pool import get_ssh_pool
+from openshift_pool.openshift.readiness import ReadinessWaiter
+from openshift_pool.openshift.stack_watcher import StackWatcher
+from openshift_pool.openshift.stack_poller import StackStatusPoller
+from openshift_pool.playbooks import run_ansible_playbook, run_ansible_playbook_isolated, FactCache
+from openshift_pool.instrumentation import Tracer, timed
 
 
 class StackBuilder(Loggable, metaclass=Singleton):
@@ -44,57 +49,84 @@ class StackBuilder(Loggable, metaclass=Singleton):
         except KeyError as e:
             raise MissingConfiguragtion(str(e.args[0]))
 
+        import keystoneclient.v2_0.client as ksclient
         return ksclient.Client(**kwargs)
 
     @cached_property
     def heat_client(self):
         heat_url = self.keystone_client.service_catalog.url_for(
             service_type='orchestration', endpoint_type='publicURL')
+        from heatclient.client import Client
         return Client('1', endpoint=heat_url, token=self.keystone_client.auth_token)
 
-    def _config_domains(self, stack, method, check_connection_attempts=10):
+    @cached_property
+    def stack_registry(self):
+        """The registry of the tenant stacks, shared by all the `Stack` objects"""
+        return StackRegistry(self.heat_client, ttl=CONFIG_DATA.get('stack_registry', {}).get('ttl', 30))
+
+    @cached_property
+    def status_poller(self):
+        """A single poller that serves the status waits of all the in-flight stacks"""
+        return StackStatusPoller(self.heat_client, interval=CONFIG_DATA.get('stack_poller', {}).get('interval', 5),
+                                 registry=self.stack_registry)
+
+    def _config_domains(self, stack, method):
         """
         Either create or delete domains for the stack.
             @param stack: ('Stack') The stack
             @param method: ('str') either 'create' or 'delete'
+            @rtype: `ReadinessReport`
         """
         assert isinstance(stack, Stack)
         assert method in ('create', 'delete')
-        self.log.info(f'Config domains for "{stack.name}"; method={method}; '
-                      f'check_connection_attempts={check_connection_attempts};')
-        hosts_data = stack.hosts_data
-        infra_hosts = [hosts_data['host_ips'][name] for name in hosts_data['host_ips'].keys()
-                       if hosts_data['instance_types'][name] == NodeType.INFRA.value]
-        if not infra_hosts:
-            infra_hosts = [hosts_data['host_ips'][name] for name in hosts_data['host_ips'].keys()
-                           if hosts_data['instance_types'][name] == NodeType.MASTER.value]
-        hosts_data['apps_subdomain_ip'] = infra_hosts.pop()
+        self.log.info(f'Config domains for "{stack.name}"; method={method};')
+        outputs = stack.outputs
+        hosts_data = outputs.hosts_data()
+        infra_hosts = outputs.by_type(NodeType.INFRA.value) or outputs.by_type(NodeType.MASTER.value)
+        hosts_data['apps_subdomain_ip'] = infra_hosts[-1].public_ip
         nsupdate_name = '{}_domains'.format(method)
         nsupdate_path = stack.mgmt_env.file_abspath(nsupdate_name)
         stack.mgmt_env.write_file(nsupdate_path, getattr(templates, nsupdate_name).render(**hosts_data))
         nsupdate_results = subprocess.run(['nsupdate', nsupdate_path])
         assert not nsupdate_results.returncode, 'nsupdate failed: {}'.format(nsupdate_results.stdout)
-        connection_attempts = 1
 
-        # TODO: refactor this block to use wait_for
-        while connection_attempts < check_connection_attempts:
-            self.log.info(f'Waiting for the instances domains: connection_attempts={connection_attempts}')
-            connection_statuses = stack.get_connection_statuses()
-            if (
-                method == 'create' and all(connection_statuses.values()) or
-                method == 'delete' and not any(connection_statuses.values())
-                    ):
-                return
-            connection_attempts += 1
-
-            # Setting a delay before chacking the system stat again
-            time.sleep(20)
-
-        raise NameServerUpdateException(stack.name)
+        self.log.info('Waiting for the instances domains')
+        waiter = self._readiness_waiter(stack)
+        if method == 'create':
+            report = waiter.wait([host.fqdn for host in outputs.hosts], lambda result: result.reachable)
+        else:
+            report = waiter.wait([host.fqdn for host in outputs.hosts], lambda result: not result.reachable)
+        if not report.ready:
+            raise NameServerUpdateException(stack.name)
+        self.log.info(f'Domains are ready after {report.elapsed:.1f}s; '
+                      f'convergence times: {report.converged}')
+        return report
+
+    @staticmethod
+    def _readiness_waiter(stack):
+        readiness_config = CONFIG_DATA.get('readiness', {})
+        return ReadinessWaiter(stack.probe_connections,
+                               deadline=readiness_config.get('deadline', 200),
+                               poll_interval=readiness_config.get('poll_interval', 2),
+                               max_interval=readiness_config.get('max_interval', 30))
+
+    def wait_for_instance(self, stack, address):
+        """Waiting for an instance of the stack to be reachable over SSH (e.g. before its first playbook).
+            @param stack: `Stack`
+            @param address: `str` The address that the playbooks connect to (the public IP of the instance).
+            @raise InstanceNotReadyException: If the instance is not reachable by the readiness deadline.
+            @rtype: `ReadinessReport`
+        """
+        report = self._readiness_waiter(stack).wait([address], lambda result: result.reachable)
+        if not report.ready:
+            raise InstanceNotReadyException(stack.name, address)
+        return report
 
+    @timed('stack.dns_create')
     def _create_domains(self, stack):
         return self._config_domains(stack, 'create')
 
+    @timed('stack.dns_delete')
     def _delete_domains(self, stack):
         return self._config_domains(stack, 'delete')
 
@@ -102,27 +134,40 @@ class StackBuilder(Loggable, metaclass=Singleton):
         """Return whether the stack with the given name exists"""
         return Stack(name).create_complete
 
-    def exchange_keys(self, stack):
+    @timed('stack.exchange_keys')
+    def exchange_keys(self, stack, limit=None, isolated=False):
         """Exchanging the keys to the stack instances.
             @param stack: `Stack`
+            @param limit: `str` Limit the exchange to the hosts matching the pattern (default: all the instances).
+            @param isolated: `bool` Whether to run the playbook in its own process (so it could run in parallel).
         """
-        self.log.info('Exchanging keys to instances.')
+        self.log.info(f'Exchanging keys to instances. limit={limit}')
         stack.mgmt_env.write_file(
             'exchange_keys_inventory',
             templates.pre_install_inventory.render(**stack.hosts_data)
         )
-        return run_ansible_playbook(
+        runner = run_ansible_playbook_isolated if isolated else run_ansible_playbook
+        return runner(
             'exchange_keys', stack.mgmt_env.file_abspath('exchange_keys_inventory'), self.log, extra_vars=dict(
                 config_dir=CONFIG_DIR
-            )
+            ), fact_cache=stack.fact_cache, limit=limit
         )
 
-    def create(self, name, instance_names, instance_types):
+    @timed('stack.provision')
+    def provision(self, name, instance_names, instance_types, image=None):
+        """Creating the heat stack and waiting for its creation (without configuring the instances).
+            @param name: `str` The name of the stack.
+            @param instance_names: `list` of `str` The names of the instances.
+            @param instance_types: `list` of `NodeType` The types of the instances.
+            @param image: `str` The image of the instances (default: the image in the config), e.g. a golden image.
+            @rtype: `Stack`
+        """
         assert isinstance(name, str)
         assert len(instance_names) == len(instance_types)
         assert NodeType.MASTER in instance_types, 'Stack must include master instance'
 
-        self.log.info(f'Creating stack: name={name}; instance_names={instance_names}; instance_types={instance_types};')
+        self.log.info(f'Creating stack: name={name}; instance_names={instance_names}; instance_types={instance_types}; '
+                      f'image={image or "default"}')
 
         params = {}
 
@@ -130,6 +175,8 @@ class StackBuilder(Loggable, metaclass=Singleton):
         params['instances'] = list(zip(instance_names, [t.value for t in instance_types]))
         params.update(self.openstack_details['parameters'])
         params.update(self.openstack_details)
+        if image:
+            params['image'] = image
 
         stack = Stack(name)
         if stack.create_complete:
@@ -138,22 +185,64 @@ class StackBuilder(Loggable, metaclass=Singleton):
         stack.mgmt_env.write_file('ocp_stack.yaml', templates.ocp_stack.render(params=params))
         template = stack.mgmt_env.read_yaml('ocp_stack.yaml')
         template['heat_template_version'] = template['heat_template_version'].strftime('%Y-%m-%d')
-        self.heat_client.stacks.create(stack_name=stack.name, template=json.dumps(template))
+        response = self.heat_client.stacks.create(stack_name=stack.name, template=json.dumps(template))
+        self.stack_registry.invalidate(stack.name)
+        result = self.watch(stack, 'CREATE', stack_id=response['stack']['id'])
+        if result.status != 'CREATE_COMPLETE':
+            reason = '; '.join(f'{resource}: {reason}' for resource, reason in result.failed_resources.items())
+            reason = reason or result.reason or 'Timed out'
+            self.log.error(f'Stack creation failed. reason: {reason}')
+            raise StackCreationFailedException(stack.name, reason)
+        return stack
+
+    def create(self, name, instance_names, instance_types, image=None):
+        """Creating the stack, its domains and exchanging the keys to its instances.
+            @rtype: `Stack`
+        """
         try:
-            wait_for(lambda s: s.create_complete, [stack], delay=10, timeout=90, logger=self.log)
-        except TimedOutError:
-            self.log.error(f'Stack creatiopn failed. reason: {stack.stack_status_reason}')
-            raise StackCreationFailedException(stack.name, stack.stack_status_reason)
-        self._create_domains(stack)
-        self.exchange_keys(stack)
+            stack = self.provision(name, instance_names, instance_types, image=image)
+            self._create_domains(stack)
+            self.exchange_keys(stack)
+        finally:
+            Tracer().flush(name)
         return stack
 
+    def watch(self, stack, action, stack_id=None, watcher=None):
+        """Waiting for a stack action to be completed.
+        The status is polled by the shared `status_poller` (one API call per interval for all the
+        in-flight stacks) and the stack events are read once the stack reached a terminal status.
+            @param stack: `Stack` The stack.
+            @param action: `str` The stack action, 'CREATE' or 'DELETE'.
+            @param stack_id: `str` The id of the stack (default: resolved from the stack).
+            @param watcher: `StackWatcher` The watcher that was seeded before the action was issued
+                            (default: a new watcher, that reads all the events of the stack).
+            @rtype: `StackWatchResult`
+        """
+        watcher_config = CONFIG_DATA.get('stack_watcher', {})
+        watcher = watcher or StackWatcher(self.heat_client, stack.name, stack_id or stack.stack.id)
+        terminal_statuses = {f'{action}_COMPLETE', f'{action}_FAILED'}
+        if action == 'DELETE':
+            terminal_statuses.add(None)  # Deleted stacks are not listed
+        result = watcher.wait(action, timeout=watcher_config.get(f'{action.lower()}_timeout', 600),
+                              delay=watcher_config.get('delay', 2),
+                              status_future=self.status_poller.watch(stack.name, terminal_statuses))
+        stack.watch_results[action] = result
+        return result
+
+    @timed('stack.delete')
     def delete(self, stack):
         assert isinstance(stack, Stack)
         self.log.info(f'Deleting stack: {stack.name}')
         self._delete_domains(stack)
+        stack_id = stack.stack.id
+        # The stack may have the events of an earlier delete (e.g. DELETE_FAILED), which are not of this one
+        watcher = StackWatcher(self.heat_client, stack.name, stack_id)
+        watcher.seed()
         stack.stack.delete()
-        wait_for(lambda s: s.delete_complete, func_args=[stack], delay=10, timeout=120)
+        self.stack_registry.invalidate(stack.name)
+        result = self.watch(stack, 'DELETE', stack_id=stack_id, watcher=watcher)
+        if result.status != 'DELETE_COMPLETE':
+            raise StackDeletionFailedException(stack.name, result.reason or 'Timed out')
         stack.mgmt_env.delete()
 
 
@@ -163,12 +252,18 @@ class StackInstance(Loggable):
         self.fqdn = fqdn
         Loggable.__init__(self)
 
-    @cached_property
+    @property
     def ssh(self):
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        client.connect(self.fqdn, username='root')
-        return client
+        """The pooled (and health checked) SSH client of the instance"""
+        return get_ssh_pool().get(self.fqdn, 'root')
+
+    def exec_command(self, command, timeout=None):
+        """Running a command on the instance over the pooled SSH connection.
+            @param command: `str` The command.
+            @param timeout: `float` The timeout (seconds) of the command.
+            @rtype: `CommandResult`
+        """
+        return get_ssh_pool().exec_command(self.fqdn, command, 'root', timeout=timeout)
 
 
 class Stack(Loggable):
@@ -182,6 +277,9 @@ class Stack(Loggable):
         """
         self._name = name
         self._stack = None
+        self._outputs = None
+        self._watch_results = {}
+        self._fact_cache = None
         Loggable.__init__(self)
 
     @cached_property
@@ -198,7 +296,12 @@ class Stack(Loggable):
 
     @cached_property
     def instances(self):
-        return [StackInstance(fqdn) for fqdn in self.hosts_data['host_names'].values()]
+        return [StackInstance(host.fqdn) for host in self.outputs.hosts]
+
+    @property
+    def watch_results(self):
+        """The results (`StackWatchResult`) of the watched stack actions by action"""
+        return self._watch_results
 
     @cached_property
     def number_of_instances(self):
@@ -219,8 +322,7 @@ class Stack(Loggable):
     @property
     def stack(self):
         if not self._stack:
-            self._stack = next((s for s in self.heat_client.stacks.list()
-                                if s.stack_name == self.name), None)
+            self._stack = StackBuilder().stack_registry.get(self.name)
         return self._stack
 
     @property
@@ -254,71 +356,67 @@ class Stack(Loggable):
         self.stack.get()  # We won't get the outputs if we won't do not do this.
         return self.stack.outputs
 
+    @property
+    def outputs(self):
+        """Return the parsed outputs of the stack (`StackOutputs`).
+        The outputs are parsed once and cached until the updated time of the stack changes.
+        """
+        if self._outputs is not None and self._outputs.version == self.revision:
+            return self._outputs
+        raw_outputs = self.stack_outputs
+        self._outputs = StackOutputs(raw_outputs, self.config_data['dns_zone'], version=self.revision)
+        return self._outputs
+
+    @property
+    def revision(self):
+        """Return the revision of the stack - its id and the time it was last updated"""
+        stack = self.stack
+        if not stack:
+            return
+        return stack.id, getattr(stack, 'updated_time', None) or getattr(stack, 'creation_time', None)
+
+    @property
+    def fact_cache(self):
+        """Return the ansible facts cache of the stack (None if disabled).
+        The cache is invalidated when the stack revision changes (None if the stack does not exist)."""
+        fact_cache_config = (CONFIG_DATA.get('ansible') or {}).get('fact_cache') or {}
+        if not fact_cache_config.get('enabled', True):
+            return
+        revision = self.revision
+        if revision is None:
+            return
+        stamp = '{}:{}'.format(*revision)
+        if self._fact_cache is None:
+            self._fact_cache = FactCache(self.mgmt_env, stamp, timeout=fact_cache_config.get('timeout', 86400),
+                                         gather_subset=fact_cache_config.get('gather_subset', 'all'))
+        else:
+            self._fact_cache.validate(stamp)
+        return self._fact_cache
+
     @property
     def hosts_data(self):
-        outputs = self.stack_outputs
-
-        host_ips = {
-            o["output_key"].split("_public_ip")[0]: o["output_value"]
-            for o in outputs if o["output_key"].endswith("_public_ip")
-        }
-        host_names = {
-            o["output_key"].split("_name")[0]: o["output_value"]
-            for o in outputs if o["output_key"].endswith("_name")
-        }
-        ocp_deployment_pqdn = next(
-            o["output_value"] for o in outputs
-            if o["output_key"] == "ocp_deployment_pqdn")
-
-        ocp_servers_domain = "{}.{}".format(
-            ocp_deployment_pqdn, CONFIG_DATA['openstack']['dns_zone'])
-
-        instance_types = {
-            o["output_key"].split("_instance_type")[0]: o["output_value"]
-            for o in outputs if o["output_key"].endswith("_instance_type")
-        }
-
-        return {
-            'host_ips': host_ips,
-            'host_names': host_names,
-            'ocp_deployment_pqdn': ocp_deployment_pqdn,
-            'ocp_servers_domain': ocp_servers_domain,
-            'instance_types': instance_types
-        }
+        return self.outputs.hosts_data()
+
+    @cached_property
+    def prober(self):
+        probe_config = CONFIG_DATA.get('probe', {})
+        return ConnectivityProber(self.ssh_details['username'], self.ssh_details['password'],
+                                  connect_timeout=probe_config.get('connect_timeout', 5),
+                                  max_workers=probe_config.get('max_workers', 16))
+
+    def probe_connections(self, hostnames=None):
+        """Probing the connectivity of the stack instances concurrently.
+            @param hostnames: `list` of `str` The hosts to probe (default: all the stack instances).
+            @rtype: `dict` of hostname -> `ProbeResult`
+        """
+        if hostnames is None:
+            hostnames = [host.fqdn for host in self.outputs.hosts]
+        results = self.prober.probe(hostnames)
+        for result in results.values():
+            self.log.info(f"{result.hostname}: TCP {result.tcp}, SSH {result.ssh}, PING {result.ping}, "
+                          f"latency={result.latency}; elapsed={result.elapsed:.2f}s; reason={result.reason}")
+        return results
 
     def get_connection_statuses(self):
         """Return a LUT that contains each node and its connectivity by the domain"""
-
-        out = {}
-
-        def test_ping(hostname):
-            self.log.debug(f"testing ping connectivity to host {hostname}")
-            result = subprocess.run(['ping', '-c', '1', hostname], stdout = subprocess.PIPE)
-            self.log.debug(f"[STDOUT]: {result.stdout}")
-            self.log.debug(f"[STDERR]: {result.stderr}")
-            self.log.debug(f"[RC]: {result.returncode}")
-
-            return bool(not result.returncode)
-
-        def test_ssh(hostname, username, password):
-            try:
-                self.log.debug(f"testing ssh connectivity to host {hostname} (creds: {username}\{password})")
-                is_ssh = False
-                client = paramiko.SSHClient()
-                client.load_system_host_keys()
-                client.set_missing_host_key_policy(paramiko.MissingHostKeyPolicy())
-                client.connect(hostname,username=username,password=password)
-                is_ssh = client.get_transport().isAlive()
-            except Exception:
-                pass
-            finally:
-                client.close()
-                return is_ssh
-
-        for hostname in self.hosts_data['host_names'].values():
-            ssh_state = test_ssh(hostname, self.ssh_details["username"], self.ssh_details["password"])
-            ping_state = test_ping(hostname)
-            self.log.info(f"{hostname}: PING {ping_state}, SSH {ssh_state}")
-            out[hostname] = ssh_state and ping_state
-
-        return out
+        return {hostname: result.reachable for hostname, result in self.probe_connections().items()}
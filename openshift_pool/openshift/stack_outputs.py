@@ -0,0 +1,102 @@
+from collections import namedtuple
+
+
+StackHost = namedtuple('StackHost', ['key', 'fqdn', 'public_ip', 'private_ip', 'instance_type'])
+
+
+class StackOutputs(object):
+    """
+    An immutable snapshot of the stack outputs.
+
+    The raw outputs list is parsed once and indexed by host key, fqdn, instance type and IP
+    so the consumers don't need to scan the outputs over and over.
+    """
+    HOST_OUTPUT_SUFFIXES = {
+        '_public_ip': 'public_ip',
+        '_private_ip': 'private_ip',
+        '_name': 'fqdn',
+        '_instance_type': 'instance_type'
+    }
+
+    def __init__(self, outputs, dns_zone, version=None):
+        """
+        @param outputs: `list` of `dict` The raw stack outputs (as returned by heat).
+        @param dns_zone: `str` The dns zone of the stack instances.
+        @param version: The version of the stack that the outputs taken from (i.e. its updated time).
+        """
+        self._version = version
+        self._values = {o['output_key']: o['output_value'] for o in outputs}
+        fields = {}
+        for key, value in self._values.items():
+            for suffix, field in self.HOST_OUTPUT_SUFFIXES.items():
+                if key.endswith(suffix):
+                    fields.setdefault(key[:-len(suffix)], {})[field] = value
+                    break
+        self._hosts = {
+            key: StackHost(key, data.get('fqdn'), data.get('public_ip'),
+                           data.get('private_ip'), data.get('instance_type'))
+            for key, data in fields.items()
+        }
+        self._by_fqdn = {host.fqdn: host for host in self._hosts.values()}
+        self._by_ip = {}
+        self._by_type = {}
+        for host in self._hosts.values():
+            for ip in (host.public_ip, host.private_ip):
+                if ip:
+                    self._by_ip[ip] = host
+            self._by_type.setdefault(host.instance_type, []).append(host)
+        self._by_type = {key: tuple(hosts) for key, hosts in self._by_type.items()}
+        self._ocp_deployment_pqdn = self._values.get('ocp_deployment_pqdn')
+        self._ocp_servers_domain = '{}.{}'.format(self._ocp_deployment_pqdn, dns_zone)
+
+    def __repr__(self):
+        return '<{} hosts={}>'.format(self.__class__.__name__, list(self._hosts.keys()))
+
+    def __getitem__(self, output_key):
+        return self._values[output_key]
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def hosts(self):
+        return tuple(self._hosts.values())
+
+    @property
+    def ocp_deployment_pqdn(self):
+        return self._ocp_deployment_pqdn
+
+    @property
+    def ocp_servers_domain(self):
+        return self._ocp_servers_domain
+
+    def host(self, key):
+        """Return the host by its key (the instance name in the stack template)"""
+        return self._hosts[key]
+
+    def by_fqdn(self, fqdn):
+        return self._by_fqdn[fqdn]
+
+    def by_ip(self, ip):
+        return self._by_ip[ip]
+
+    def by_type(self, instance_type):
+        """Return the hosts of the given instance type.
+            @param instance_type: `str` The instance type value (e.g. 'master').
+            @rtype: `tuple` of `StackHost`
+        """
+        return self._by_type.get(instance_type, ())
+
+    def hosts_data(self):
+        """Return the hosts data in the format that the templates are rendered with.
+        A new dict is returned on every call so the callers are free to modify it.
+        """
+        return {
+            'host_ips': {host.key: host.public_ip for host in self.hosts},
+            'host_private_ips': {host.key: host.private_ip for host in self.hosts},
+            'host_names': {host.key: host.fqdn for host in self.hosts},
+            'ocp_deployment_pqdn': self.ocp_deployment_pqdn,
+            'ocp_servers_domain': self.ocp_servers_domain,
+            'instance_types': {host.key: host.instance_type for host in self.hosts}
+        }
@@ -0,0 +1,126 @@
+import time
+import threading
+from concurrent.futures import Future
+
+from openshift_pool.common import Loggable
+
+
+class StackStatusPoller(Loggable):
+    """
+    Polling the statuses of many stacks with a single API call per interval.
+
+    All the watched stack names are fetched by one filtered `stacks.list` on every tick,
+    and the status changes are fanned out to the listeners (callbacks) and to the waiters (futures).
+    A stack that is missing from the listing has a `None` status (not created yet or deleted).
+    """
+
+    def __init__(self, heat_client, interval=5, registry=None):
+        """
+        @param heat_client: `heatclient.v1.client.Client` The heat client.
+        @param interval: `int` The number of seconds between two polls.
+        @param registry: `StackRegistry` (optional) A registry to update with the polled stacks.
+        """
+        self._heat_client = heat_client
+        self._interval = interval
+        self._registry = registry
+        self._lock = threading.Lock()
+        self._statuses = {}
+        self._waiters = {}
+        self._listeners = {}
+        self._thread = None
+        self.api_calls = 0
+        Loggable.__init__(self)
+
+    @property
+    def watched(self):
+        with self._lock:
+            return set(self._waiters.keys()) | set(self._listeners.keys())
+
+    def status(self, name):
+        """Return the last polled status of the stack"""
+        return self._statuses.get(name)
+
+    def watch(self, name, statuses):
+        """Waiting for the stack to reach one of the statuses.
+            @param name: `str` The name of the stack.
+            @param statuses: `iterable` of `str` The statuses to wait for (`None` stands for a missing stack).
+            @rtype: `concurrent.futures.Future` that is resolved with the status.
+        """
+        future = Future()
+        with self._lock:
+            self._waiters.setdefault(name, []).append((set(statuses), future))
+        self._ensure_running()
+        return future
+
+    def add_listener(self, name, callback):
+        """Registering a callback that is called on every status change of the stack.
+            @param name: `str` The name of the stack.
+            @param callback: `callable` Called with (name, old_status, new_status).
+        """
+        with self._lock:
+            self._listeners.setdefault(name, []).append(callback)
+        self._ensure_running()
+
+    def remove_listener(self, name, callback):
+        with self._lock:
+            callbacks = self._listeners.get(name, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if not callbacks:
+                self._listeners.pop(name, None)
+
+    def poll(self):
+        """Polling the statuses of all the watched stacks (a single API call)"""
+        names = self.watched
+        if not names:
+            return
+        stacks = list(self._heat_client.stacks.list(filters={'name': sorted(names)}))
+        self.api_calls += 1
+        if self._registry is not None:
+            self._registry.update(stacks)
+        statuses = {name: None for name in names}
+        statuses.update({s.stack_name: s.stack_status.upper() for s in stacks if s.stack_name in names})
+        for name, status in statuses.items():
+            self._dispatch(name, status)
+
+    def _dispatch(self, name, status):
+        old_status = self._statuses.get(name)
+        self._statuses[name] = status
+        with self._lock:
+            listeners = list(self._listeners.get(name, []))
+            waiters = self._waiters.get(name, [])
+            done = [(statuses, future) for statuses, future in waiters if status in statuses]
+            pending = [(statuses, future) for statuses, future in waiters if status not in statuses
+                       and not future.cancelled()]
+            if pending:
+                self._waiters[name] = pending
+            else:
+                self._waiters.pop(name, None)
+        if old_status != status:
+            self.log.info(f'Stack "{name}" status: {old_status} -> {status}')
+            for callback in listeners:
+                try:
+                    callback(name, old_status, status)
+                except Exception as e:
+                    self.log.error(f'Stack status listener failed: {e}')
+        for _, future in done:
+            if not future.done():
+                future.set_result(status)
+
+    def _ensure_running(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stack-status-poller', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._waiters and not self._listeners:
+                    self._thread = None
+                    return
+            try:
+                self.poll()
+            except Exception as e:
+                self.log.error(f'Failed to poll the stacks statuses: {e}')
+            time.sleep(self._interval)
@@ -0,0 +1,114 @@
+import time
+import threading
+
+from openshift_pool.common import Loggable
+
+
+class StackRegistry(Loggable):
+    """
+    A name indexed cache of the heat stacks in the tenant.
+
+    Instead of scanning `heat_client.stacks.list()` for every lookup, the registry
+    lists the tenant stacks once per refresh and keeps them in a dict by name.
+    The whole listing expires after `ttl` seconds. A single entry could be invalidated
+    (e.g. after creating or deleting a stack) and then it is re-fetched by a targeted
+    `stacks.get` without re-listing the tenant.
+    """
+
+    def __init__(self, heat_client, ttl=30):
+        """
+        @param heat_client: `heatclient.v1.client.Client` The heat client.
+        @param ttl: `int` The number of seconds that the stacks listing is considered fresh.
+        """
+        self._heat_client = heat_client
+        self._ttl = ttl
+        self._stacks = {}
+        self._fetched_at = {}
+        self._listed_at = None
+        self._lock = threading.RLock()
+        self._stats = {'hits': 0, 'misses': 0, 'list_calls': 0, 'get_calls': 0}
+        Loggable.__init__(self)
+
+    @property
+    def ttl(self):
+        return self._ttl
+
+    @property
+    def stats(self):
+        """Return the hits/misses counters and the number of heat calls made by the registry"""
+        with self._lock:
+            return dict(self._stats)
+
+    def _is_fresh(self, fetched_at):
+        return fetched_at is not None and time.monotonic() - fetched_at < self._ttl
+
+    def refresh(self):
+        """Listing all the stacks in the tenant (single API call) and rebuilding the index"""
+        with self._lock:
+            self.log.debug('Refreshing the stack registry')
+            stacks = list(self._heat_client.stacks.list())
+            now = time.monotonic()
+            self._stacks = {s.stack_name: s for s in stacks}
+            self._fetched_at = {name: now for name in self._stacks}
+            self._listed_at = now
+            self._stats['list_calls'] += 1
+
+    def update(self, stacks):
+        """Updating the registry with stacks that were fetched by someone else (e.g. a filtered listing).
+            @param stacks: `list` of heat stacks.
+        """
+        with self._lock:
+            now = time.monotonic()
+            for stack in stacks:
+                self._stacks[stack.stack_name] = stack
+                self._fetched_at[stack.stack_name] = now
+
+    def _fetch_one(self, name):
+        """Fetching a single stack by its name (targeted API call)"""
+        from heatclient import exc as heat_exc
+        self._stats['get_calls'] += 1
+        try:
+            stack = self._heat_client.stacks.get(name)
+        except heat_exc.HTTPNotFound:
+            stack = None
+        if stack is None:
+            self._stacks.pop(name, None)
+        else:
+            self._stacks[name] = stack
+        self._fetched_at[name] = time.monotonic()
+        return stack
+
+    def get(self, name):
+        """Return the heat stack with the given name or None if there is no such stack.
+            @param name: `str` The name of the stack.
+        """
+        with self._lock:
+            if not self._is_fresh(self._listed_at):
+                self._stats['misses'] += 1
+                self.refresh()
+                return self._stacks.get(name)
+            if name in self._fetched_at and not self._is_fresh(self._fetched_at[name]):
+                self._stats['misses'] += 1
+                return self._fetch_one(name)
+            self._stats['hits'] += 1
+            return self._stacks.get(name)
+
+    def names(self):
+        """Return the names of all the stacks in the tenant"""
+        with self._lock:
+            if not self._is_fresh(self._listed_at):
+                self._stats['misses'] += 1
+                self.refresh()
+            else:
+                self._stats['hits'] += 1
+            return list(self._stacks.keys())
+
+    def invalidate(self, name=None):
+        """Invalidating an entry so the next lookup will re-fetch it.
+            @param name: `str` The name of the stack to invalidate. If None, the whole registry is invalidated.
+        """
+        with self._lock:
+            if name is None:
+                self._listed_at = None
+            else:
+                self._fetched_at[name] = None
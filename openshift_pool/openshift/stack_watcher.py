@@ -0,0 +1,150 @@
+import time
+from datetime import datetime
+from collections import namedtuple
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from openshift_pool.common import Loggable
+
+
+ResourceTiming = namedtuple('ResourceTiming', ['resource_name', 'action', 'status', 'started_at', 'finished_at',
+                                               'duration'])
+StackWatchResult = namedtuple('StackWatchResult', ['stack_name', 'action', 'status', 'reason', 'failed_resources',
+                                                   'timings', 'elapsed'])
+
+
+def parse_event_time(value):
+    """Parsing the event time as returned by the heat API"""
+    for fmt in ('%Y-%m-%dT%H:%M:%SZ', '%Y-%m-%dT%H:%M:%S.%fZ', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f'):
+        try:
+            return datetime.strptime(value, fmt)
+        except (TypeError, ValueError):
+            continue
+
+
+class StackWatcher(Loggable):
+    """
+    Watching a stack action (create/delete) by reading the heat stack events incrementally.
+
+    Only the events that were not seen yet are fetched (by using the last event id as a marker).
+    The watcher returns as soon as the stack reaches a terminal state for the action, reports
+    the resources that failed and the provisioning duration of each resource.
+    """
+    EVENTS_PAGE_SIZE = 100
+
+    def __init__(self, heat_client, stack_name, stack_id):
+        """
+        @param heat_client: `heatclient.v1.client.Client` The heat client.
+        @param stack_name: `str` The name of the stack.
+        @param stack_id: `str` The id of the stack.
+        """
+        self._heat_client = heat_client
+        self._stack_name = stack_name
+        self._stack_id = stack_id
+        self._marker = None
+        self._started = {}
+        self._timings = {}
+        self._failed_resources = {}
+        self._stack_events = []
+        Loggable.__init__(self)
+
+    @property
+    def stack_identifier(self):
+        return f'{self._stack_name}/{self._stack_id}'
+
+    def seed(self):
+        """Skipping the events that already exist (e.g. a DELETE_FAILED of an earlier attempt).
+        Called before the action is issued, so only the events of the action are processed.
+        """
+        events = self._heat_client.events.list(self.stack_identifier, limit=1, sort_dir='desc')
+        if events:
+            self._marker = events[0].id
+
+    def fetch_events(self):
+        """Fetching the events that were not fetched yet.
+            @rtype: `list` of heat events.
+        """
+        events = []
+        while True:
+            page = self._heat_client.events.list(self.stack_identifier, marker=self._marker,
+                                                 limit=self.EVENTS_PAGE_SIZE, sort_dir='asc')
+            if not page:
+                break
+            events.extend(page)
+            self._marker = page[-1].id
+            if len(page) < self.EVENTS_PAGE_SIZE:
+                break
+        for event in events:
+            self._process_event(event)
+        return events
+
+    def _process_event(self, event):
+        status = event.resource_status
+        action, _, state = status.partition('_')
+        name = event.resource_name
+        if name == self._stack_name:
+            self._stack_events.append(event)
+            return
+        key = (name, action)
+        event_time = parse_event_time(event.event_time)
+        if state == 'IN_PROGRESS':
+            self._started[key] = event_time
+        elif state in ('COMPLETE', 'FAILED'):
+            started_at = self._started.get(key)
+            duration = (event_time - started_at).total_seconds() if started_at and event_time else None
+            self._timings[key] = ResourceTiming(name, action, status, started_at, event_time, duration)
+            if state == 'FAILED':
+                self._failed_resources[name] = event.resource_status_reason
+                self.log.error(f'Resource "{name}" of stack "{self._stack_name}" failed: '
+                               f'{event.resource_status_reason}')
+
+    def _terminal_event(self, action):
+        return next((event for event in reversed(self._stack_events)
+                     if event.resource_status in (f'{action}_COMPLETE', f'{action}_FAILED')), None)
+
+    def timings(self, action=None):
+        """Return the provisioning timings of the resources (slowest first).
+            @param action: `str` Filter by action (e.g. 'CREATE').
+            @rtype: `list` of `ResourceTiming`
+        """
+        timings = [t for t in self._timings.values() if action is None or t.action == action]
+        return sorted(timings, key=lambda t: t.duration or 0, reverse=True)
+
+    def wait(self, action, timeout, delay=2, status_future=None):
+        """Waiting for the stack to reach a terminal state of the action.
+            @param action: `str` The stack action, 'CREATE' or 'DELETE'.
+            @param timeout: `int` The number of seconds to wait.
+            @param delay: `int` The number of seconds between two events fetches.
+            @param status_future: `Future` (optional) Resolved when the stack reached a terminal status
+                                  (see `StackStatusPoller.watch`). When given, the events are fetched only
+                                  after it resolved instead of polling them.
+            @rtype: `StackWatchResult` (its status is None if the timeout reached).
+        """
+        from heatclient import exc as heat_exc
+        start = time.monotonic()
+        status = reason = None
+        if status_future is not None:
+            try:
+                status_future.result(timeout=timeout)
+            except FutureTimeoutError:
+                status_future.cancel()
+        while True:
+            try:
+                self.fetch_events()
+            except heat_exc.HTTPNotFound:
+                if action != 'DELETE':
+                    raise
+                status, reason = 'DELETE_COMPLETE', 'Stack not found'
+                break
+            event = self._terminal_event(action)
+            if event is not None:
+                status, reason = event.resource_status, event.resource_status_reason
+                break
+            if time.monotonic() - start >= timeout:
+                self.log.error(f'Timed out waiting for {action} of stack "{self._stack_name}"')
+                break
+            time.sleep(delay)
+        result = StackWatchResult(self._stack_name, action, status, reason, dict(self._failed_resources),
+                                  self.timings(action), time.monotonic() - start)
+        self.log.info(f'Stack "{self._stack_name}" {action}: status={status}; elapsed={result.elapsed:.1f}s; '
+                      f'slowest resources: {[(t.resource_name, t.duration) for t in result.timings[:5]]}')
+        return result
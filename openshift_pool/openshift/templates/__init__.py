@@ -1,12 +1,75 @@
-import glob
 import os
+import threading
 
-from jinja2 import Template
 
-from openshift_pool.common import AttributeDict
+TEMPLATES_DIR = os.path.dirname(__file__)
+TEMPLATE_EXTENSION = '.j2'
 
 
-templates = AttributeDict()
-for template_path in glob.glob('{}/*.j2'.format(os.path.dirname(__file__))):
-    with open(template_path, 'r') as template:
-        templates[os.path.basename(template_path).split('.')[0]] = Template(template.read())
+class TemplateRegistry(object):
+    """
+    The templates of a directory by name - the file name without its extensions (e.g. `ocp_stack`
+    for ocp_stack.yaml.j2), accessible as attributes or items.
+
+    Nothing is read on import (not even jinja2): the environment is created on the first access and
+    every template is compiled on its first access. The compiled bytecode is cached on disk, so the
+    next processes load it instead of compiling the template again.
+    """
+
+    def __init__(self, directory, bytecode_cache_dir=None):
+        """
+        @param directory: `str` The directory of the templates.
+        @param bytecode_cache_dir: `str` The directory of the bytecode cache (default: a private temp directory).
+        """
+        self._directory = directory
+        self._bytecode_cache_dir = bytecode_cache_dir
+        self._environment = None
+        self._names = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<{} {}>'.format(self.__class__.__name__, self._directory)
+
+    @property
+    def environment(self):
+        with self._lock:
+            if self._environment is None:
+                from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+                self._environment = Environment(
+                    loader=FileSystemLoader(self._directory),
+                    bytecode_cache=FileSystemBytecodeCache(self._bytecode_cache_dir)
+                )
+            return self._environment
+
+    @property
+    def names(self):
+        """The template file names by the template names"""
+        with self._lock:
+            if self._names is None:
+                self._names = {filename.split('.')[0]: filename for filename in os.listdir(self._directory)
+                               if filename.endswith(TEMPLATE_EXTENSION)}
+            return self._names
+
+    def keys(self):
+        return self.names.keys()
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def __getitem__(self, name):
+        """Return the compiled template (the environment keeps it, so it is compiled once)"""
+        return self.environment.get_template(self.names[name])
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(f'No such template: {name}')
+
+
+templates = TemplateRegistry(TEMPLATES_DIR, os.environ.get('OPENSHIFT_POOL_JINJA_CACHE'))
@@ -0,0 +1,141 @@
+import time
+import threading
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from openshift_pool.common import Loggable
+from openshift_pool.exceptions import PipelineStageFailedException
+
+
+StageResult = namedtuple('StageResult', ['name', 'deps', 'started_at', 'finished_at', 'duration', 'error'])
+PipelineReport = namedtuple('PipelineReport', ['name', 'results', 'critical_path', 'elapsed'])
+
+
+class Stage(object):
+    """A single unit of work in a `Pipeline`"""
+
+    def __init__(self, name, func, deps=()):
+        """
+        @param name: `str` The name of the stage.
+        @param func: `callable` The work of the stage (called without arguments).
+        @param deps: `iterable` of `str` The names of the stages that must complete before this one.
+        """
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+
+    def __repr__(self):
+        return '<{} {} deps={}>'.format(self.__class__.__name__, self.name, list(self.deps))
+
+
+class Pipeline(Loggable):
+    """
+    A dependency graph of stages.
+
+    Every stage starts as soon as all its dependencies completed, so independent stages run in parallel.
+    If a stage fails, the stages that were not started yet are skipped and the pipeline raises
+    once the running stages finished. The report includes the critical path of the run -
+    the chain of stages that determined its total duration.
+    """
+
+    def __init__(self, name, max_workers=16):
+        """
+        @param name: `str` The name of the pipeline.
+        @param max_workers: `int` The maximum number of stages that run at once.
+        """
+        self._name = name
+        self._max_workers = max_workers
+        self._stages = OrderedDict()
+        Loggable.__init__(self)
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def stages(self):
+        return list(self._stages.values())
+
+    def add(self, name, func, deps=()):
+        """Adding a stage to the pipeline.
+            @param name: `str` The name of the stage.
+            @param func: `callable` The work of the stage (called without arguments).
+            @param deps: `iterable` of `str` The names of the stages that must complete before this one.
+            @rtype: `str` The name of the stage.
+        """
+        assert name not in self._stages, f'Stage "{name}" already exists'
+        missing = [dep for dep in deps if dep not in self._stages]
+        assert not missing, f'Stage "{name}" depends on unknown stages: {missing}'
+        self._stages[name] = Stage(name, func, deps)
+        return name
+
+    def run(self):
+        """Running the pipeline.
+            @raise PipelineStageFailedException: If a stage failed.
+            @rtype: `PipelineReport`
+        """
+        start = time.monotonic()
+        self.log.info(f'Running pipeline {self._name}: {self.stages}')
+        results = {}
+        pending = OrderedDict(self._stages)
+        running = set()
+        failure = None
+        condition = threading.Condition()
+
+        def run_stage(stage):
+            started_at = time.monotonic()
+            error = None
+            try:
+                stage.func()
+            except BaseException as e:
+                error = e
+            finished_at = time.monotonic()
+            with condition:
+                results[stage.name] = StageResult(stage.name, stage.deps, started_at - start, finished_at - start,
+                                                  finished_at - started_at, error)
+                running.discard(stage.name)
+                condition.notify()
+
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            with condition:
+                while True:
+                    failure = failure or next((r for r in results.values() if r.error is not None), None)
+                    if not failure:
+                        ready = [stage for stage in pending.values()
+                                 if all(dep in results for dep in stage.deps)]
+                        for stage in ready:
+                            del pending[stage.name]
+                            running.add(stage.name)
+                            self.log.info(f'Pipeline {self._name}: starting stage {stage.name}')
+                            executor.submit(run_stage, stage)
+                    if not running:
+                        break
+                    condition.wait()
+
+        elapsed = time.monotonic() - start
+        if failure:
+            self.log.error(f'Pipeline {self._name}: stage {failure.name} failed: {failure.error}; '
+                           f'skipped stages: {list(pending.keys())}')
+            raise PipelineStageFailedException(self._name, failure.name, failure.error)
+        report = PipelineReport(self._name, [results[name] for name in self._stages],
+                                self.critical_path(results), elapsed)
+        self.log.info(f'Pipeline {self._name} completed in {elapsed:.1f}s; critical path: '
+                      f'{[(name, round(results[name].duration, 1)) for name in report.critical_path]}')
+        return report
+
+    @staticmethod
+    def critical_path(results):
+        """Return the chain of stages that determined the total duration.
+        Starting from the stage that finished last, walking back through the dependency that finished last
+        (i.e. the one that the stage waited for).
+            @param results: `dict` of stage name -> `StageResult`
+            @rtype: `list` of `str`
+        """
+        if not results:
+            return []
+        current = max(results.values(), key=lambda r: r.finished_at)
+        path = [current.name]
+        while current.deps:
+            current = max((results[dep] for dep in current.deps), key=lambda r: r.finished_at)
+            path.append(current.name)
+        return list(reversed(path))
@@ -1,10 +1,10 @@
 import os
+import multiprocessing
 
-from ansible.parsing.dataloader import DataLoader
-from ansible.vars.manager import VariableManager
-from ansible.executor.playbook_executor import PlaybookExecutor
-from ansible.inventory.manager import InventoryManager
 from config import CONFIG_DATA
+from openshift_pool.env import LOG_REGISTRY
+from openshift_pool.playbooks.fact_cache import FactCache  # noqa: F401
+from openshift_pool.exceptions import AnsibleRunFailedException
 
 
 PLAYBOOKS_DIR = os.path.join(os.path.dirname(__file__))
@@ -14,9 +14,9 @@ class Options(object):
     # Playbook executor options
     def __init__(self, listtags=False, listtasks=False, listhosts=False, syntax=False,
                  connection='ssh', module_path=None, forks=5, remote_user='cloud-user',
-                 private_key_file=CONFIG_DATA['private_key_file'], ssh_common_args='-o StrictHostKeyChecking=no',
+                 private_key_file=None, ssh_common_args='-o StrictHostKeyChecking=no',
                  ssh_extra_args=None, sftp_extra_args=None, scp_extra_args=None, become=True, become_method='sudo',
-                 become_user='root', verbosity=3, check=False, diff=False):
+                 become_user='root', verbosity=3, check=False, diff=False, tags=(), skip_tags=()):
         self.listtags = listtags
         self.listtasks = listtasks
         self.listhosts = listhosts
@@ -25,7 +25,7 @@ class Options(object):
         self.module_path = module_path
         self.forks = forks
         self.remote_user = remote_user
-        self.private_key_file = private_key_file
+        self.private_key_file = private_key_file or CONFIG_DATA['private_key_file']
         self.ssh_common_args = ssh_common_args
         self.ssh_extra_args = ssh_extra_args
         self.sftp_extra_args = sftp_extra_args
@@ -36,34 +36,184 @@ class Options(object):
         self.verbosity = verbosity
         self.check = check
         self.diff = diff
+        self.tags = list(tags)
+        self.skip_tags = list(skip_tags)
 
 
-def run_ansible_playbook(playbook_name, inventory_path, logger, extra_vars={}, options={}):
+class RunnerProfile(object):
+    """
+    A set of ansible runner settings (forks, pipelining, SSH connection reuse and strategy).
+
+    The profiles are defined in the config file under `ansible.profiles` (on top of the builtin ones)
+    and the profile to use is either `ansible.profile` or the one that is passed per run.
+    """
+    BUILTIN_PROFILES = {
+        'default': dict(forks=5, pipelining=False, control_persist=None, strategy='linear', verbosity=3),
+        'fast': dict(forks=30, pipelining=True, control_persist='30m', strategy='free', verbosity=1)
+    }
+
+    def __init__(self, name, forks=5, pipelining=False, control_persist=None, strategy='linear', verbosity=3):
+        """
+        @param name: `str` The name of the profile.
+        @param forks: `int` The number of hosts that are handled in parallel.
+        @param pipelining: `bool` Whether to use SSH pipelining (executing modules without copying them).
+        @param control_persist: `str` How long to keep the SSH master connections open (e.g. '30m'),
+                                so the connections are reused across the playbooks. None to disable.
+        @param strategy: `str` The play strategy, either 'linear' or 'free'.
+        @param verbosity: `int` The ansible verbosity.
+        """
+        assert strategy in ('linear', 'free'), f'Unsupported strategy: {strategy}'
+        self.name = name
+        self.forks = forks
+        self.pipelining = pipelining
+        self.control_persist = control_persist
+        self.strategy = strategy
+        self.verbosity = verbosity
+
+    def __repr__(self):
+        return '<{} {} forks={}; pipelining={}; control_persist={}; strategy={}>'.format(
+            self.__class__.__name__, self.name, self.forks, self.pipelining, self.control_persist, self.strategy)
+
+    @classmethod
+    def get(cls, name=None):
+        """Return the profile by its name (default: the configured profile).
+            @param name: `str` The name of the profile.
+            @rtype: `RunnerProfile`
+        """
+        ansible_config = CONFIG_DATA.get('ansible') or {}
+        name = name or ansible_config.get('profile', 'default')
+        profiles = dict(cls.BUILTIN_PROFILES)
+        profiles.update(ansible_config.get('profiles') or {})
+        if name not in profiles:
+            raise KeyError(f'No such ansible runner profile: {name}')
+        return cls(name, **profiles[name])
+
+    @property
+    def options(self):
+        """The executor options of the profile"""
+        return dict(forks=self.forks, verbosity=self.verbosity)
+
+    @property
+    def extra_vars(self):
+        """The connection variables of the profile (passed as extra vars so they override the inventory)"""
+        extra_vars = dict(
+            ansible_ssh_pipelining=self.pipelining,
+            runner_strategy=self.strategy,
+            runner_forks=self.forks
+        )
+        if self.control_persist:
+            extra_vars['ansible_ssh_args'] = f'-C -o ControlMaster=auto -o ControlPersist={self.control_persist}'
+        return extra_vars
+
+
+# Whether this process is the forked process of a single run (see run_ansible_playbook_isolated)
+_isolated = False
+
+
+def run_ansible_playbook(playbook_name, inventory_path, logger, extra_vars={}, options={}, profile=None,
+                         fact_cache=None, limit=None):
     """Running an ansible playbook.
     Args:
         :param `str` playbook_name: The name of the playbook. Only the name, Without dir and extension.
         :param `str` inventory_path: The path of the inventory file. Could be relative if in workspace.
         :param `dict` (optional) extra_vars: Extra variables (i.e. --extra_vars <var>)
         :param 'dict' (optional) options: options to override. see Options class.
+        :param `str` (optional) profile: The runner profile to use. see RunnerProfile class.
+        :param `FactCache` (optional) fact_cache: The facts cache to use. see FactCache class.
+            The cache settings are process wide, so a run with a cache is isolated in a forked process.
+        :param `str` (optional) limit: Limit the run to the hosts matching the pattern (i.e. --limit <pattern>)
     Returns:
         :return: Playbook excecution results.
     """
+    if fact_cache is not None and not _isolated:
+        return run_ansible_playbook_isolated(playbook_name, inventory_path, logger, extra_vars=extra_vars,
+                                             options=options, profile=profile, fact_cache=fact_cache, limit=limit)
+    # The ansible executor is imported on the first run (it takes a while to import)
+    from ansible.parsing.dataloader import DataLoader
+    from ansible.vars.manager import VariableManager
+    from ansible.executor.playbook_executor import PlaybookExecutor
+    from ansible.inventory.manager import InventoryManager
+    from openshift_pool.playbooks.callbacks import FactTimingCallback
     # Resolving playbook absolute path
     playbook_path = (playbook_name if os.path.exists(playbook_name) else
                      os.path.join(PLAYBOOKS_DIR, playbook_name + '.yaml'))
     if not os.path.exists(playbook_path):
         raise IOError('No such file: {}'.format(playbook_path))
     # Preparing the playbook
+    runner_profile = RunnerProfile.get(profile)
+    # A loader per run: the loader caches the files it read and keeps the vault secrets of its run
     loader = DataLoader()
-    options = Options(**options)
+    options = Options(**dict(runner_profile.options, **options))
+    if fact_cache is not None:
+        fact_cache.apply()
     inventory_manager = InventoryManager(loader, inventory_path)
+    if limit:
+        inventory_manager.subset(limit)
     variable_manager = VariableManager(loader=loader, inventory=inventory_manager)
-    variable_manager.extra_vars = extra_vars
+    variable_manager.extra_vars = dict(runner_profile.extra_vars, **extra_vars)
     playbook_exec = PlaybookExecutor(
         playbooks=[playbook_path], inventory=inventory_manager,
         variable_manager=variable_manager, loader=loader,
         options=options, passwords={}
     )
+    fact_timing = FactTimingCallback()
+    playbook_exec._tqm._callback_plugins.append(fact_timing)
+    hosts = [host.name for host in inventory_manager.get_hosts()]
+    cached_hosts = set(fact_cache.cached_hosts()) & set(hosts) if fact_cache else set()
     # Running the playbook
-    logger.info(f'Running ansible playbook: {playbook_name} (inventory: {inventory_path})')
-    return playbook_exec.run()
+    logger.info(f'Running ansible playbook: {playbook_name} (inventory: {inventory_path}; limit: {limit}; '
+                f'profile: {runner_profile}; cached facts: {len(cached_hosts)}/{len(hosts)})')
+    result = playbook_exec.run()
+    if fact_cache:
+        fact_cache.record(playbook_name, fact_timing.gather_time, len(cached_hosts), len(hosts))
+    return result
+
+
+def run_ansible_playbook_isolated(playbook_name, *args, **kwargs):
+    """Running an ansible playbook in a forked process. See run_ansible_playbook for the arguments.
+    The ansible executor keeps a global state, so playbooks that should run at the same time
+    (e.g. per host stages of a pipeline) are isolated in their own processes.
+        @raise AnsibleRunFailedException: If the run raised, or the process died without a result (e.g. killed).
+    """
+    context = multiprocessing.get_context('fork')
+    reader, writer = context.Pipe(duplex=False)
+
+    def target():
+        global _isolated
+        _isolated = True
+        reader.close()
+        try:
+            writer.send((run_ansible_playbook(playbook_name, *args, **kwargs), None))
+        except BaseException as e:
+            writer.send((None, repr(e)))
+        finally:
+            # The forked process exits without the atexit handlers, so the queued log records are written now
+            LOG_REGISTRY.flush()
+
+    process = context.Process(target=target, name=f'ansible-{playbook_name}')
+    process.start()
+    writer.close()
+    try:
+        result, error = _wait_for_result(process, reader)
+    finally:
+        reader.close()
+        process.join()
+    if error is not None:
+        raise AnsibleRunFailedException(playbook_name, error)
+    return result
+
+
+def _wait_for_result(process, reader, poll_interval=1):
+    """Return the (result, error) that the process of a run sent, or an error if it died without sending it"""
+    while True:
+        # The liveness is checked before the poll, so a result that was sent right before the exit is still read
+        alive = process.is_alive()
+        if reader.poll(poll_interval if alive else 0):
+            try:
+                return reader.recv()
+            except EOFError:
+                break
+        elif not alive:
+            break
+    process.join()
+    return None, f'The process of the run exited without a result (exit code: {process.exitcode})'
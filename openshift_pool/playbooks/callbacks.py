@@ -0,0 +1,29 @@
+import time
+
+from ansible.plugins.callback import CallbackBase
+
+
+class FactTimingCallback(CallbackBase):
+    """Measuring the time that the playbook spends on the facts gathering tasks"""
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'fact_timing'
+    GATHER_TASK_NAMES = ('Gathering Facts', 'setup')
+
+    def __init__(self):
+        super(FactTimingCallback, self).__init__()
+        self.gather_time = 0.0
+        self._gather_started_at = None
+
+    def _close_gather(self):
+        if self._gather_started_at is not None:
+            self.gather_time += time.monotonic() - self._gather_started_at
+            self._gather_started_at = None
+
+    def v2_playbook_on_task_start(self, task, is_conditional):
+        self._close_gather()
+        if task.get_name().strip() in self.GATHER_TASK_NAMES:
+            self._gather_started_at = time.monotonic()
+
+    def v2_playbook_on_stats(self, stats):
+        self._close_gather()
@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import fcntl
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+
+class FactCache(object):
+    """
+    A persistent facts cache (the ansible `jsonfile` cache plugin) in the management env of a cluster.
+
+    The facts gathered by one playbook run are reused by the next runs (`gathering = smart`).
+    The cache is stamped with the stack revision and it is invalidated once the stack changes.
+    The stamp and the stats are changed under a lock (of the threads and of the forked runs), since the
+    per node stages of a pipeline use the same cache at the same time.
+    """
+    DIRNAME = 'facts'
+    STAMP_FILE = '.stamp'
+    STATS_FILE = 'fact_cache_stats.json'
+    LOCK_FILE = '.fact_cache.lock'
+    _thread_lock = threading.Lock()
+
+    def __init__(self, mgmt_env, stamp, timeout=86400, gather_subset='all'):
+        """
+        @param mgmt_env: `ManagementEnv` The management env of the cluster.
+        @param stamp: `str` The revision of the stack that the facts belong to.
+        @param timeout: `int` The number of seconds that cached facts are valid.
+        @param gather_subset: `str` The facts subset to gather (e.g. 'network,hardware').
+        """
+        self._mgmt_env = mgmt_env
+        self._timeout = timeout
+        self._gather_subset = gather_subset
+        self.validate(stamp)
+
+    @property
+    def path(self):
+        return self._mgmt_env.file_abspath(self.DIRNAME)
+
+    @property
+    def stats_path(self):
+        return self._mgmt_env.file_abspath(self.STATS_FILE)
+
+    @property
+    def lock_path(self):
+        return self._mgmt_env.file_abspath(self.LOCK_FILE)
+
+    @contextmanager
+    def _locked(self):
+        """Holding the lock of the cache (a `flock`, so the forked runs are serialized as well)"""
+        with self._thread_lock, open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write(self, path, write):
+        """Writing a file atomically (a temp file that replaces it)"""
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                write(f)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    @property
+    def stamp(self):
+        try:
+            with open(os.path.join(self.path, self.STAMP_FILE), 'r') as f:
+                return f.read()
+        except FileNotFoundError:
+            return
+
+    def validate(self, stamp):
+        """Invalidating the cache if it belongs to another revision of the stack.
+            @param stamp: `str` The current revision of the stack.
+        """
+        if self.stamp == stamp:
+            return
+        with self._locked():
+            if self.stamp == stamp:
+                return
+            self._invalidate()
+            os.makedirs(self.path, exist_ok=True)
+            self._write(os.path.join(self.path, self.STAMP_FILE), lambda f: f.write(stamp))
+
+    def invalidate(self):
+        """Dropping all the cached facts"""
+        with self._locked():
+            self._invalidate()
+
+    def _invalidate(self):
+        self._mgmt_env.log.info('Invalidating the facts cache')
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def cached_hosts(self):
+        """Return the hosts that have fresh facts in the cache"""
+        if not os.path.isdir(self.path):
+            return []
+        now = time.time()
+        return [name for name in os.listdir(self.path) if not name.startswith('.')
+                and now - os.path.getmtime(os.path.join(self.path, name)) < self._timeout]
+
+    @property
+    def settings(self):
+        """The ansible settings of the cache: `dict` of the environment variable -> (the constant, the value)"""
+        return {
+            'ANSIBLE_CACHE_PLUGIN': ('CACHE_PLUGIN', 'jsonfile'),
+            'ANSIBLE_CACHE_PLUGIN_CONNECTION': ('CACHE_PLUGIN_CONNECTION', self.path),
+            'ANSIBLE_CACHE_PLUGIN_TIMEOUT': ('CACHE_PLUGIN_TIMEOUT', self._timeout),
+            'ANSIBLE_GATHERING': ('DEFAULT_GATHERING', 'smart'),
+            'ANSIBLE_GATHER_SUBSET': ('DEFAULT_GATHER_SUBSET', self._gather_subset),
+        }
+
+    def apply(self):
+        """Configuring ansible to use the cache for the rest of the process.
+        The settings are process wide (the environment and the ansible constants), so they are applied
+        only in the process of a single run (see `run_ansible_playbook_isolated`), never under threads.
+        """
+        from ansible import constants as C
+        for variable, (constant, value) in self.settings.items():
+            os.environ[variable] = str(value)
+            setattr(C, constant, value)
+
+    def stats(self):
+        if not os.path.exists(self.stats_path):
+            return []
+        with open(self.stats_path, 'r') as f:
+            return json.load(f)
+
+    def record(self, playbook_name, gather_time, cached_hosts, total_hosts):
+        """Recording the facts gathering time of a run and the time that the cache saved.
+        The saved time is estimated by the per-host gathering time of the cold runs.
+            @rtype: `dict` The record.
+        """
+        with self._locked():
+            record = self._record(playbook_name, gather_time, cached_hosts, total_hosts)
+        self._mgmt_env.log.info(f'Facts gathering of {playbook_name}: {gather_time:.1f}s; '
+                                f'cached hosts: {cached_hosts}/{total_hosts}; time saved: {record["time_saved"]}')
+        return record
+
+    def _record(self, playbook_name, gather_time, cached_hosts, total_hosts):
+        stats = self.stats()
+        cold_runs = [r for r in stats if not r['cached_hosts'] and r['total_hosts']]
+        if not cached_hosts and total_hosts:
+            cold_runs.append({'gather_time': gather_time, 'total_hosts': total_hosts})
+        per_host = (sum(r['gather_time'] for r in cold_runs) / sum(r['total_hosts'] for r in cold_runs)
+                    if cold_runs else None)
+        record = {
+            'playbook': playbook_name,
+            'time': time.time(),
+            'gather_time': gather_time,
+            'cached_hosts': cached_hosts,
+            'total_hosts': total_hosts,
+            'time_saved': max(0.0, per_host * total_hosts - gather_time) if per_host is not None else None
+        }
+        stats.append(record)
+        self._write(self.stats_path, lambda f: json.dump(stats, f, indent=2))
+        return record
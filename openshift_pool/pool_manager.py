@@ -1,21 +1,34 @@
-from openshift_pool.common import Singleton
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from config import CONFIG_DATA
+from openshift_pool.common import Singleton, Loggable
 from openshift_pool.openshift.stack import StackBuilder
-from openshift_pool.openshift.cluster import OpenshiftClusterBuilder
+from openshift_pool.openshift.cluster import OpenshiftClusterBuilder, OpenshiftClusterProxy
+from openshift_pool.exceptions import StackNotFoundException
 from openshift_pool.db import DB
+from openshift_pool.pool_registry import PoolRegistry, topology_key
+
+
+ReloadReport = namedtuple('ReloadReport', ['eager', 'clusters', 'resolved', 'failed', 'elapsed'])
 
 
-class PoolManager(metaclass=Singleton):
+class PoolManager(Loggable, metaclass=Singleton):
     StackBuilder = StackBuilder()
     ClusterBuilder = OpenshiftClusterBuilder()
 
     def __init__(self):
+        Loggable.__init__(self)
         self._clusters = []
-        self.db = DB().pool_manager
-        if self.db.find_one() is None:
-            self.db.insert_one({
-                'clusters': []
-            })
-        self.reload()
+        self.registry = PoolRegistry()
+        # The pool used to be a single document with all the cluster names
+        self.registry.migrate(DB().pool_manager, DB().warm_pool)
+        self.reload(eager=self.config.get('eager_reload', False))
+
+    @property
+    def config(self):
+        return CONFIG_DATA.get('pool_manager', {})
 
     @property
     def heat_client(self):
@@ -25,22 +38,63 @@ class PoolManager(metaclass=Singleton):
     def clusters(self):
         return self._clusters
 
-    def reload(self):
-        self._clusters = []
-        for cluster_data in self.db.find_one()['clusters']:
-            self._clusters.append(
-                self.ClusterBuilder.get(cluster_data['name'])
-            )
+    @property
+    def stack_registry(self):
+        return self.StackBuilder.stack_registry
+
+    def _resolve(self, proxy):
+        try:
+            proxy.resolve()
+            return True
+        except (Exception, StackNotFoundException) as e:
+            self.log.error(f'Failed to resolve cluster "{proxy.name}": {e}')
+            return False
+
+    def reload(self, eager=False, max_workers=None):
+        """Reloading the clusters of the pool.
+        The clusters are loaded as lazy proxies (`OpenshiftClusterProxy`) that fetch the stack
+        and the nodes on first use. In eager mode all of them are resolved concurrently.
+            @param eager: `bool` Whether to resolve all the clusters now.
+            @param max_workers: `int` The maximum number of clusters to resolve in parallel (eager mode).
+            @rtype: `ReloadReport`
+        """
+        start = time.monotonic()
+        # A single stacks listing serves the lookups of all the clusters
+        self.stack_registry.invalidate()
+        self._clusters = [OpenshiftClusterProxy(doc['name']) for doc in self.registry.find(
+            [PoolRegistry.STATE_READY, PoolRegistry.STATE_CLAIMED])]
+        failed = []
+        if eager and self._clusters:
+            max_workers = max_workers or self.config.get('reload_workers', 8)
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(self._clusters))) as executor:
+                results = list(executor.map(self._resolve, self._clusters))
+            failed = [proxy.name for proxy, ok in zip(self._clusters, results) if not ok]
+        report = ReloadReport(eager, len(self._clusters), sum(proxy.resolved for proxy in self._clusters),
+                              failed, time.monotonic() - start)
+        self.log.info(f'Pool reloaded: {report}')
+        return report
 
-    def save(self):
-        self.db.update_one({}, {'$set': {'clusters': [{'name': c.name} for c in self._clusters]}})
+    def _create_cluster(self, name, version, node_types, owner=None):
+        self.registry.add(name, version, topology_key(node_types), owner=owner)
+        return self._build_cluster(name, version, node_types)
 
-    def _create_cluster(self, name, version, node_types):
-        cluster = self.ClusterBuilder.create(name, node_types, version)
+    def _build_cluster(self, name, version, node_types):
+        """Creating the cluster of a building document of the registry, and moving it to ready (or failed)"""
+        try:
+            cluster = self.ClusterBuilder.create(name, node_types, version)
+        except BaseException as e:
+            self.registry.transition(name, PoolRegistry.STATE_FAILED, error=str(e))
+            raise
+        self.registry.transition(name, PoolRegistry.STATE_READY)
         self._clusters.append(cluster)
-        self.save()
         return cluster
 
     def _delete_stack(self, cluster):
-        self._clusters.remove(cluster)
+        if self.registry.get(cluster.name) is None:
+            # Not a cluster of the pool (e.g. deployed by the cli), the stack is deleted all the same
+            self.log.info(f'Cluster "{cluster.name}" is not in the pool registry')
+        else:
+            self.registry.transition(cluster.name, PoolRegistry.STATE_DELETING)
+        self._clusters = [c for c in self._clusters if c.name != cluster.name]
         self.ClusterBuilder.delete(cluster)
+        self.registry.remove(cluster.name)
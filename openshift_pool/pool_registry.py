@@ -0,0 +1,187 @@
+from datetime import datetime
+
+from openshift_pool.common import Loggable, NodeType
+from openshift_pool.db import DB, CODEC, ASCENDING
+from openshift_pool.exceptions import InvalidStateTransitionException
+
+
+def topology_key(node_types):
+    """Return the topology key of the node types, e.g. 'master,infra,compute'.
+        @param node_types: (`list` of `NodeType`)
+        @rtype: `str`
+    """
+    return ','.join(node_type.value for node_type in node_types)
+
+
+def topology_node_types(key):
+    """The reverse of `topology_key`.
+        @param key: `str` The topology key.
+        @rtype: `list` of `NodeType`
+    """
+    return [NodeType(value) for value in key.split(',')]
+
+
+class PoolRegistry(Loggable):
+    """
+    The clusters of the pool, a document per cluster.
+
+    Every state transition is a single `find_one_and_update` that matches the allowed source states,
+    so concurrent processes never lose each other's updates and a transition is applied once
+    (e.g. a ready cluster is claimed by a single caller). Batch updates are sent in a single bulk write.
+    """
+    STATE_BUILDING = 'building'
+    STATE_READY = 'ready'
+    STATE_CLAIMED = 'claimed'
+    STATE_FAILED = 'failed'
+    STATE_DELETING = 'deleting'
+    # The states that each state can transition from
+    TRANSITIONS = {
+        STATE_READY: (STATE_BUILDING, STATE_CLAIMED),
+        STATE_CLAIMED: (STATE_READY, ),
+        STATE_FAILED: (STATE_BUILDING, ),
+        STATE_DELETING: (STATE_BUILDING, STATE_READY, STATE_CLAIMED, STATE_FAILED),
+    }
+    INDEXES = (
+        ([('name', ASCENDING)], {'unique': True}),
+        ([('state', ASCENDING)], {}),
+        ([('version', ASCENDING)], {}),
+        ([('owner', ASCENDING)], {}),
+        ([('warm', ASCENDING), ('version', ASCENDING), ('topology', ASCENDING), ('state', ASCENDING)], {}),
+    )
+
+    def __init__(self, collection=None):
+        """
+        @param collection: The mongo collection of the clusters (`DB().pool_clusters` by default).
+        """
+        Loggable.__init__(self)
+        self.db = DB().pool_clusters if collection is None else collection
+        for keys, kwargs in self.INDEXES:
+            self.db.create_index(keys, **kwargs)
+
+    def add(self, name, version=None, topology=None, state=STATE_BUILDING, **fields):
+        """Adding a cluster to the pool.
+            @param name: `str` The cluster name.
+            @param version: `str` The openshift version.
+            @param topology: `str` The topology key (see `topology_key`).
+            @param state: `str` The initial state.
+            @param fields: Other fields of the document.
+            @rtype: `dict` The document.
+        """
+        now = datetime.now()
+        doc = dict(fields, name=name, version=version, topology=topology, state=state,
+                   created_at=now, updated_at=now)
+        doc.setdefault('owner', None)
+        self.db.insert_one(CODEC.encode(doc))
+        return doc
+
+    def get(self, name):
+        return CODEC.decode(self.db.find_one({'name': name}))
+
+    def find(self, states=None, **query):
+        """Return the documents of the clusters
+            @param states: (`list` of `str`) Only the clusters in these states.
+            @param query: Field filters, e.g. version='3.9', owner='user'.
+            @rtype: `list` of `dict`
+        """
+        if states is not None:
+            query['state'] = {'$in': list(states)}
+        return [CODEC.decode(doc) for doc in self.db.find(query).sort([('created_at', ASCENDING)])]
+
+    def count(self, states, **query):
+        query['state'] = {'$in': list(states)}
+        return self.db.count_documents(query)
+
+    def transition(self, name, to_state, **fields):
+        """Moving a cluster to another state (atomically, only from the states in `TRANSITIONS`).
+            @param name: `str` The cluster name.
+            @param to_state: `str` The new state.
+            @param fields: Fields to set with the state.
+            @raise InvalidStateTransitionException: If the cluster is not in a state that moves to the new state.
+            @rtype: `dict` The updated document.
+        """
+        from pymongo import ReturnDocument
+        doc = self.db.find_one_and_update(
+            {'name': name, 'state': {'$in': list(self.TRANSITIONS[to_state])}},
+            {'$set': CODEC.encode(self._state_fields(to_state, fields))},
+            return_document=ReturnDocument.AFTER
+        )
+        if doc is None:
+            current = self.get(name)
+            raise InvalidStateTransitionException(name, to_state, current['state'] if current else None)
+        return CODEC.decode(doc)
+
+    @staticmethod
+    def _state_fields(state, fields):
+        now = datetime.now()
+        return dict(fields, state=state, updated_at=now, **{f'{state}_at': now})
+
+    def claim(self, owner=None, **query):
+        """Claiming the oldest ready cluster that matches the query.
+            @param owner: The owner of the claimed cluster.
+            @param query: Field filters, e.g. version='3.9', topology='master,infra,compute'.
+            @rtype: `dict` The claimed document, or None if there is no ready cluster.
+        """
+        from pymongo import ReturnDocument
+        return CODEC.decode(self.db.find_one_and_update(
+            dict(query, state=self.STATE_READY),
+            {'$set': CODEC.encode(self._state_fields(self.STATE_CLAIMED, {'owner': owner}))},
+            sort=[('ready_at', ASCENDING)], return_document=ReturnDocument.AFTER
+        ))
+
+    def release(self, name):
+        """Returning a claimed cluster to the ready clusters"""
+        return self.transition(name, self.STATE_READY, owner=None)
+
+    def update(self, name, **fields):
+        """Setting fields of a cluster (without a state transition)"""
+        fields = dict(fields, updated_at=datetime.now())
+        return self.db.update_one({'name': name}, {'$set': CODEC.encode(fields)}).modified_count
+
+    def update_many(self, updates):
+        """Setting fields of several clusters in a single bulk write.
+            @param updates: `dict` The fields to set per cluster name.
+            @rtype: `int` The number of modified documents.
+        """
+        if not updates:
+            return 0
+        from pymongo import UpdateOne
+        now = datetime.now()
+        result = self.db.bulk_write([UpdateOne({'name': name}, {'$set': CODEC.encode(dict(fields, updated_at=now))})
+                                     for name, fields in updates.items()], ordered=False)
+        return result.modified_count
+
+    def remove(self, name):
+        """Removing a cluster from the pool"""
+        return self.db.delete_one({'name': name}).deleted_count
+
+    def migrate(self, legacy_collection, warm_pool_collection=None):
+        """Importing the clusters from the old layout: a single document with all the cluster names
+        (`{'clusters': [{'name': ...}, ...]}`), and the documents of the warm pool collection.
+        The clusters that already exist are kept, so the migration can run again.
+            @param legacy_collection: The collection of the single pool document.
+            @param warm_pool_collection: The old collection of the warm pool.
+            @rtype: `int` The number of imported clusters.
+        """
+        from pymongo import UpdateOne
+        now = datetime.now()
+        docs = []
+        for legacy_doc in legacy_collection.find({'clusters': {'$exists': True}}):
+            docs.extend(dict(name=cluster['name'], state=self.STATE_READY) for cluster in legacy_doc['clusters'])
+        if warm_pool_collection is not None:
+            for warm_doc in warm_pool_collection.find():
+                warm_doc.pop('_id', None)
+                docs.append(dict(warm_doc, warm=True))
+        if not docs:
+            return 0
+        operations = []
+        for doc in docs:
+            doc.setdefault('owner', None)
+            doc.setdefault('created_at', now)
+            operations.append(UpdateOne({'name': doc['name']}, {'$setOnInsert': dict(doc, updated_at=now)},
+                                        upsert=True))
+        imported = self.db.bulk_write(operations, ordered=False).upserted_count
+        legacy_collection.delete_many({'clusters': {'$exists': True}})
+        if warm_pool_collection is not None:
+            warm_pool_collection.delete_many({})
+        self.log.info(f'Pool registry: migrated {imported} clusters from the old layout')
+        return imported
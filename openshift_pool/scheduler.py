@@ -0,0 +1,268 @@
+import os
+import re
+import time
+import fcntl
+import threading
+from concurrent.futures import Future
+
+from openshift_pool.env import ENV
+from openshift_pool.common import Loggable
+from openshift_pool.exceptions import ClusterLockedException
+
+
+class ClusterLock(object):
+    """
+    An inter-process lock of a single cluster (an exclusive `flock` on a file in the workspace).
+    Operations on different clusters do not block each other.
+    """
+    LOCKS_DIR = '.locks'
+
+    def __init__(self, cluster_name, lock_dir=None):
+        """
+        @param cluster_name: `str` The name of the cluster.
+        @param lock_dir: `str` The directory of the lock files (default: <WORKSPACE>/.locks).
+        """
+        self._cluster_name = cluster_name
+        self._lock_dir = lock_dir or os.path.join(ENV['WORKSPACE'], self.LOCKS_DIR)
+        self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    @property
+    def path(self):
+        return os.path.join(self._lock_dir, f'{self._cluster_name}.lock')
+
+    @property
+    def locked(self):
+        return self._fd is not None
+
+    def acquire(self, wait=False, timeout=None, poll_interval=0.5):
+        """Acquiring the lock.
+            @param wait: `bool` Whether to wait for the lock (if another operation holds it).
+            @param timeout: `float` The maximum number of seconds to wait (None to wait without a limit).
+            @param poll_interval: `float` The seconds between the attempts while waiting.
+            @raise ClusterLockedException: If the cluster is locked by another operation (and it was not released
+                                           in time, when waiting).
+        """
+        os.makedirs(self._lock_dir, exist_ok=True)
+        deadline = time.monotonic() + timeout if wait and timeout is not None else None
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if not wait or (deadline is not None and time.monotonic() > deadline):
+                    os.close(fd)
+                    raise ClusterLockedException(self._cluster_name)
+                time.sleep(poll_interval)
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+
+    def release(self):
+        if self._fd is None:
+            return
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+
+class FileSemaphore(object):
+    """
+    An inter-process counting semaphore: `slots` lock files (in the locks directory of the workspace),
+    a holder has an exclusive `flock` on one of them. A slot of a process that died is released by the kernel.
+    """
+
+    def __init__(self, name, slots, lock_dir=None, poll_interval=0.5):
+        """
+        @param name: `str` The name of the semaphore (the prefix of its lock files).
+        @param slots: `int` The number of holders at once.
+        @param lock_dir: `str` The directory of the lock files (default: <WORKSPACE>/.locks).
+        @param poll_interval: `float` The seconds between the attempts while all the slots are taken.
+        """
+        self._name = re.sub(r'[^\w.-]', '_', name)
+        self._slots = slots
+        self._lock_dir = lock_dir or os.path.join(ENV['WORKSPACE'], ClusterLock.LOCKS_DIR)
+        self._poll_interval = poll_interval
+        self._local = threading.local()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    def _try_acquire(self):
+        for slot in range(self._slots):
+            fd = os.open(os.path.join(self._lock_dir, f'{self._name}.{slot}.slot'), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            return fd
+
+    def acquire(self):
+        """Waiting for a free slot (the slot is held by the calling thread until `release`)"""
+        os.makedirs(self._lock_dir, exist_ok=True)
+        fd = self._try_acquire()
+        while fd is None:
+            time.sleep(self._poll_interval)
+            fd = self._try_acquire()
+        self._local.fd = fd
+
+    def release(self):
+        fd = getattr(self._local, 'fd', None)
+        if fd is None:
+            return
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+        self._local.fd = None
+
+
+class Job(object):
+    """A cluster operation that is submitted to the `JobScheduler`"""
+
+    def __init__(self, cluster_name, operation, tenant, func, args, kwargs):
+        self.cluster_name = cluster_name
+        self.operation = operation
+        self.tenant = tenant
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+
+    def __repr__(self):
+        return '<{} {} cluster="{}"; tenant="{}">'.format(
+            self.__class__.__name__, self.operation, self.cluster_name, self.tenant)
+
+    @property
+    def queued_time(self):
+        return (self.started_at or time.monotonic()) - self.submitted_at
+
+    @property
+    def run_time(self):
+        if self.started_at is None:
+            return
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+
+class JobScheduler(Loggable):
+    """
+    Running cluster operations concurrently.
+
+    Each job holds the lock of its cluster while running, so operations on different clusters run
+    side by side while two operations on the same cluster never overlap (in this process or in
+    another one); a job whose cluster is locked by another process waits for it. The number of running
+    jobs is limited globally and per tenant; the jobs above the limits are queued and started in
+    submission order once a slot is free. The limits apply across the processes as well (by `FileSemaphore`s
+    in the locks directory), so several cli processes together do not exceed them.
+    """
+
+    def __init__(self, max_concurrent=4, max_per_tenant=4, lock_dir=None, poll_interval=0.5):
+        """
+        @param max_concurrent: `int` The maximum number of jobs that run at once.
+        @param max_per_tenant: `int` The maximum number of jobs that run at once in a single tenant.
+        @param lock_dir: `str` The directory of the cluster lock files.
+        @param poll_interval: `float` The seconds between the attempts to take a lock held by another process.
+        """
+        self._max_concurrent = max_concurrent
+        self._max_per_tenant = max_per_tenant
+        self._lock_dir = lock_dir
+        self._poll_interval = poll_interval
+        self._global_slots = FileSemaphore('global', max_concurrent, lock_dir, poll_interval)
+        self._tenant_slots = {}
+        self._lock = threading.Lock()
+        self._queue = []
+        self._running = []
+        Loggable.__init__(self)
+
+    @property
+    def queued(self):
+        with self._lock:
+            return list(self._queue)
+
+    @property
+    def running(self):
+        with self._lock:
+            return list(self._running)
+
+    def submit(self, cluster_name, func, *args, operation=None, tenant=None, **kwargs):
+        """Submitting a cluster operation.
+            @param cluster_name: `str` The name of the cluster that the operation works on.
+            @param func: `callable` The operation.
+            @param operation: `str` The name of the operation (for logging).
+            @param tenant: `str` The tenant of the cluster.
+            @rtype: `concurrent.futures.Future` resolved with the result of the operation.
+        """
+        job = Job(cluster_name, operation or func.__name__, tenant, func, args, kwargs)
+        with self._lock:
+            self._queue.append(job)
+        self.log.info(f'Job submitted: {job}')
+        self._dispatch()
+        return job.future
+
+    def _can_start(self, job):
+        if len(self._running) >= self._max_concurrent:
+            return False
+        if any(running.cluster_name == job.cluster_name for running in self._running):
+            return False
+        return sum(running.tenant == job.tenant for running in self._running) < self._max_per_tenant
+
+    def _tenant_semaphore(self, tenant):
+        with self._lock:
+            if tenant not in self._tenant_slots:
+                self._tenant_slots[tenant] = FileSemaphore(f'tenant-{tenant}', self._max_per_tenant, self._lock_dir,
+                                                           self._poll_interval)
+            return self._tenant_slots[tenant]
+
+    def _dispatch(self):
+        with self._lock:
+            startable = []
+            for job in list(self._queue):
+                if self._can_start(job):
+                    self._queue.remove(job)
+                    self._running.append(job)
+                    startable.append(job)
+        for job in startable:
+            threading.Thread(target=self._run, args=(job, ), name=f'job-{job.cluster_name}', daemon=True).start()
+
+    def _run(self, job):
+        job.started_at = time.monotonic()
+        self.log.info(f'Job started: {job} (queued {job.queued_time:.1f}s)')
+        result = error = None
+        try:
+            # The cluster lock is taken first, so a job that waits for it does not hold a slot meanwhile
+            cluster_lock = ClusterLock(job.cluster_name, self._lock_dir)
+            try:
+                cluster_lock.acquire()
+            except ClusterLockedException:
+                self.log.info(f'Job {job} is waiting for the lock of cluster {job.cluster_name}')
+                cluster_lock.acquire(wait=True, poll_interval=self._poll_interval)
+            try:
+                with self._tenant_semaphore(job.tenant), self._global_slots:
+                    result = job.func(*job.args, **job.kwargs)
+            finally:
+                cluster_lock.release()
+        except BaseException as e:
+            error = e
+        job.finished_at = time.monotonic()
+        with self._lock:
+            self._running.remove(job)
+        if error is None:
+            self.log.info(f'Job completed: {job} in {job.run_time:.1f}s')
+            job.future.set_result(result)
+        else:
+            self.log.error(f'Job failed: {job} after {job.run_time:.1f}s: {error}')
+            job.future.set_exception(error)
+        self._dispatch()
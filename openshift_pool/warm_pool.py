@@ -0,0 +1,220 @@
+import os
+import time
+import sqlite3
+import uuid
+import socket
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from config import CONFIG_DATA
+from openshift_pool.common import Singleton, Loggable, NodeType
+from openshift_pool.openshift.cluster import OpenshiftClusterBuilder, OpenshiftClusterProxy
+from openshift_pool.openshift.metadata_store import get_metadata_store
+from openshift_pool.pool_manager import PoolManager
+from openshift_pool.pool_registry import PoolRegistry, topology_key, topology_node_types
+from openshift_pool.exceptions import (StackCreationFailedException, StackNotFoundException, AnsibleRunFailedException,
+                                       PipelineStageFailedException, InvalidStateTransitionException)
+
+
+class WarmPool(Loggable, metaclass=Singleton):
+    """
+    Keeping pre-deployed clusters ready per (version, topology).
+
+    The pool provisions clusters in the background up to the target count of each (version, topology),
+    with at most `max_in_flight` builds at once. A caller claims a ready cluster atomically
+    (a single `find_one_and_update`) and the pool is replenished after each claim.
+    Each build records its builder (host and pid); a build whose builder died, or that is older than
+    `build_timeout`, is marked as failed so it does not hold an in-flight slot forever.
+    """
+    STATE_BUILDING = 'building'
+    STATE_READY = 'ready'
+    STATE_CLAIMED = 'claimed'
+    STATE_FAILED = 'failed'
+    NAME_PATTERN = 'warm-{version}-{suffix}'
+
+    def __init__(self, registry=None, metadata_store=None):
+        """
+        @param registry: `PoolRegistry` The registry of the clusters (default: the registry in the DB).
+        @param metadata_store: `MetadataStore` The store that the owner of a claimed cluster is written to
+                               (default: the metadata store of the pool).
+        """
+        Loggable.__init__(self)
+        self.registry = registry or PoolRegistry()
+        self.metadata_store = metadata_store or get_metadata_store()
+        self._targets = {}
+        for target in self.config.get('targets', []):
+            self.set_target(target['version'], topology_node_types(target['topology']), target['count'])
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight)
+        self._futures = set()
+        # Reentrant, since a build that already completed runs its done callback right away (under the lock)
+        self._lock = threading.RLock()
+        self._hits = 0
+        self._misses = 0
+        self._claim_times = []
+
+    @property
+    def config(self):
+        return CONFIG_DATA.get('warm_pool', {})
+
+    @property
+    def max_in_flight(self):
+        return self.config.get('max_in_flight', 2)
+
+    @property
+    def build_timeout(self):
+        return timedelta(seconds=self.config.get('build_timeout', 7200))
+
+    @property
+    def targets(self):
+        return dict(self._targets)
+
+    def set_target(self, version, node_types, count):
+        """Setting the number of ready clusters to keep for the version and topology.
+            @param version: `str` The openshift version (one of `OpenshiftClusterBuilder.SUPPORTED_VERSIONS`).
+            @param node_types: (`list` of `NodeType`) The topology.
+            @param count: `int` The number of clusters to keep ready.
+        """
+        assert version in OpenshiftClusterBuilder.SUPPORTED_VERSIONS, f'Unsupported version: {version}'
+        assert NodeType.MASTER in node_types, 'Cluster must include at least 1 master'
+        self._targets[(version, topology_key(node_types))] = count
+
+    def _count(self, states, version=None, topology=None):
+        query = {'warm': True}
+        if version is not None:
+            query.update(version=version, topology=topology)
+        return self.registry.count(states, **query)
+
+    @staticmethod
+    def _builder():
+        return {'host': socket.gethostname(), 'pid': os.getpid()}
+
+    def _stale_reason(self, doc):
+        """Return the reason that the build is stale (its builder is gone) or None if it may still be running"""
+        builder = doc.get('builder') or {}
+        if builder.get('host') == socket.gethostname() and builder.get('pid') != os.getpid():
+            try:
+                os.kill(builder['pid'], 0)
+            except ProcessLookupError:
+                return f'The builder process ({builder["pid"]}) is gone'
+            except PermissionError:
+                pass
+        if datetime.now() - doc['created_at'] > self.build_timeout:
+            return f'Building for more than {self.build_timeout.total_seconds():.0f} seconds'
+
+    def reclaim(self):
+        """Marking the stale builds as failed (so they do not count as in flight).
+            @rtype: `list` of `str` The names of the reclaimed builds.
+        """
+        reclaimed = []
+        for doc in self.registry.find([self.STATE_BUILDING], warm=True):
+            reason = self._stale_reason(doc)
+            if not reason:
+                continue
+            try:
+                self.registry.transition(doc['name'], self.STATE_FAILED, error=reason)
+            except InvalidStateTransitionException:
+                continue  # Completed (or reclaimed by another process) meanwhile
+            self.log.warning(f'Warm pool: reclaimed the stale build {doc["name"]}: {reason}')
+            reclaimed.append(doc['name'])
+        return reclaimed
+
+    def replenish(self):
+        """Submitting builds for the missing clusters, subject to the max in-flight policy.
+            @rtype: `list` of `str` The names of the clusters that were submitted.
+        """
+        submitted = []
+        with self._lock:
+            self.reclaim()
+            slots = self.max_in_flight - self._count([self.STATE_BUILDING])
+            for (version, topology), count in self._targets.items():
+                missing = count - self._count([self.STATE_BUILDING, self.STATE_READY], version, topology)
+                while missing > 0 and slots > 0:
+                    name = self.NAME_PATTERN.format(version=version.replace('.', ''), suffix=uuid.uuid4().hex[:6])
+                    self.registry.add(name, version, topology, warm=True, builder=self._builder())
+                    future = self._executor.submit(self._provision, name, version, topology)
+                    self._futures.add(future)
+                    future.add_done_callback(self._build_done)
+                    submitted.append(name)
+                    missing -= 1
+                    slots -= 1
+        if submitted:
+            self.log.info(f'Warm pool: submitted builds: {submitted}')
+        return submitted
+
+    def _build_done(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def wait(self):
+        """Waiting for the builds of this process (including the ones that they submit once they complete)"""
+        while True:
+            with self._lock:
+                futures = list(self._futures)
+            if not futures:
+                return
+            wait(futures)
+
+    def _build(self, name, version, topology):
+        # The document moves to ready (or failed) by the pool manager
+        PoolManager()._build_cluster(name, version, topology_node_types(topology))
+
+    def _provision(self, name, version, topology):
+        self.log.info(f'Warm pool: provisioning {name} (version={version}; topology={topology})')
+        start = time.monotonic()
+        try:
+            self._build(name, version, topology)
+        except (Exception, StackCreationFailedException, StackNotFoundException, AnsibleRunFailedException,
+                PipelineStageFailedException, InvalidStateTransitionException) as e:
+            self.log.error(f'Warm pool: failed to provision {name}: {e}')
+            return
+        self.registry.update(name, build_time=time.monotonic() - start)
+        self.log.info(f'Warm pool: {name} is ready')
+        self.replenish()
+
+    def claim(self, version, node_types, owner=None, replenish=True):
+        """Claiming a ready cluster.
+            @param version: `str` The openshift version.
+            @param node_types: (`list` of `NodeType`) The topology.
+            @param owner: The owner of the claimed cluster.
+            @param replenish: `bool` Whether to submit the builds that replace the claimed cluster
+                              (False in short-lived processes that do not wait for the builds).
+            @rtype: `OpenshiftClusterProxy` or None if there is no ready cluster.
+        """
+        start = time.monotonic()
+        doc = self.registry.claim(owner, warm=True, version=version, topology=topology_key(node_types))
+        elapsed = time.monotonic() - start
+        with self._lock:
+            if doc is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._claim_times.append(elapsed)
+        if replenish:
+            self.replenish()
+        if doc is None:
+            self.log.info(f'Warm pool: no ready cluster for version={version}; topology={topology_key(node_types)}')
+            return
+        self.log.info(f'Warm pool: {doc["name"]} claimed by {owner} in {elapsed * 1000:.1f}ms')
+        try:
+            # The clusters are listed by their owner from the metadata store (see cli.py list)
+            self.metadata_store.set(doc['name'], 'owner', owner)
+        except sqlite3.Error as e:
+            self.log.warning(f'Warm pool: failed to write the owner of {doc["name"]} to the metadata: {e}')
+        return OpenshiftClusterProxy(doc['name'])
+
+    @property
+    def stats(self):
+        """Return the hit rate and the time-to-claim statistics"""
+        with self._lock:
+            claims = self._hits + self._misses
+            claim_times = sorted(self._claim_times)
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / claims if claims else None,
+                'claim_time_avg': sum(claim_times) / len(claim_times) if claim_times else None,
+                'claim_time_max': claim_times[-1] if claim_times else None,
+                'building': self._count([self.STATE_BUILDING]),
+                'ready': self._count([self.STATE_READY])
+            }
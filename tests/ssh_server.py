@@ -0,0 +1,95 @@
+import socket
+import threading
+
+import paramiko
+
+
+class _ServerInterface(paramiko.ServerInterface):
+
+    def __init__(self, server):
+        self.server = server
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL if password == self.server.password else paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED if kind == 'session' else paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(target=self.server.run_command, args=(channel, command.decode()), daemon=True).start()
+        return True
+
+
+class SSHTestServer(object):
+    """
+    A local SSH server (on a random port) that answers every command with the command itself
+    (or by the handler, a function of the channel and the command that writes the output and returns the exit status).
+    It counts the handshakes and the commands, and can drop all the open connections.
+    """
+
+    def __init__(self, password='password', command_delay=None, handler=None):
+        self.password = password
+        self._handler = handler
+        self.handshakes = 0
+        self.commands = 0
+        self.max_concurrent_commands = 0
+        self._running_commands = 0
+        self._command_delay = command_delay
+        self._host_key = paramiko.RSAKey.generate(1024)
+        self._lock = threading.Lock()
+        self._transports = []
+        self._socket = socket.socket()
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(('127.0.0.1', 0))
+        self._socket.listen(64)
+        self.port = self._socket.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self._socket.accept()
+            except OSError:
+                return
+            transport = paramiko.Transport(sock)
+            transport.add_server_key(self._host_key)
+            with self._lock:
+                self.handshakes += 1
+                self._transports.append(transport)
+            # The channels are not accepted: the transport keeps them queued (an accepted channel is closed
+            # when its last reference is dropped) and each command is answered from its exec request
+            transport.start_server(server=_ServerInterface(self))
+
+    def run_command(self, channel, command):
+        with self._lock:
+            self.commands += 1
+            self._running_commands += 1
+            self.max_concurrent_commands = max(self.max_concurrent_commands, self._running_commands)
+        try:
+            if self._command_delay:
+                threading.Event().wait(self._command_delay)
+            if self._handler is None:
+                channel.sendall(command.encode())
+                exit_status = 0
+            else:
+                exit_status = self._handler(channel, command)
+            channel.send_exit_status(exit_status)
+            channel.shutdown_write()
+        finally:
+            with self._lock:
+                self._running_commands -= 1
+        # The exec reply is sent by the transport thread, the channel is closed after it
+        threading.Timer(0.5, channel.close).start()
+
+    def drop_connections(self):
+        with self._lock:
+            transports, self._transports = self._transports, []
+        for transport in transports:
+            transport.close()
+
+    def close(self):
+        self._socket.close()
+        self.drop_connections()
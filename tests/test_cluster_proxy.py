@@ -0,0 +1,61 @@
+import copy
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from openshift_pool.openshift.cluster import OpenshiftClusterBuilder, OpenshiftClusterProxy
+
+
+class FakeCluster(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.version = '3.9'
+
+
+@pytest.fixture
+def gets(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def get(builder, name):
+        with lock:
+            calls.append(name)
+        time.sleep(0.05)
+        return FakeCluster(name)
+
+    monkeypatch.setattr(OpenshiftClusterBuilder, 'get', get)
+    return calls
+
+
+def test_lazy_resolution(gets):
+    proxy = OpenshiftClusterProxy('cluster-a')
+    assert proxy.name == 'cluster-a'
+    assert not proxy.resolved and gets == []
+    assert 'unresolved' in repr(proxy)
+    assert proxy.version == '3.9'
+    assert proxy.resolved and gets == ['cluster-a']
+    assert proxy.version == '3.9'
+    assert gets == ['cluster-a']
+
+
+def test_concurrent_resolution_fetches_once(gets):
+    proxy = OpenshiftClusterProxy('cluster-a')
+    with ThreadPoolExecutor(8) as executor:
+        versions = list(executor.map(lambda _: proxy.version, range(8)))
+    assert versions == ['3.9'] * 8
+    assert gets == ['cluster-a']
+
+
+def test_private_attributes_are_not_resolved(gets):
+    proxy = OpenshiftClusterProxy('cluster-a')
+    proxy_copy = copy.copy(proxy)
+    assert proxy_copy.name == 'cluster-a' and not proxy_copy.resolved
+    uninitialized = OpenshiftClusterProxy.__new__(OpenshiftClusterProxy)
+    with pytest.raises(AttributeError):
+        uninitialized._cluster
+    with pytest.raises(AttributeError):
+        uninitialized.version
+    assert gets == []
@@ -0,0 +1,89 @@
+import os
+from collections import namedtuple
+
+import jinja2
+import pytest
+
+from config import CONFIG_DATA
+from openshift_pool.common import NodeType
+from openshift_pool.openshift import container_images, cluster as cluster_module
+from openshift_pool.openshift.cluster import OpenshiftClusterBuilder
+from openshift_pool.playbooks import PLAYBOOKS_DIR
+
+
+FakeNode = namedtuple('FakeNode', ['fqdn', 'type'])
+
+
+def test_images_of_every_version():
+    for version in ('3.5', '3.6', '3.7', '3.9'):
+        for node_type in NodeType:
+            images = container_images.images(version, node_type)
+            assert images and all(image.endswith(f':v{version}') for image in images)
+            assert len(set(images)) == len(images)
+
+
+def test_images_by_node_type_and_version():
+    infra_images = container_images.images('3.6', NodeType.INFRA)
+    assert 'registry.access.redhat.com/openshift3/ose-haproxy-router:v3.6' in infra_images
+    assert 'registry.access.redhat.com/openshift3/ose-haproxy-router:v3.6' not in \
+        container_images.images('3.6', NodeType.COMPUTE)
+    assert 'registry.access.redhat.com/openshift3/ose-service-catalog:v3.6' not in \
+        container_images.images('3.6', NodeType.MASTER)
+    master_images = container_images.images('3.9', NodeType.MASTER)
+    assert 'registry.access.redhat.com/openshift3/ose-service-catalog:v3.9' in master_images
+    assert 'registry.access.redhat.com/openshift3/ose-web-console:v3.9' in master_images
+
+
+def test_mirrored():
+    image = 'registry.access.redhat.com/openshift3/ose-pod:v3.9'
+    assert container_images.mirrored(image) == image
+    assert container_images.mirrored(image, 'mirror.example.com:5000') == \
+        'mirror.example.com:5000/openshift3/ose-pod:v3.9'
+    assert container_images.mirrored('docker.io/library/busybox', 'mirror.example.com:5000') == \
+        'docker.io/library/busybox'
+
+
+def render_install_inventory(**variables):
+    path = os.path.join(PLAYBOOKS_DIR, 'roles', 'install', 'templates', 'inventory.j2')
+    with open(path, 'r') as f:
+        template = jinja2.Template(f.read())
+    return template.render(master_nodes=['master-0'], infra_nodes=[], compute_nodes=[],
+                           openshift_master_default_subdomain='apps', **variables).splitlines()
+
+
+def test_install_inventory_uses_the_prepulled_tag():
+    assert 'openshift_image_tag=v3.9' in render_install_inventory(openshift_image_tag=container_images.image_tag('3.9'))
+    assert not any(line.startswith('openshift_image_tag') for line in render_install_inventory())
+    assert container_images.images('3.9', NodeType.MASTER)[0].endswith(':v3.9')
+
+
+class FakeMgmtEnv(object):
+
+    def __init__(self, path):
+        self.path = path
+
+    def write_file(self, filename, content):
+        pass
+
+    def file_abspath(self, filename):
+        return os.path.join(self.path, filename)
+
+
+class FakeCluster(object):
+
+    def __init__(self, path):
+        self.name = 'test-cluster'
+        self.mgmt_env = FakeMgmtEnv(path)
+        self.nodes = [FakeNode('master-0', NodeType.MASTER), FakeNode('compute-0', NodeType.COMPUTE)]
+        self.stack = namedtuple('FakeStack', ['outputs', 'fact_cache'])(
+            namedtuple('FakeOutputs', ['ocp_servers_domain'])('example.com'), None)
+
+
+@pytest.mark.parametrize('prepull', [True, False])
+def test_install_tag_only_with_prepull(monkeypatch, tmpdir, prepull):
+    monkeypatch.setattr(CONFIG_DATA, '_data', {'prepull': {'enabled': prepull}})
+    runs = []
+    monkeypatch.setattr(cluster_module, 'run_ansible_playbook',
+                        lambda name, inventory, logger, extra_vars, fact_cache: runs.append(extra_vars) or 0)
+    OpenshiftClusterBuilder()._run_install(FakeCluster(str(tmpdir)), '3.9')
+    assert runs[0].get('openshift_image_tag') == ('v3.9' if prepull else None)
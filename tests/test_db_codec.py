@@ -0,0 +1,69 @@
+from datetime import date, datetime, timedelta
+
+import bson
+
+from openshift_pool.common import NodeType
+from openshift_pool.db import DB, Codec, CODEC
+from openshift_pool.instrumentation import Span
+
+
+def test_round_trip():
+    now = datetime(2018, 5, 1, 12, 30)
+    document = {
+        'node_types': [NodeType.MASTER, NodeType.COMPUTE],
+        'created_at': now,
+        'day': date(2018, 5, 1),
+        'timeout': timedelta(minutes=5),
+        'hosts': {'master-0', 'infra-0'},
+        'phases': [Span('cluster-a', 'cluster.install', now, 1.5, None)],
+        'nested': {'tuple': (1, 2), 1: 'int key'},
+        'unknown': object,
+    }
+    encoded = CODEC.encode(document)
+    decoded = CODEC.decode(bson.decode(bson.encode(encoded)))
+    assert decoded['node_types'] == [NodeType.MASTER, NodeType.COMPUTE]
+    assert decoded['created_at'] == now
+    assert decoded['day'] == date(2018, 5, 1)
+    assert decoded['timeout'] == timedelta(minutes=5)
+    assert decoded['hosts'] == {'master-0', 'infra-0'}
+    assert decoded['phases'] == [Span('cluster-a', 'cluster.install', now, 1.5, None)]
+    assert decoded['nested'] == {'tuple': [1, 2], '1': 'int key'}
+    assert decoded['unknown'] == str(object)
+    assert list(decoded) == list(encoded)
+    assert DB.bson_decode(DB.bson_encode(document)) == decoded
+
+
+def test_deep_documents():
+    document = leaf = {}
+    for _ in range(5000):
+        leaf['child'] = {}
+        leaf = leaf['child']
+    leaf['node_type'] = NodeType.INFRA
+    decoded = CODEC.decode(CODEC.encode(document))
+    for _ in range(5000):
+        decoded = decoded['child']
+    assert decoded == {'node_type': NodeType.INFRA}
+
+
+def test_codec_options_encode_registered_types():
+    options = CODEC.codec_options
+    raw = bson.decode(bson.encode({'node_type': NodeType.MASTER, 'hosts': {'a'}, 'other': object},
+                                  codec_options=options))
+    assert raw['node_type'] == {'__type__': 'NodeType', 'value': 'master'}
+    assert CODEC.decode(raw) == {'node_type': NodeType.MASTER, 'hosts': {'a'}, 'other': str(object)}
+
+
+def test_dispatch_cache_reset_on_register():
+    codec = Codec()
+
+    class Host(object):
+        def __init__(self, name):
+            self.name = name
+
+        def __eq__(self, other):
+            return isinstance(other, Host) and other.name == self.name
+
+    host = Host('a')
+    assert codec.encode(host) == str(host)
+    codec.register(Host, 'Host', lambda host: host.name, Host)
+    assert codec.decode(codec.encode([Host('a')])) == [Host('a')]
@@ -0,0 +1,89 @@
+import threading
+from collections import namedtuple
+
+import pytest
+
+from config import CONFIG_DATA
+from openshift_pool.common import Singleton
+from openshift_pool.openshift.cluster import OpenshiftClusterBuilder
+from openshift_pool.openshift.stack import StackBuilder
+from openshift_pool.openshift.stack_outputs import StackOutputs
+from openshift_pool.openshift.probe import ProbeResult
+from openshift_pool.exceptions import PipelineStageFailedException, InstanceNotReadyException
+
+
+FakeNode = namedtuple('FakeNode', ['fqdn'])
+HOSTS = {'master-0': '10.0.0.1', 'compute-0': '10.0.0.2'}
+
+
+class FakeStack(object):
+    """A stack whose instances are reachable after the given number of probes"""
+
+    def __init__(self, probes_until_ready):
+        self.name = 'test-stack'
+        self.outputs = StackOutputs(
+            [{'output_key': f'{key}_name', 'output_value': f'{key}.example.com'} for key in HOSTS] +
+            [{'output_key': f'{key}_public_ip', 'output_value': ip} for key, ip in HOSTS.items()], 'example.com')
+        self.probes_until_ready = dict(probes_until_ready)
+        self.events = []
+        self._lock = threading.Lock()
+
+    def probe_connections(self, hostnames=None):
+        results = {}
+        with self._lock:
+            for address in hostnames:
+                self.probes_until_ready[address] -= 1
+                reachable = self.probes_until_ready[address] <= 0
+                if reachable:
+                    self.events.append(('ready', address))
+                results[address] = ProbeResult(address, reachable, reachable, reachable, False, None, 0.0,
+                                               None if reachable else 'tcp:22 connection failed')
+        return results
+
+
+class FakeCluster(object):
+
+    def __init__(self, stack):
+        self.name = stack.name
+        self.stack = stack
+        self.nodes = [FakeNode(host.fqdn) for host in stack.outputs.hosts]
+
+
+@pytest.yield_fixture
+def builder(monkeypatch):
+    monkeypatch.setattr(CONFIG_DATA, '_data', {'readiness': {'deadline': 1, 'poll_interval': 0.05,
+                                                             'max_interval': 0.05}})
+    Singleton._instances.pop(StackBuilder, None)
+    Singleton._instances.pop(OpenshiftClusterBuilder, None)
+
+    def exchange_keys(stack_builder, stack, limit=None, isolated=False):
+        with stack._lock:
+            stack.events.append(('exchange_keys', stack.outputs.by_fqdn(limit).public_ip))
+        return 0
+
+    monkeypatch.setattr(StackBuilder, 'exchange_keys', exchange_keys)
+    monkeypatch.setattr(StackBuilder, '_create_domains', lambda stack_builder, stack: None)
+    monkeypatch.setattr(OpenshiftClusterBuilder, '_create_metadata', lambda cluster_builder, cluster, version: None)
+    monkeypatch.setattr(OpenshiftClusterBuilder, '_run_pre_install', lambda *args, **kwargs: 0)
+    monkeypatch.setattr(OpenshiftClusterBuilder, '_run_install', lambda *args, **kwargs: 0)
+    yield OpenshiftClusterBuilder()
+    Singleton._instances.pop(StackBuilder, None)
+    Singleton._instances.pop(OpenshiftClusterBuilder, None)
+
+
+def test_keys_exchanged_once_the_node_is_reachable(builder):
+    stack = FakeStack({'10.0.0.1': 1, '10.0.0.2': 3})
+    report = builder.deploy_pipeline(FakeCluster(stack), '3.9').run()
+    assert [event for event in stack.events if event[1] == '10.0.0.2'] == [
+        ('ready', '10.0.0.2'), ('exchange_keys', '10.0.0.2')]
+    assert stack.probes_until_ready == {'10.0.0.1': 0, '10.0.0.2': 0}
+    results = {result.name: result for result in report.results}
+    assert results['exchange_keys:compute-0.example.com'].deps == ('ready:compute-0.example.com', )
+
+
+def test_unreachable_node_fails_the_pipeline(builder):
+    stack = FakeStack({'10.0.0.1': 1, '10.0.0.2': 1000})
+    with pytest.raises(PipelineStageFailedException) as error:
+        builder.deploy_pipeline(FakeCluster(stack), '3.9').run()
+    assert isinstance(error.value.error, InstanceNotReadyException)
+    assert ('exchange_keys', '10.0.0.2') not in stack.events
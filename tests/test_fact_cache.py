@@ -0,0 +1,96 @@
+import os
+import logging
+import threading
+import multiprocessing
+
+import pytest
+
+from openshift_pool.playbooks.fact_cache import FactCache
+
+
+class FakeMgmtEnv(object):
+
+    def __init__(self, path):
+        self.path = path
+        self.log = logging.getLogger('test-fact-cache')
+
+    def file_abspath(self, filename):
+        return os.path.join(self.path, filename)
+
+
+@pytest.fixture
+def mgmt_env(tmpdir):
+    return FakeMgmtEnv(str(tmpdir))
+
+
+def test_stamp_and_invalidation(mgmt_env):
+    cache = FactCache(mgmt_env, 'stack-id:1')
+    assert cache.stamp == 'stack-id:1'
+    with open(os.path.join(cache.path, 'master-0'), 'w') as f:
+        f.write('{}')
+    assert cache.cached_hosts() == ['master-0']
+    cache.validate('stack-id:1')
+    assert cache.cached_hosts() == ['master-0']
+    cache.validate('stack-id:2')
+    assert cache.stamp == 'stack-id:2'
+    assert cache.cached_hosts() == []
+
+
+def test_expired_facts_are_not_cached(mgmt_env):
+    cache = FactCache(mgmt_env, 'stack-id:1', timeout=60)
+    host_path = os.path.join(cache.path, 'master-0')
+    with open(host_path, 'w') as f:
+        f.write('{}')
+    os.utime(host_path, (0, 0))
+    assert cache.cached_hosts() == []
+
+
+def test_concurrent_validate(mgmt_env):
+    caches = [FactCache(mgmt_env, 'stack-id:1') for _ in range(8)]
+    errors = []
+
+    def validate(cache):
+        try:
+            cache.validate('stack-id:2')
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=validate, args=(cache, )) for cache in caches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert caches[0].stamp == 'stack-id:2'
+
+
+def test_record_time_saved(mgmt_env):
+    cache = FactCache(mgmt_env, 'stack-id:1')
+    cold = cache.record('pre_install', 10.0, 0, 5)
+    assert cold['time_saved'] == 0.0
+    warm = cache.record('install', 1.0, 5, 5)
+    assert warm['time_saved'] == 9.0
+    assert [record['playbook'] for record in cache.stats()] == ['pre_install', 'install']
+
+
+def test_concurrent_record_from_processes(mgmt_env):
+    cache = FactCache(mgmt_env, 'stack-id:1')
+    context = multiprocessing.get_context('fork')
+
+    def record(i):
+        for j in range(5):
+            cache.record(f'playbook-{i}-{j}', 1.0, 0, 1)
+
+    processes = [context.Process(target=record, args=(i, )) for i in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert len(cache.stats()) == 20
+
+
+def test_settings(mgmt_env):
+    cache = FactCache(mgmt_env, 'stack-id:1', timeout=600, gather_subset='network')
+    assert cache.settings['ANSIBLE_CACHE_PLUGIN_CONNECTION'] == ('CACHE_PLUGIN_CONNECTION', cache.path)
+    assert cache.settings['ANSIBLE_CACHE_PLUGIN_TIMEOUT'] == ('CACHE_PLUGIN_TIMEOUT', 600)
+    assert cache.settings['ANSIBLE_GATHER_SUBSET'] == ('DEFAULT_GATHER_SUBSET', 'network')
@@ -0,0 +1,96 @@
+import time
+import threading
+from collections import namedtuple
+
+import pytest
+
+from openshift_pool.common import NodeType
+from openshift_pool.openshift.fanout import FanOut
+from openshift_pool.openshift.ssh_pool import SSHConnectionPool
+from tests.ssh_server import SSHTestServer
+
+
+FakeNode = namedtuple('FakeNode', ['fqdn', 'type'])
+NODES = [FakeNode('127.0.0.1', NodeType.MASTER), FakeNode('localhost', NodeType.COMPUTE)]
+
+
+def handler(channel, command):
+    """stream <n>: n stdout lines 0.1s apart; fail: a stderr line and exit status 1; hang: never ends;
+    follow: keeps printing (like `tail -f`)"""
+    if command.startswith('stream'):
+        for i in range(int(command.split()[1])):
+            channel.sendall(f'line {i}\n'.encode())
+            time.sleep(0.1)
+    elif command == 'fail':
+        channel.sendall_stderr(b'no such service\n')
+        return 1
+    elif command == 'hang':
+        time.sleep(5)
+    elif command == 'follow':
+        deadline = time.monotonic() + 5
+        try:
+            while time.monotonic() < deadline:
+                channel.sendall(b'log line\n' * 100)
+        except OSError:
+            pass  # Closed by the client (on its timeout)
+    return 0
+
+
+@pytest.yield_fixture(scope='module')
+def server():
+    ssh_server = SSHTestServer(handler=handler)
+    yield ssh_server
+    ssh_server.close()
+
+
+@pytest.yield_fixture
+def fan_out(server):
+    pool = SSHConnectionPool()
+    yield FanOut(max_workers=4, timeout=10, password=server.password, port=server.port, ssh_pool=pool)
+    pool.close()
+
+
+def test_output_streamed_as_it_arrives(fan_out):
+    arrivals = []
+    lock = threading.Lock()
+    start = time.monotonic()
+
+    def on_output(node, stream, line):
+        with lock:
+            arrivals.append((node.fqdn, stream, line, time.monotonic() - start))
+
+    results = fan_out.run(NODES, 'stream 5', on_output=on_output)
+    assert list(results) == ['127.0.0.1', 'localhost']
+    assert all(result.exit_status == 0 and result.stdout.splitlines() == [f'line {i}' for i in range(5)]
+               for result in results.values())
+    first_lines = [arrival for arrival in arrivals if arrival[2] == 'line 0']
+    assert len(first_lines) == 2
+    # The first lines arrive long before the commands end (and the nodes run in parallel)
+    assert all(arrival[3] < 0.4 for arrival in first_lines)
+    assert max(result.elapsed for result in results.values()) < 1.5
+
+
+def test_failures_reported_per_node(fan_out):
+    finished = []
+    results = fan_out.run(NODES[:1], 'fail', on_result=finished.append)
+    assert results['127.0.0.1'].exit_status == 1
+    assert results['127.0.0.1'].stderr == 'no such service\n'
+    assert finished == [results['127.0.0.1']]
+
+
+def test_timeout_per_node(fan_out):
+    start = time.monotonic()
+    results = fan_out.run(NODES, 'hang', timeout=0.5)
+    assert time.monotonic() - start < 2
+    for result in results.values():
+        assert result.exit_status is None
+        assert 'timed out' in result.error
+
+
+def test_timeout_of_command_that_keeps_printing(fan_out):
+    start = time.monotonic()
+    results = fan_out.run(NODES, 'follow', timeout=0.5)
+    assert time.monotonic() - start < 2
+    for result in results.values():
+        assert result.exit_status is None
+        assert 'timed out' in result.error
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+
+from config import CONFIG_DATA
+from openshift_pool.openshift.golden_images import GoldenImages
+from openshift_pool.openshift.image_service import LocalImageService, get_local_image_service
+
+
+@pytest.fixture(autouse=True)
+def config(monkeypatch):
+    data = {'openstack': {'parameters': {'image': 'rhel-7.5'}},
+            'golden_images': {'enabled': True, 'max_age_days': 14, 'service': 'local'}}
+    monkeypatch.setattr(CONFIG_DATA, '_data', data)
+    return data
+
+
+@pytest.fixture
+def golden_images():
+    return GoldenImages(collection=mongomock.MongoClient().db.golden_images, image_service=LocalImageService())
+
+
+def bake(golden_images, version='3.9'):
+    image_id = golden_images.image_service.snapshot('master-0', f'ocp-{version}-golden')
+    return golden_images.record(version, image_id, f'ocp-{version}-golden')
+
+
+def test_get_fresh_image(golden_images):
+    doc = bake(golden_images)
+    assert golden_images.get('3.9')['image_id'] == doc['image_id']
+    assert golden_images.get('3.10') is None
+
+
+def test_newer_image_replaces_the_active_one(golden_images):
+    old, new = bake(golden_images), bake(golden_images)
+    assert golden_images.get('3.9')['image_id'] == new['image_id']
+    assert golden_images.stale_reason(golden_images.db.find_one({'image_id': old['image_id']})) == \
+        'Replaced by a newer image'
+
+
+def test_stale_by_age(golden_images):
+    doc = bake(golden_images)
+    golden_images.db.update_one({'image_id': doc['image_id']},
+                                {'$set': {'baked_at': datetime.now() - timedelta(days=15)}})
+    assert golden_images.get('3.9') is None
+    assert golden_images.db.find_one({'image_id': doc['image_id']})['state'] == GoldenImages.STATE_STALE
+
+
+def test_stale_by_base_image(golden_images, config):
+    bake(golden_images)
+    config['openstack']['parameters']['image'] = 'rhel-7.6'
+    assert golden_images.get('3.9') is None
+
+
+def test_stale_by_deleted_image(golden_images):
+    doc = bake(golden_images)
+    golden_images.image_service.delete(doc['image_id'])
+    assert golden_images.get('3.9') is None
+    assert golden_images.list()[0]['stale_reason'] == 'The image is not active (deleted)'
+
+
+def test_prune(golden_images):
+    old, new = bake(golden_images), bake(golden_images)
+    pruned = golden_images.prune()
+    assert [doc['image_id'] for doc in pruned] == [old['image_id']]
+    assert old['image_id'] not in golden_images.image_service.images
+    assert [doc['image_id'] for doc in golden_images.list()] == [new['image_id']]
+
+
+def test_local_service_shared_by_the_registries():
+    collection = mongomock.MongoClient().db.golden_images
+    first, second = GoldenImages(collection=collection), GoldenImages(collection=collection)
+    assert first.image_service is second.image_service is get_local_image_service()
+    doc = bake(first)
+    assert second.get('3.9')['image_id'] == doc['image_id']
+
+
+def test_disabled_registry_does_not_touch_the_db(config):
+    config['golden_images']['enabled'] = False
+    golden_images = GoldenImages()
+    assert not golden_images.enabled
+    assert 'db' not in golden_images.__dict__
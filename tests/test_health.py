@@ -0,0 +1,187 @@
+import time
+import threading
+from datetime import datetime, timedelta
+from collections import namedtuple, OrderedDict
+
+import pytest
+
+from openshift_pool.openshift.health import HealthEngine, CheckResult, check_nodes, check_router
+from openshift_pool.openshift.metadata_store import MetadataStore
+from openshift_pool.openshift.ssh_pool import CommandResult
+
+
+FakeNode = namedtuple('FakeNode', ['fqdn', 'exec_command'])
+FakeCluster = namedtuple('FakeCluster', ['nodes', 'master_nodes'])
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingCheck(object):
+    """A check that counts its runs, sleeps and returns the given result (or raises it)"""
+
+    def __init__(self, result=(True, 'ok'), delay=0):
+        self.result = result
+        self.delay = delay
+        self.runs = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, target):
+        with self._lock:
+            self.runs += 1
+        time.sleep(self.delay)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_engine(clock, **checks):
+    return HealthEngine(OrderedDict(checks), ttls={'slow': 300}, default_ttl=30, clock=clock)
+
+
+def test_checks_results_in_order(clock):
+    engine = make_engine(clock, first=CountingCheck(), second=CountingCheck((False, 'down')))
+    status = engine.run('cluster', object())
+    assert status.name == 'cluster'
+    assert not status.healthy
+    assert list(status.checks) == ['first', 'second']
+    assert status.checks['first'].ok and status.checks['first'].detail == 'ok'
+    assert not status.checks['second'].ok and status.checks['second'].detail == 'down'
+    assert not any(result.cached for result in status.checks.values())
+
+
+def test_results_cached_per_check_ttl(clock):
+    fast, slow = CountingCheck(), CountingCheck()
+    engine = make_engine(clock, fast=fast, slow=slow)
+    engine.run('cluster', object())
+    clock.now = 10
+    status = engine.run('cluster', object())
+    assert (fast.runs, slow.runs) == (1, 1)
+    assert all(result.cached for result in status.checks.values())
+    clock.now = 31
+    status = engine.run('cluster', object())
+    assert (fast.runs, slow.runs) == (2, 1)
+    assert not status.checks['fast'].cached and status.checks['slow'].cached
+
+
+def test_cache_per_key_and_refresh(clock):
+    check = CountingCheck()
+    engine = make_engine(clock, check=check)
+    engine.run('first', object())
+    engine.run('second', object())
+    assert check.runs == 2
+    engine.run('first', object(), refresh=True)
+    assert check.runs == 3
+    engine.invalidate('second')
+    engine.run('second', object())
+    engine.run('first', object())
+    assert check.runs == 4
+
+
+def test_selected_checks(clock):
+    first, second = CountingCheck(), CountingCheck()
+    engine = make_engine(clock, first=first, second=second)
+    status = engine.run('cluster', object(), names=['second'])
+    assert list(status.checks) == ['second']
+    assert (first.runs, second.runs) == (0, 1)
+    with pytest.raises(AssertionError):
+        engine.run('cluster', object(), names=['unknown'])
+
+
+def test_raising_check_is_failed(clock):
+    engine = make_engine(clock, broken=CountingCheck(RuntimeError('no route')), fine=CountingCheck())
+    status = engine.run('cluster', object())
+    assert not status.healthy
+    assert status.checks['broken'].detail == 'RuntimeError: no route'
+    assert status.checks['fine'].ok
+
+
+def test_checks_run_concurrently():
+    checks = {f'check{i}': CountingCheck(delay=0.5) for i in range(4)}
+    engine = HealthEngine(OrderedDict(checks))
+    start = time.monotonic()
+    status = engine.run('cluster', object())
+    assert status.healthy
+    assert time.monotonic() - start < 1.5
+
+
+def test_concurrent_runs_share_checks():
+    check = CountingCheck(delay=0.5)
+    engine = HealthEngine(OrderedDict(check=check))
+    threads = [threading.Thread(target=engine.run, args=('cluster', object())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert check.runs == 1
+
+
+@pytest.fixture
+def store(tmpdir):
+    return MetadataStore(str(tmpdir.join('metadata.db')))
+
+
+def test_results_persisted_across_engines(store):
+    check = CountingCheck()
+    HealthEngine(OrderedDict(check=check), store=store).run('cluster', object())
+    # Another process (e.g. the next CLI run) gets the persisted result within its TTL
+    status = HealthEngine(OrderedDict(check=check), store=store).run('cluster', object())
+    assert check.runs == 1
+    assert status.checks['check'].cached and status.checks['check'].ok
+    status = HealthEngine(OrderedDict(check=check), store=store).run('cluster', object(), refresh=True)
+    assert check.runs == 2 and not status.checks['check'].cached
+    # A stack that is not a cluster of the pool (e.g. created by `cli.py create`) is not listed by its status
+    assert store.clusters() == [] and store.keys('cluster') == []
+
+
+def test_expired_persisted_results(store):
+    check = CountingCheck()
+    expired = CheckResult('check', True, 'ok', 0.1, datetime.now() - timedelta(minutes=1), False)
+    store.set_check_result('cluster', 'check', expired)
+    HealthEngine(OrderedDict(check=check), default_ttl=30, store=store).run('cluster', object())
+    assert check.runs == 1
+    engine = HealthEngine(OrderedDict(check=check), default_ttl=30, store=store)
+    engine.run('cluster', object())
+    assert check.runs == 1
+    engine.invalidate()
+    assert store.check_results('cluster') == {}
+    HealthEngine(OrderedDict(check=check), store=store).run('cluster', object())
+    assert check.runs == 2
+
+
+def fake_cluster(output, exit_status=0, fqdns=('master-0', 'node-0')):
+    def exec_command(command, timeout=None):
+        return CommandResult(exit_status, output, 'error' if exit_status else '')
+    master = FakeNode(fqdns[0], exec_command)
+    return FakeCluster([master] + [FakeNode(fqdn, exec_command) for fqdn in fqdns[1:]], [master])
+
+
+def test_check_nodes():
+    ok, detail = check_nodes(fake_cluster('master-0 Ready 1d v1.11\nnode-0 Ready 1d v1.11\n'))
+    assert ok and detail == '2 nodes are Ready'
+    ok, detail = check_nodes(fake_cluster('master-0 Ready,SchedulingDisabled 1d v1.11\nnode-0 NotReady 1d v1.11\n'))
+    assert not ok and detail == 'node-0: NotReady'
+    ok, detail = check_nodes(fake_cluster('master-0 Ready 1d v1.11\n'))
+    assert not ok and detail == 'node-0: not registered'
+    ok, _ = check_nodes(fake_cluster('', exit_status=1))
+    assert not ok
+
+
+def test_check_router():
+    ok, detail = check_router(fake_cluster('router-1-abc 1/1 Running 0 1d\n'))
+    assert ok and detail == '1 router pods are running'
+    ok, detail = check_router(fake_cluster('router-1-abc 0/1 CrashLoopBackOff 5 1d\n'))
+    assert not ok and detail == 'router-1-abc: CrashLoopBackOff (0/1)'
+    ok, detail = check_router(fake_cluster(''))
+    assert not ok and detail == 'no router pods'
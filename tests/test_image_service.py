@@ -0,0 +1,59 @@
+import pytest
+
+from openshift_pool.openshift.image_service import ImageService, LocalImageService
+from openshift_pool.exceptions import ImageSnapshotFailedException
+
+
+class FlakyImageService(LocalImageService):
+    """Images that are queued for a number of status checks before they become active (or killed)"""
+
+    def __init__(self, checks, final_status):
+        self.checks = checks
+        self.final_status = final_status
+        LocalImageService.__init__(self)
+
+    def get(self, image_id):
+        image = LocalImageService.get(self, image_id)
+        if image is not None:
+            self.checks -= 1
+            image['status'] = 'queued' if self.checks > 0 else self.final_status
+        return image
+
+
+def test_local_snapshot_lifecycle():
+    service = LocalImageService()
+    image_id = service.snapshot('ocp-master-0.example.com', 'ocp-3.9-golden', metadata={'ocp_version': '3.9'})
+    image = service.wait_active(image_id)
+    assert image['name'] == 'ocp-3.9-golden'
+    assert image['status'] == ImageService.STATUS_ACTIVE
+    assert service.images[image_id]['metadata'] == {'ocp_version': '3.9'}
+    service.delete(image_id)
+    assert service.get(image_id) is None
+    service.delete(image_id)
+
+
+def test_wait_active_polls_until_active():
+    service = FlakyImageService(checks=3, final_status='active')
+    image_id = service.snapshot('server', 'image')
+    assert service.wait_active(image_id, interval=0)['status'] == 'active'
+    assert service.checks == 0
+
+
+def test_wait_active_failures():
+    service = FlakyImageService(checks=1, final_status='killed')
+    with pytest.raises(ImageSnapshotFailedException):
+        service.wait_active(service.snapshot('server', 'image'), interval=0)
+    service = FlakyImageService(checks=1000, final_status='active')
+    with pytest.raises(ImageSnapshotFailedException):
+        service.wait_active(service.snapshot('server', 'image'), timeout=0.05, interval=0.01)
+    with pytest.raises(ImageSnapshotFailedException):
+        LocalImageService().wait_active('missing', interval=0)
+
+
+def test_incomplete_service_is_not_instantiated():
+    class SnapshotOnlyService(ImageService):
+        def snapshot(self, server_name, image_name, metadata=None):
+            return 'image-id'
+
+    with pytest.raises(TypeError):
+        SnapshotOnlyService()
@@ -0,0 +1,104 @@
+import os
+import time
+
+import pytest
+
+from config import CONFIG_DATA
+from openshift_pool.common import Singleton
+from openshift_pool.instrumentation import Tracer, PrometheusTextfileExporter, percentile, timed
+
+
+class Builder(object):
+
+    @timed('test.phase')
+    def build(self, target, fail=False):
+        if fail:
+            raise ValueError('build failed')
+        return target
+
+
+class Target(object):
+    name = 'test-instrumentation-target'
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile([3.0], 95) == 3.0
+    assert percentile([], 50) is None
+
+
+def test_span_records_duration_and_error():
+    tracer = Tracer()
+    with tracer.span('test-instrumentation-span', 'ok'):
+        pass
+    with pytest.raises(ZeroDivisionError):
+        with tracer.span('test-instrumentation-span', 'failed'):
+            1 / 0
+    spans = tracer.spans('test-instrumentation-span')
+    assert [span.phase for span in spans] == ['ok', 'failed']
+    assert spans[0].error is None and spans[0].duration >= 0
+    assert 'ZeroDivisionError' in spans[1].error
+
+
+def test_timed_traces_by_target_name():
+    builder = Builder()
+    target = Target()
+    assert builder.build(target) is target
+    with pytest.raises(ValueError):
+        builder.build('test-instrumentation-name', fail=True)
+    assert [span.phase for span in Tracer().spans(Target.name)] == ['test.phase']
+    assert Tracer().spans('test-instrumentation-name')[0].error is not None
+
+
+@pytest.yield_fixture
+def tracer():
+    # A tracer of its own, so its DB client is created by the config of the test
+    Singleton._instances.pop(Tracer, None)
+    yield Tracer()
+    Singleton._instances.pop(Tracer, None)
+
+
+def test_flush_without_storage(tracer, monkeypatch):
+    monkeypatch.setattr(CONFIG_DATA, '_data', {})
+    with tracer.span('test-instrumentation-flush', 'phase'):
+        pass
+    assert [span.phase for span in tracer.flush('test-instrumentation-flush')] == ['phase']
+    assert 'phase_timings' not in tracer.__dict__
+    assert tracer.spans('test-instrumentation-flush') == []
+
+
+def test_flush_does_not_wait_for_the_db(tracer, monkeypatch):
+    monkeypatch.setattr(CONFIG_DATA, '_data', {'instrumentation': {'store': True, 'timeout': 0.2}})
+    with tracer.span('test-instrumentation-flush', 'phase'):
+        pass
+    start = time.monotonic()
+    assert len(tracer.flush('test-instrumentation-flush')) == 1
+    assert time.monotonic() - start < 5
+
+
+def test_phase_stats():
+    spans = [dict(phase='stack.provision', duration=float(d), error=None) for d in range(1, 21)]
+    spans.append(dict(phase='cluster.install', duration=600.0, error='AssertionError()'))
+    stats = Tracer.phase_stats(spans)
+    assert list(stats.keys()) == ['cluster.install', 'stack.provision']
+    assert stats['stack.provision']['count'] == 20
+    assert stats['stack.provision']['p50'] == 10.0
+    assert stats['stack.provision']['p95'] == 19.0
+    assert stats['stack.provision']['failures'] == 0
+    assert stats['cluster.install']['failures'] == 1
+
+
+def test_prometheus_textfile_export(tmpdir):
+    path = os.path.join(str(tmpdir), 'openshift_pool.prom')
+    stats = Tracer.phase_stats([dict(phase='stack.provision', duration=4.0, error=None),
+                                dict(phase='stack.provision', duration=6.0, error=None)])
+    PrometheusTextfileExporter(path).export(stats)
+    with open(path, 'r') as f:
+        content = f.read()
+    assert '# TYPE openshift_pool_phase_duration_seconds summary' in content
+    assert 'openshift_pool_phase_duration_seconds{phase="stack.provision",quantile="0.5"} 4.0' in content
+    assert 'openshift_pool_phase_duration_seconds_sum{phase="stack.provision"} 10.0' in content
+    assert 'openshift_pool_phase_duration_seconds_count{phase="stack.provision"} 2' in content
+    assert os.listdir(str(tmpdir)) == ['openshift_pool.prom']
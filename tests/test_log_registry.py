@@ -0,0 +1,86 @@
+import os
+import logging
+
+import pytest
+
+from openshift_pool.log_registry import LogRegistry
+
+
+@pytest.yield_fixture
+def registry():
+    reg = LogRegistry(logging.Formatter('%(message)s'), stream=None)
+    yield reg
+    reg.stop()
+
+
+def read_lines(path):
+    with open(path, 'r') as f:
+        return f.read().splitlines()
+
+
+def test_logger_configured_once(registry, tmpdir):
+    path = str(tmpdir.join('a.log'))
+    for _ in range(50):
+        logger = registry.get_logger('test_once', path)
+    assert len(logger.handlers) == 1
+    logger.info('message')
+    registry.flush()
+    assert read_lines(path) == ['message']
+
+
+def test_records_routed_to_their_files(registry, tmpdir):
+    first, second = str(tmpdir.join('first.log')), str(tmpdir.join('second.log'))
+    registry.get_logger('test_route_1', first).info('to first')
+    registry.get_logger('test_route_2', second).info('to second')
+    registry.flush()
+    assert read_lines(first) == ['to first']
+    assert read_lines(second) == ['to second']
+
+
+def test_file_handler_per_file(registry, tmpdir):
+    path = str(tmpdir.join('shared.log'))
+    for i in range(20):
+        registry.get_logger(f'test_shared_{i}', path).info(f'{i}')
+    registry.flush()
+    assert registry.open_files == [path]
+    assert sorted(read_lines(path), key=int) == [str(i) for i in range(20)]
+
+
+def test_no_file_in_missing_directory(registry, tmpdir):
+    path = str(tmpdir.join('missing', 'log.log'))
+    logger = registry.get_logger('test_missing', path)
+    logger.info('dropped')
+    registry.flush()
+    assert not os.path.exists(os.path.dirname(path))
+    os.mkdir(os.path.dirname(path))
+    logger.info('written')
+    registry.flush()
+    assert read_lines(path) == ['written']
+
+
+def test_close_file(registry, tmpdir):
+    path = str(tmpdir.join('closed.log'))
+    logger = registry.get_logger('test_close', path)
+    logger.info('message')
+    registry.flush()
+    registry.close_file(path)
+    assert registry.open_files == []
+    logger.info('reopened')
+    registry.flush()
+    assert read_lines(path) == ['message', 'reopened']
+
+
+def test_records_of_forked_child(registry, tmpdir):
+    path = str(tmpdir.join('forked.log'))
+    logger = registry.get_logger('test_fork', path)
+    logger.info('parent before')
+    registry.flush()
+    pid = os.fork()
+    if not pid:
+        logger.info('child')
+        registry.flush()
+        os._exit(0)
+    os.waitpid(pid, 0)
+    logger.info('parent after')
+    registry.flush()
+    assert sorted(read_lines(path)) == ['child', 'parent after', 'parent before']
@@ -0,0 +1,104 @@
+import os
+import pickle
+import sqlite3
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from openshift_pool.openshift.metadata_store import MetadataStore, ClusterMetadata
+
+
+@pytest.fixture
+def store(tmpdir):
+    return MetadataStore(str(tmpdir.join('metadata.db')))
+
+
+def test_per_key_updates(store):
+    metadata = ClusterMetadata(store, 'cluster-a')
+    metadata['owner'] = 'alice'
+    metadata['phases'] = [{'phase': 'cluster.install', 'duration': 1.5}]
+    assert metadata['owner'] == 'alice'
+    assert metadata.get('missing', 'default') == 'default'
+    with pytest.raises(KeyError):
+        metadata['missing']
+    assert sorted(metadata) == ['owner', 'phases']
+    del metadata['owner']
+    assert 'owner' not in metadata
+    assert store.clusters()[0]['owner'] is None
+    # A new view (e.g. in another process) reads the written keys
+    assert dict(ClusterMetadata(store, 'cluster-a')) == {'phases': [{'phase': 'cluster.install', 'duration': 1.5}]}
+
+
+def test_index_queries(store):
+    now = datetime.now()
+    for i, (owner, version) in enumerate([('alice', '3.9'), ('bob', '3.9'), ('alice', '3.10')]):
+        ClusterMetadata(store, f'cluster-{i}').update(owner=owner, version=version, flavor='m1.large',
+                                                      created_at=now + timedelta(minutes=i))
+    assert [doc['name'] for doc in store.clusters(owner='alice')] == ['cluster-0', 'cluster-2']
+    assert [doc['name'] for doc in store.clusters(owner='alice', version='3.9')] == ['cluster-0']
+    assert [doc['name'] for doc in store.clusters(created_after=now)] == ['cluster-1', 'cluster-2']
+    assert [doc['name'] for doc in store.clusters(flavor='m1.large')] == ['cluster-0', 'cluster-1', 'cluster-2']
+    store.delete('cluster-1')
+    assert [doc['name'] for doc in store.clusters(version='3.9')] == ['cluster-0']
+    assert store.items('cluster-1') == {}
+
+
+class FailingCommit(object):
+    """A connection whose COMMIT fails, like a COMMIT that gets SQLITE_BUSY"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, *args):
+        if sql == 'COMMIT':
+            raise sqlite3.OperationalError('database is locked')
+        return self.conn.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+def test_failed_commit_is_rolled_back(store, monkeypatch):
+    conn = store.connection
+    monkeypatch.setattr(MetadataStore, 'connection', property(lambda self: FailingCommit(conn)))
+    with pytest.raises(sqlite3.OperationalError):
+        store.set('cluster-a', 'owner', 'alice')
+    assert not conn.in_transaction
+    monkeypatch.undo()
+    assert store.get('cluster-a', 'owner') is None
+    store.set('cluster-a', 'owner', 'bob')
+    assert store.get('cluster-a', 'owner') == 'bob'
+
+
+def _write_keys(path, worker):
+    store = MetadataStore(path)
+    for i in range(20):
+        store.set('shared', f'{worker}-{i}', i)
+
+
+def test_concurrent_writers(store):
+    with ThreadPoolExecutor(4) as executor:
+        list(executor.map(lambda worker: _write_keys(store.path, f'thread{worker}'), range(4)))
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_write_keys, args=(store.path, f'process{worker}')) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    assert len(store.keys('shared')) == 8 * 20
+
+
+def test_migrate_pickle(store, tmpdir):
+    mgmt_env = tmpdir.mkdir('cluster-old')
+    pickle_path = str(mgmt_env.join('.metadata'))
+    with open(pickle_path, 'wb') as f:
+        pickle.dump({'owner': 'alice', 'flavor': 'm1.large', 'name': 'cluster-old'}, f)
+    store.set('cluster-old', 'owner', 'bob')
+    assert store.migrate_workspace(str(tmpdir)) == ['cluster-old']
+    assert store.items('cluster-old') == {'owner': 'bob', 'flavor': 'm1.large', 'name': 'cluster-old'}
+    assert store.clusters(flavor='m1.large')[0]['name'] == 'cluster-old'
+    assert not os.path.exists(pickle_path) and os.path.exists(f'{pickle_path}.migrated')
+    assert store.migrate_workspace(str(tmpdir)) == []
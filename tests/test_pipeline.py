@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+from openshift_pool.pipeline import Pipeline
+from openshift_pool.exceptions import PipelineStageFailedException
+
+
+def sleeper(seconds, calls=None, name=None):
+    def func():
+        time.sleep(seconds)
+        if calls is not None:
+            calls.append(name)
+    return func
+
+
+def test_independent_stages_overlap():
+    pipeline = Pipeline('test')
+    pipeline.add('stack', sleeper(0.05))
+    pipeline.add('dns', sleeper(0.3), deps=['stack'])
+    pipeline.add('keys:a', sleeper(0.05), deps=['stack'])
+    pipeline.add('pre_install:a', sleeper(0.1), deps=['keys:a'])
+    pipeline.add('keys:b', sleeper(0.05), deps=['stack'])
+    pipeline.add('pre_install:b', sleeper(0.1), deps=['keys:b'])
+    pipeline.add('install', sleeper(0.05), deps=['dns', 'pre_install:a', 'pre_install:b'])
+    report = pipeline.run()
+    # Sequential would take 0.7s
+    assert report.elapsed < 0.6
+    assert report.critical_path == ['stack', 'dns', 'install']
+    results = {r.name: r for r in report.results}
+    assert results['pre_install:a'].started_at < results['dns'].finished_at
+
+
+def test_failed_stage_skips_dependants():
+    calls = []
+    pipeline = Pipeline('test')
+    pipeline.add('a', sleeper(0, calls, 'a'))
+    pipeline.add('b', lambda: 1 / 0, deps=['a'])
+    pipeline.add('c', sleeper(0.1, calls, 'c'), deps=['a'])
+    pipeline.add('d', sleeper(0, calls, 'd'), deps=['b', 'c'])
+    with pytest.raises(PipelineStageFailedException) as error:
+        pipeline.run()
+    assert isinstance(error.value.error, ZeroDivisionError)
+    assert calls == ['a', 'c']
+
+
+def test_unknown_dependency():
+    pipeline = Pipeline('test')
+    with pytest.raises(AssertionError):
+        pipeline.add('a', sleeper(0), deps=['b'])
@@ -0,0 +1,82 @@
+import os
+import time
+import signal
+import logging
+
+import pytest
+
+from config import CONFIG_DATA
+from openshift_pool import playbooks
+from openshift_pool.playbooks import RunnerProfile
+from openshift_pool.exceptions import AnsibleRunFailedException
+
+
+LOGGER = logging.getLogger('test-playbooks')
+
+
+def test_isolated_run_result(monkeypatch):
+    monkeypatch.setattr(playbooks, 'run_ansible_playbook', lambda name, *args, **kwargs: (name, os.getpid()))
+    name, pid = playbooks.run_ansible_playbook_isolated('site', 'inventory', LOGGER)
+    assert name == 'site'
+    assert pid != os.getpid()
+
+
+def test_isolated_run_error(monkeypatch):
+    def run(*args, **kwargs):
+        raise ValueError('bad inventory')
+    monkeypatch.setattr(playbooks, 'run_ansible_playbook', run)
+    with pytest.raises(AnsibleRunFailedException) as e:
+        playbooks.run_ansible_playbook_isolated('site', 'inventory', LOGGER)
+    assert 'bad inventory' in str(e.value)
+
+
+def test_isolated_run_killed(monkeypatch):
+    def run(*args, **kwargs):
+        # A forked worker (like the ones of ansible) keeps the pipe of the result open after the run is killed
+        if not os.fork():
+            time.sleep(3)
+            os._exit(0)
+        os.kill(os.getpid(), signal.SIGKILL)
+    monkeypatch.setattr(playbooks, 'run_ansible_playbook', run)
+    start = time.monotonic()
+    with pytest.raises(AnsibleRunFailedException) as e:
+        playbooks.run_ansible_playbook_isolated('site', 'inventory', LOGGER)
+    assert f'exit code: {-signal.SIGKILL}' in str(e.value)
+    assert time.monotonic() - start < 3
+
+
+@pytest.fixture
+def ansible_config(monkeypatch):
+    config = {}
+    monkeypatch.setattr(CONFIG_DATA, '_data', {'ansible': config})
+    return config
+
+
+def test_builtin_profiles(ansible_config):
+    assert RunnerProfile.get().name == 'default'
+    fast = RunnerProfile.get('fast')
+    assert (fast.forks, fast.pipelining, fast.control_persist, fast.strategy) == (30, True, '30m', 'free')
+    with pytest.raises(KeyError):
+        RunnerProfile.get('unknown')
+
+
+def test_configured_profiles(ansible_config):
+    ansible_config.update(profile='bulk', profiles={
+        'bulk': dict(forks=50, pipelining=True, strategy='free'),
+        'fast': dict(forks=10)
+    })
+    bulk = RunnerProfile.get()
+    assert bulk.name == 'bulk'
+    assert (bulk.forks, bulk.pipelining, bulk.control_persist, bulk.strategy) == (50, True, None, 'free')
+    # A configured profile replaces the builtin profile of its name
+    fast = RunnerProfile.get('fast')
+    assert (fast.forks, fast.pipelining, fast.strategy) == (10, False, 'linear')
+    assert RunnerProfile.get('default').forks == 5
+
+
+def test_profile_options_and_extra_vars(ansible_config):
+    fast = RunnerProfile.get('fast')
+    assert fast.options == dict(forks=30, verbosity=1)
+    assert fast.extra_vars == dict(ansible_ssh_pipelining=True, runner_strategy='free', runner_forks=30,
+                                   ansible_ssh_args='-C -o ControlMaster=auto -o ControlPersist=30m')
+    assert 'ansible_ssh_args' not in RunnerProfile.get('default').extra_vars
@@ -0,0 +1,110 @@
+import time
+
+import mongomock
+import pytest
+
+from config import CONFIG_DATA
+from openshift_pool.common import Loggable
+from openshift_pool.openshift.cluster import OpenshiftClusterBuilder
+from openshift_pool.pool_manager import PoolManager
+from openshift_pool.pool_registry import PoolRegistry
+from openshift_pool.exceptions import StackNotFoundException
+
+
+class FakeClusterBuilder(object):
+
+    def __init__(self):
+        self.deleted = []
+
+    def delete(self, cluster):
+        self.deleted.append(cluster.name)
+
+
+class FakeStackRegistry(object):
+
+    def __init__(self):
+        self.invalidations = 0
+
+    def invalidate(self):
+        self.invalidations += 1
+
+
+class FakeStackBuilder(object):
+
+    def __init__(self):
+        self.stack_registry = FakeStackRegistry()
+
+
+class FakeCluster(object):
+
+    def __init__(self, name):
+        self.name = name
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setattr(CONFIG_DATA, '_data', {'pool_manager': {'reload_workers': 8}})
+    # Not the singleton: a manager of an in-memory registry, without the initial reload
+    pool_manager = PoolManager.__new__(PoolManager)
+    Loggable.__init__(pool_manager)
+    pool_manager.registry = PoolRegistry(mongomock.MongoClient().db.pool_clusters)
+    pool_manager.ClusterBuilder = FakeClusterBuilder()
+    pool_manager.StackBuilder = FakeStackBuilder()
+    pool_manager._clusters = []
+    return pool_manager
+
+
+@pytest.fixture
+def gets(monkeypatch):
+    calls = []
+
+    def get(builder, name):
+        calls.append(name)
+        time.sleep(0.2)
+        if name == 'cluster-missing':
+            raise StackNotFoundException(name)
+        return FakeCluster(name)
+
+    monkeypatch.setattr(OpenshiftClusterBuilder, 'get', get)
+    return calls
+
+
+def add_clusters(manager):
+    for name, state in (('cluster-a', PoolRegistry.STATE_READY), ('cluster-b', PoolRegistry.STATE_CLAIMED),
+                        ('cluster-missing', PoolRegistry.STATE_READY), ('cluster-c', PoolRegistry.STATE_BUILDING)):
+        manager.registry.add(name, '3.9', state=state)
+
+
+def test_lazy_reload(manager, gets):
+    add_clusters(manager)
+    report = manager.reload()
+    assert not report.eager
+    assert report.clusters == 3 and report.resolved == 0 and report.failed == []
+    assert [cluster.name for cluster in manager.clusters] == ['cluster-a', 'cluster-b', 'cluster-missing']
+    assert gets == []
+    assert manager.StackBuilder.stack_registry.invalidations == 1
+
+
+def test_eager_reload(manager, gets):
+    add_clusters(manager)
+    report = manager.reload(eager=True)
+    assert report.eager
+    assert report.clusters == 3 and report.resolved == 2
+    assert report.failed == ['cluster-missing']
+    assert sorted(gets) == ['cluster-a', 'cluster-b', 'cluster-missing']
+    # The clusters are resolved concurrently
+    assert report.elapsed < 0.5
+
+
+def test_delete_cluster_of_the_pool(manager):
+    manager.registry.add('cluster-a', '3.9', state=PoolRegistry.STATE_READY)
+    manager._clusters = [FakeCluster('cluster-a'), FakeCluster('cluster-b')]
+    manager._delete_stack(FakeCluster('cluster-a'))
+    assert manager.ClusterBuilder.deleted == ['cluster-a']
+    assert manager.registry.get('cluster-a') is None
+    assert [cluster.name for cluster in manager.clusters] == ['cluster-b']
+
+
+def test_delete_cluster_without_registry_document(manager):
+    manager._delete_stack(FakeCluster('deployed-by-cli'))
+    assert manager.ClusterBuilder.deleted == ['deployed-by-cli']
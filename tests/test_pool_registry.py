@@ -0,0 +1,114 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import mongomock
+from pymongo import UpdateOne
+
+from openshift_pool.common import NodeType
+from openshift_pool.pool_registry import PoolRegistry, topology_key, topology_node_types
+from openshift_pool.exceptions import InvalidStateTransitionException
+
+
+def _bulk_supported():
+    try:
+        mongomock.MongoClient().db.probe.bulk_write([UpdateOne({'a': 1}, {'$set': {'b': 1}})])
+        return True
+    except TypeError:
+        return False
+
+
+# mongomock 4.3 bulk-writes the operations of pymongo < 4.10 (the pinned pymongo 3.12 runs these tests)
+requires_bulk = pytest.mark.skipif(not _bulk_supported(),
+                                   reason='The installed mongomock does not support the bulk operations of pymongo')
+
+
+class AtomicCollection(object):
+    """A mongomock collection whose calls are serialized, like the single document operations of mongod
+    (mongomock itself is not thread safe)"""
+
+    def __init__(self, collection):
+        self._collection = collection
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+        return call
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient().db
+
+
+@pytest.fixture
+def registry(db):
+    return PoolRegistry(db.pool_clusters)
+
+
+def test_topology_key():
+    node_types = [NodeType.MASTER, NodeType.INFRA, NodeType.COMPUTE]
+    assert topology_key(node_types) == 'master,infra,compute'
+    assert topology_node_types(topology_key(node_types)) == node_types
+
+
+def test_indexes(registry):
+    indexes = registry.db.index_information()
+    assert indexes['name_1']['unique']
+    assert {'state_1', 'version_1', 'owner_1'} <= set(indexes)
+
+
+def test_state_transitions(registry):
+    registry.add('cluster-a', '3.9', 'master,infra,compute')
+    with pytest.raises(InvalidStateTransitionException):
+        registry.transition('cluster-a', PoolRegistry.STATE_CLAIMED)
+    doc = registry.transition('cluster-a', PoolRegistry.STATE_READY)
+    assert doc['state'] == PoolRegistry.STATE_READY and doc['ready_at']
+    assert registry.claim('alice', version='3.10') is None
+    assert registry.claim('alice', version='3.9')['owner'] == 'alice'
+    assert registry.claim('bob', version='3.9') is None
+    assert registry.release('cluster-a')['owner'] is None
+    registry.transition('cluster-a', PoolRegistry.STATE_DELETING)
+    assert registry.find([PoolRegistry.STATE_DELETING])[0]['name'] == 'cluster-a'
+    assert registry.remove('cluster-a') == 1
+    with pytest.raises(InvalidStateTransitionException):
+        registry.transition('cluster-a', PoolRegistry.STATE_READY)
+
+
+def test_concurrent_claims(db):
+    registry = PoolRegistry(AtomicCollection(db.pool_clusters))
+    for i in range(5):
+        registry.add(f'cluster-{i}', '3.9', state=PoolRegistry.STATE_READY)
+    with ThreadPoolExecutor(10) as executor:
+        claimed = list(executor.map(lambda owner: registry.claim(owner, version='3.9'), range(10)))
+    names = [doc['name'] for doc in claimed if doc is not None]
+    assert sorted(names) == [f'cluster-{i}' for i in range(5)]
+    assert registry.count([PoolRegistry.STATE_CLAIMED]) == 5
+
+
+@requires_bulk
+def test_update_many(registry):
+    registry.add('cluster-a', '3.9')
+    registry.add('cluster-b', '3.9')
+    assert registry.update_many({'cluster-a': {'build_time': 1.5}, 'cluster-b': {'build_time': 2.5}}) == 2
+    assert [doc['build_time'] for doc in registry.find()] == [1.5, 2.5]
+
+
+@requires_bulk
+def test_migrate(registry, db):
+    db.pool_manager.insert_one({'clusters': [{'name': 'cluster-a'}, {'name': 'cluster-b'}]})
+    db.warm_pool.insert_one({'name': 'warm-39-abcdef', 'version': '3.9', 'topology': 'master', 'state': 'ready'})
+    registry.add('cluster-b', '3.9', state=PoolRegistry.STATE_CLAIMED, owner='alice')
+    assert registry.migrate(db.pool_manager, db.warm_pool) == 2
+    docs = {doc['name']: doc for doc in registry.find()}
+    assert docs['cluster-a']['state'] == PoolRegistry.STATE_READY
+    assert docs['cluster-b']['owner'] == 'alice'
+    assert docs['warm-39-abcdef']['warm']
+    assert db.pool_manager.count_documents({}) == 0
+    assert registry.migrate(db.pool_manager, db.warm_pool) == 0
@@ -0,0 +1,69 @@
+import time
+import socket
+
+import pytest
+
+from openshift_pool.openshift.probe import ConnectivityProber
+from openshift_pool.openshift.ssh_pool import SSHConnectionPool
+
+
+@pytest.fixture(scope='module')
+def closed_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def test_probe_closed_port(closed_port):
+    prober = ConnectivityProber('root', 'password', port=closed_port, connect_timeout=1, ping=False)
+    results = prober.probe(['127.0.0.1', 'localhost'])
+    assert set(results.keys()) == {'127.0.0.1', 'localhost'}
+    for result in results.values():
+        assert not result.reachable
+        assert not result.tcp
+        assert result.reason.startswith(f'tcp:{closed_port}')
+
+
+def test_probe_is_bounded_by_the_slowest_host():
+    """A silent server accepts TCP but never sends the SSH banner, so each probe hits the timeout"""
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(32)
+    port = server.getsockname()[1]
+    prober = ConnectivityProber('root', 'password', port=port, connect_timeout=1, ping=False,
+                                ssh_pool=SSHConnectionPool())
+    start = time.monotonic()
+    try:
+        results = prober.probe(['127.0.0.1', 'localhost'])
+    finally:
+        server.close()
+    assert time.monotonic() - start < 1.8
+    for result in results.values():
+        assert result.tcp
+        assert not result.reachable
+        assert result.latency is not None
+        assert result.reason
+
+
+class BrokenSSHPool(object):
+
+    def get(self, *args, **kwargs):
+        raise ValueError('unexpected banner')
+
+
+def test_probe_unexpected_error():
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(8)
+    port = server.getsockname()[1]
+    prober = ConnectivityProber('root', 'password', port=port, connect_timeout=1, ping=False,
+                                ssh_pool=BrokenSSHPool())
+    try:
+        results = prober.probe(['127.0.0.1'])
+    finally:
+        server.close()
+    result = results['127.0.0.1']
+    assert result.tcp and not result.ssh and not result.reachable
+    assert result.reason == 'ssh probe failed: ValueError: unexpected banner'
@@ -0,0 +1,48 @@
+from openshift_pool.openshift.readiness import ReadinessWaiter
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def make_probe(ready_at, clock, probed):
+    """Return a probe function that reports each host as ready from the given time"""
+    def probe(hostnames):
+        probed.extend(hostnames)
+        return {hostname: clock() >= ready_at[hostname] for hostname in hostnames}
+    return probe
+
+
+def test_ready_hosts_are_not_probed_again():
+    clock = FakeClock()
+    probed = []
+    ready_at = {'a': 0, 'b': 3, 'c': 10}
+    waiter = ReadinessWaiter(make_probe(ready_at, clock, probed), deadline=60, poll_interval=1,
+                             max_interval=4, jitter=0, clock=clock, sleep=clock.sleep)
+    report = waiter.wait(list(ready_at.keys()), bool)
+    assert report.ready
+    assert report.not_ready == []
+    assert probed.count('a') == 1
+    assert report.converged['a'] == 0
+    assert 3 <= report.converged['b'] < 4
+    assert 10 <= report.converged['c'] < 14
+    # Exponential backoff: 0, 1, 3, 7, 11, 15... rather than a probe every second
+    assert report.attempts['c'] < 10
+
+
+def test_deadline():
+    clock = FakeClock()
+    probed = []
+    waiter = ReadinessWaiter(make_probe({'a': 0, 'b': 1000}, clock, probed), deadline=30, poll_interval=1,
+                             max_interval=8, clock=clock, sleep=clock.sleep)
+    report = waiter.wait(['a', 'b'], bool)
+    assert not report.ready
+    assert report.not_ready == ['b']
+    assert 30 <= report.elapsed < 31
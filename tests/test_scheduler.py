@@ -0,0 +1,115 @@
+import time
+import threading
+
+import pytest
+
+from openshift_pool.scheduler import JobScheduler, ClusterLock, FileSemaphore
+from openshift_pool.exceptions import ClusterLockedException
+
+
+@pytest.fixture
+def lock_dir(tmpdir):
+    return str(tmpdir)
+
+
+def test_cluster_lock(lock_dir):
+    with ClusterLock('cluster-a', lock_dir):
+        with pytest.raises(ClusterLockedException):
+            ClusterLock('cluster-a', lock_dir).acquire()
+        with ClusterLock('cluster-b', lock_dir) as lock_b:
+            assert lock_b.locked
+    with ClusterLock('cluster-a', lock_dir) as lock_a:
+        assert lock_a.locked
+
+
+def test_jobs_run_side_by_side(lock_dir):
+    scheduler = JobScheduler(max_concurrent=4, max_per_tenant=4, lock_dir=lock_dir)
+    barrier = threading.Barrier(4, timeout=5)
+    futures = [scheduler.submit(f'cluster-{i}', barrier.wait, tenant='t') for i in range(4)]
+    assert sorted(f.result(timeout=5) for f in futures) == [0, 1, 2, 3]
+
+
+def test_limits_and_same_cluster_serialization(lock_dir):
+    scheduler = JobScheduler(max_concurrent=3, max_per_tenant=2, lock_dir=lock_dir)
+    lock = threading.Lock()
+    running = {'all': 0, 'max_all': 0, 'a': 0, 'max_a': 0, 'cluster-x': 0, 'max_cluster-x': 0}
+
+    def job(cluster_name, tenant):
+        with lock:
+            for key in ('all', tenant, cluster_name):
+                if key in running:
+                    running[key] += 1
+                    running['max_' + key] = max(running['max_' + key], running[key])
+        time.sleep(0.05)
+        with lock:
+            for key in ('all', tenant, cluster_name):
+                if key in running:
+                    running[key] -= 1
+
+    futures = [scheduler.submit(f'cluster-{i}', job, f'cluster-{i}', 'a', tenant='a') for i in range(4)]
+    futures += [scheduler.submit(f'cluster-b{i}', job, f'cluster-b{i}', 'b', tenant='b') for i in range(3)]
+    futures += [scheduler.submit('cluster-x', job, 'cluster-x', 'c', tenant='c') for i in range(3)]
+    for future in futures:
+        future.result(timeout=10)
+    assert running['max_all'] <= 3
+    assert running['max_a'] <= 2
+    assert running['max_cluster-x'] == 1
+    assert not scheduler.running and not scheduler.queued
+
+
+def test_wait_for_cluster_locked_by_another_process(lock_dir):
+    scheduler = JobScheduler(lock_dir=lock_dir, poll_interval=0.05)
+    other_process_lock = ClusterLock('cluster-a', lock_dir)
+    other_process_lock.acquire()
+    future = scheduler.submit('cluster-a', lambda: 'done')
+    time.sleep(0.3)
+    assert not future.done()
+    other_process_lock.release()
+    assert future.result(timeout=5) == 'done'
+
+
+def test_cluster_lock_wait_timeout(lock_dir):
+    with ClusterLock('cluster-a', lock_dir):
+        start = time.monotonic()
+        with pytest.raises(ClusterLockedException):
+            ClusterLock('cluster-a', lock_dir).acquire(wait=True, timeout=0.2, poll_interval=0.05)
+        assert time.monotonic() - start >= 0.2
+
+
+def test_limits_across_processes(lock_dir):
+    # The schedulers of two processes share the slots of the locks directory
+    schedulers = [JobScheduler(max_concurrent=2, max_per_tenant=2, lock_dir=lock_dir, poll_interval=0.01)
+                  for _ in range(2)]
+    lock = threading.Lock()
+    running = {'now': 0, 'max': 0}
+
+    def job():
+        with lock:
+            running['now'] += 1
+            running['max'] = max(running['max'], running['now'])
+        time.sleep(0.05)
+        with lock:
+            running['now'] -= 1
+
+    futures = [scheduler.submit(f'cluster-{i}-{j}', job, tenant='t')
+               for i, scheduler in enumerate(schedulers) for j in range(3)]
+    for future in futures:
+        future.result(timeout=10)
+    assert running['max'] == 2
+
+
+def test_file_semaphore(lock_dir):
+    semaphore = FileSemaphore('tenant-a', 2, lock_dir, poll_interval=0.01)
+    other = FileSemaphore('tenant-a', 2, lock_dir, poll_interval=0.01)
+    semaphore.acquire()
+    other.acquire()
+    acquired = threading.Event()
+
+    def acquire_third():
+        FileSemaphore('tenant-a', 2, lock_dir, poll_interval=0.01).acquire()
+        acquired.set()
+
+    threading.Thread(target=acquire_third, daemon=True).start()
+    assert not acquired.wait(0.2)
+    semaphore.release()
+    assert acquired.wait(2)
@@ -0,0 +1,105 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from openshift_pool.openshift.ssh_pool import SSHConnectionPool
+from openshift_pool.exceptions import CommandTimeoutException
+from tests.ssh_server import SSHTestServer
+
+
+@pytest.yield_fixture
+def server():
+    ssh_server = SSHTestServer()
+    yield ssh_server
+    ssh_server.close()
+
+
+@pytest.yield_fixture
+def pool():
+    ssh_pool = SSHConnectionPool(keepalive=30, max_channels=2, connect_timeout=5)
+    yield ssh_pool
+    ssh_pool.close()
+
+
+def exec_command(pool, server, command):
+    return pool.exec_command('127.0.0.1', command, user='root', password=server.password, port=server.port)
+
+
+def test_connection_reused(pool, server):
+    for i in range(10):
+        result = exec_command(pool, server, f'echo {i}')
+        assert result.exit_status == 0
+        assert result.stdout == f'echo {i}'
+    assert server.handshakes == 1
+    assert pool.stats['handshakes'] == 1
+    assert pool.stats['reuses'] == 9
+
+
+def test_connections_keyed_by_user(pool, server):
+    pool.exec_command('127.0.0.1', 'id', user='root', password=server.password, port=server.port)
+    pool.exec_command('127.0.0.1', 'id', user='cloud-user', password=server.password, port=server.port)
+    assert server.handshakes == 2
+    assert pool.stats['connections'] == 2
+
+
+def test_reconnect_dead_connection(pool, server):
+    exec_command(pool, server, 'hostname')
+    server.drop_connections()
+    time.sleep(0.2)
+    assert exec_command(pool, server, 'hostname').stdout == 'hostname'
+    assert server.handshakes == 2
+    assert pool.stats['reconnects'] == 1
+
+
+def test_channels_limit_per_host(pool):
+    server = SSHTestServer(command_delay=0.2)
+    try:
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(lambda i: exec_command(pool, server, f'sleep {i}').stdout, range(8)))
+    finally:
+        server.close()
+    assert results == [f'sleep {i}' for i in range(8)]
+    assert server.max_concurrent_commands <= 2
+    assert server.handshakes == 1
+
+
+class EndlessOutputChannel(object):
+    """A channel of a command that never stops printing (e.g. `journalctl -f`)"""
+
+    def __init__(self):
+        self.closed = False
+
+    def exec_command(self, command):
+        pass
+
+    def recv_ready(self):
+        return True
+
+    def recv(self, size):
+        return b'log line\n'
+
+    def recv_stderr_ready(self):
+        return False
+
+    def recv_stderr(self, size):
+        return b''
+
+    def exit_status_ready(self):
+        return False
+
+    def close(self):
+        self.closed = True
+
+
+def test_stream_timeout_of_command_that_keeps_printing(pool, monkeypatch):
+    channel = EndlessOutputChannel()
+    client = type('Client', (), {'get_transport': lambda self: type(
+        'Transport', (), {'open_session': lambda self: channel})()})()
+    monkeypatch.setattr(pool, 'get', lambda *args, **kwargs: client)
+    lines = []
+    start = time.monotonic()
+    with pytest.raises(CommandTimeoutException):
+        pool.stream_command('127.0.0.1', 'journalctl -f', lambda stream, line: lines.append(line), timeout=0.3)
+    assert time.monotonic() - start < 2
+    assert lines and channel.closed
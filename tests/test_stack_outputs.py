@@ -0,0 +1,56 @@
+import pytest
+
+from openshift_pool.openshift.stack_outputs import StackOutputs
+from openshift_pool.openshift.templates import templates
+
+
+RAW_OUTPUTS = [
+    {'output_key': 'ocp_deployment_pqdn', 'output_value': 'a1b2c'},
+    {'output_key': 'ocp-master-0_private_ip', 'output_value': '172.16.0.10'},
+    {'output_key': 'ocp-master-0_public_ip', 'output_value': '10.0.0.10'},
+    {'output_key': 'ocp-master-0_name', 'output_value': 'ocp-master-0.a1b2c.example.com'},
+    {'output_key': 'ocp-master-0_instance_type', 'output_value': 'master'},
+    {'output_key': 'ocp-compute-0_private_ip', 'output_value': '172.16.0.11'},
+    {'output_key': 'ocp-compute-0_public_ip', 'output_value': '10.0.0.11'},
+    {'output_key': 'ocp-compute-0_name', 'output_value': 'ocp-compute-0.a1b2c.example.com'},
+    {'output_key': 'ocp-compute-0_instance_type', 'output_value': 'compute'},
+]
+
+
+@pytest.fixture(scope='module')
+def outputs():
+    return StackOutputs(RAW_OUTPUTS, 'example.com')
+
+
+def test_hosts_indexes(outputs):
+    assert len(outputs.hosts) == 2
+    master = outputs.host('ocp-master-0')
+    assert master.fqdn == 'ocp-master-0.a1b2c.example.com'
+    assert outputs.by_fqdn(master.fqdn) is master
+    assert outputs.by_ip('10.0.0.10') is master
+    assert outputs.by_ip('172.16.0.10') is master
+    assert outputs.by_type('master') == (master, )
+    assert outputs.by_type('infra') == ()
+
+
+def test_hosts_data(outputs):
+    hosts_data = outputs.hosts_data()
+    assert hosts_data == {
+        'host_ips': {'ocp-master-0': '10.0.0.10', 'ocp-compute-0': '10.0.0.11'},
+        'host_private_ips': {'ocp-master-0': '172.16.0.10', 'ocp-compute-0': '172.16.0.11'},
+        'host_names': {'ocp-master-0': 'ocp-master-0.a1b2c.example.com',
+                       'ocp-compute-0': 'ocp-compute-0.a1b2c.example.com'},
+        'ocp_deployment_pqdn': 'a1b2c',
+        'ocp_servers_domain': 'a1b2c.example.com',
+        'instance_types': {'ocp-master-0': 'master', 'ocp-compute-0': 'compute'}
+    }
+    hosts_data['apps_subdomain_ip'] = '10.0.0.10'
+    assert 'apps_subdomain_ip' not in outputs.hosts_data()
+
+
+def test_pre_install_inventory(outputs):
+    inventory = templates.pre_install_inventory.render(**outputs.hosts_data())
+    assert 'ocp-master-0.a1b2c.example.com ansible_host=10.0.0.10' in inventory
+    assert '[rpm_cache]' not in inventory
+    inventory = templates.pre_install_inventory.render(rpm_cache_host='ocp-master-0', **outputs.hosts_data())
+    assert inventory.split('[rpm_cache]')[1].split() == ['ocp-master-0.a1b2c.example.com']
@@ -0,0 +1,53 @@
+from concurrent.futures import wait
+
+from openshift_pool.openshift.stack_poller import StackStatusPoller
+
+
+class FakeStack(object):
+    def __init__(self, stack_name, stack_status):
+        self.stack_name = stack_name
+        self.stack_status = stack_status
+
+
+class FakeStacks(object):
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.calls = 0
+
+    def list(self, filters=None):
+        self.calls += 1
+        # Each listing moves the stacks one step forward
+        stacks = [FakeStack(name, status) for name, status in self.statuses.items() if name in filters['name']]
+        self.statuses = {name: 'CREATE_COMPLETE' for name in self.statuses}
+        return stacks
+
+
+class FakeHeatClient(object):
+    def __init__(self, statuses):
+        self.stacks = FakeStacks(statuses)
+
+
+def test_many_stacks_single_call_per_tick():
+    names = ['stack-{}'.format(i) for i in range(50)]
+    heat_client = FakeHeatClient({name: 'CREATE_IN_PROGRESS' for name in names})
+    poller = StackStatusPoller(heat_client, interval=0.05)
+    changes = []
+
+    def listener(name, old_status, new_status):
+        changes.append((old_status, new_status))
+
+    poller.add_listener(names[0], listener)
+    futures = [poller.watch(name, {'CREATE_COMPLETE', 'CREATE_FAILED'}) for name in names]
+    done, not_done = wait(futures, timeout=5)
+    assert not not_done
+    assert all(f.result() == 'CREATE_COMPLETE' for f in futures)
+    assert heat_client.stacks.calls <= 3
+    assert changes[:2] == [(None, 'CREATE_IN_PROGRESS'), ('CREATE_IN_PROGRESS', 'CREATE_COMPLETE')]
+    poller.remove_listener(names[0], listener)
+    assert not poller.watched
+
+
+def test_missing_stack_status():
+    heat_client = FakeHeatClient({})
+    poller = StackStatusPoller(heat_client, interval=0.05)
+    assert poller.watch('deleted-stack', {'DELETE_COMPLETE', None}).result(timeout=5) is None
@@ -0,0 +1,66 @@
+import pytest
+from heatclient.exc import HTTPNotFound
+
+from openshift_pool.openshift.stack_registry import StackRegistry
+
+
+class FakeStack(object):
+    def __init__(self, stack_name):
+        self.stack_name = stack_name
+
+
+class FakeStacks(object):
+    def __init__(self, names):
+        self.names = set(names)
+        self.list_calls = 0
+        self.get_calls = 0
+
+    def list(self):
+        self.list_calls += 1
+        return [FakeStack(name) for name in self.names]
+
+    def get(self, name):
+        self.get_calls += 1
+        if name not in self.names:
+            raise HTTPNotFound()
+        return FakeStack(name)
+
+
+class FakeHeatClient(object):
+    def __init__(self, names):
+        self.stacks = FakeStacks(names)
+
+
+@pytest.fixture
+def heat_client():
+    return FakeHeatClient(['stack-{}'.format(i) for i in range(100)])
+
+
+def test_single_listing_for_many_lookups(heat_client):
+    registry = StackRegistry(heat_client, ttl=60)
+    for i in range(100):
+        assert registry.get('stack-{}'.format(i)).stack_name == 'stack-{}'.format(i)
+    assert registry.get('no-such-stack') is None
+    assert heat_client.stacks.list_calls == 1
+    assert registry.stats['misses'] == 1
+    assert registry.stats['hits'] == 100
+
+
+def test_expired_listing_is_refreshed(heat_client):
+    registry = StackRegistry(heat_client, ttl=0)
+    registry.get('stack-1')
+    registry.get('stack-1')
+    assert heat_client.stacks.list_calls == 2
+
+
+def test_invalidated_entry_is_fetched_by_get(heat_client):
+    registry = StackRegistry(heat_client, ttl=60)
+    assert registry.get('new-stack') is None
+    heat_client.stacks.names.add('new-stack')
+    registry.invalidate('new-stack')
+    assert registry.get('new-stack').stack_name == 'new-stack'
+    assert heat_client.stacks.list_calls == 1
+    assert heat_client.stacks.get_calls == 1
+    heat_client.stacks.names.remove('new-stack')
+    registry.invalidate('new-stack')
+    assert registry.get('new-stack') is None
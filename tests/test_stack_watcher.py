@@ -0,0 +1,79 @@
+from openshift_pool.openshift.stack_watcher import StackWatcher
+
+
+STACK_NAME = 'test-stack'
+
+
+class FakeEvent(object):
+    def __init__(self, event_id, resource_name, resource_status, event_time, reason=''):
+        self.id = event_id
+        self.resource_name = resource_name
+        self.resource_status = resource_status
+        self.resource_status_reason = reason
+        self.event_time = event_time
+
+
+class FakeEvents(object):
+    def __init__(self, events):
+        self._events = events
+        self.markers = []
+
+    def list(self, stack_id, marker=None, limit=None, sort_dir='asc'):
+        if sort_dir == 'desc':
+            return list(reversed(self._events))[:limit]
+        self.markers.append(marker)
+        ids = [e.id for e in self._events]
+        start = ids.index(marker) + 1 if marker else 0
+        return self._events[start:start + limit]
+
+
+class FakeHeatClient(object):
+    def __init__(self, events):
+        self.events = FakeEvents(events)
+
+
+def test_create_failed_fast():
+    heat_client = FakeHeatClient([
+        FakeEvent('1', STACK_NAME, 'CREATE_IN_PROGRESS', '2018-03-01T10:00:00Z'),
+        FakeEvent('2', 'private_net', 'CREATE_IN_PROGRESS', '2018-03-01T10:00:01Z'),
+        FakeEvent('3', 'private_net', 'CREATE_COMPLETE', '2018-03-01T10:00:04Z'),
+        FakeEvent('4', 'master', 'CREATE_IN_PROGRESS', '2018-03-01T10:00:05Z'),
+        FakeEvent('5', 'master', 'CREATE_FAILED', '2018-03-01T10:00:35Z', 'No valid host was found'),
+        FakeEvent('6', STACK_NAME, 'CREATE_FAILED', '2018-03-01T10:00:35Z', 'Resource CREATE failed'),
+    ])
+    result = StackWatcher(heat_client, STACK_NAME, 'abc').wait('CREATE', timeout=3600, delay=0)
+    assert result.status == 'CREATE_FAILED'
+    assert result.failed_resources == {'master': 'No valid host was found'}
+    assert [(t.resource_name, t.duration) for t in result.timings] == [('master', 30), ('private_net', 3)]
+    assert result.elapsed < 1
+
+
+def test_events_are_fetched_incrementally():
+    events = [FakeEvent(str(i), f'port_{i}', 'CREATE_IN_PROGRESS', '2018-03-01T10:00:00Z') for i in range(250)]
+    heat_client = FakeHeatClient(events)
+    watcher = StackWatcher(heat_client, STACK_NAME, 'abc')
+    assert len(watcher.fetch_events()) == 250
+    assert heat_client.events.markers == [None, '99', '199']
+    events.append(FakeEvent('250', STACK_NAME, 'CREATE_COMPLETE', '2018-03-01T10:01:00Z'))
+    assert [e.id for e in watcher.fetch_events()] == ['250']
+    assert watcher.wait('CREATE', timeout=0).status == 'CREATE_COMPLETE'
+
+
+def test_seed_skips_the_earlier_events():
+    events = [
+        FakeEvent('1', STACK_NAME, 'DELETE_IN_PROGRESS', '2018-03-01T10:00:00Z'),
+        FakeEvent('2', 'master', 'DELETE_FAILED', '2018-03-01T10:00:10Z', 'Volume in use'),
+        FakeEvent('3', STACK_NAME, 'DELETE_FAILED', '2018-03-01T10:00:10Z', 'Resource DELETE failed'),
+    ]
+    heat_client = FakeHeatClient(events)
+    watcher = StackWatcher(heat_client, STACK_NAME, 'abc')
+    watcher.seed()
+    assert watcher.wait('DELETE', timeout=0).status is None
+    events.extend([
+        FakeEvent('4', STACK_NAME, 'DELETE_IN_PROGRESS', '2018-03-01T11:00:00Z'),
+        FakeEvent('5', STACK_NAME, 'DELETE_COMPLETE', '2018-03-01T11:00:20Z'),
+    ])
+    result = watcher.wait('DELETE', timeout=0)
+    assert result.status == 'DELETE_COMPLETE'
+    assert result.failed_resources == {}
+    assert heat_client.events.markers[0] == '3'
@@ -0,0 +1,27 @@
+import os
+import sys
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('ansible', 'heatclient', 'keystoneclient', 'keystoneauth1', 'novaclient', 'glanceclient',
+                 'paramiko', 'pymongo', 'bson', 'yaml', 'jinja2')
+
+
+def run(code, workspace):
+    return subprocess.run([sys.executable, '-c', code], cwd=ROOT_DIR, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, env=dict(os.environ, WORKSPACE=str(workspace)))
+
+
+def test_cli_startup_does_not_import_heavy_dependencies(tmpdir):
+    result = run('import sys, cli; print(" ".join(sys.modules))', tmpdir)
+    assert result.returncode == 0, result.stderr.decode()
+    imported = {name.split('.')[0] for name in result.stdout.decode().split()}
+    assert not imported & set(HEAVY_MODULES)
+
+
+def test_cli_help_without_config_parsing(tmpdir):
+    result = subprocess.run([sys.executable, 'cli.py', '--help'], cwd=ROOT_DIR, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, env=dict(os.environ, WORKSPACE=str(tmpdir)))
+    assert result.returncode == 0, result.stderr.decode()
+    assert b'stats' in result.stdout
+    assert not os.path.exists(os.path.join(str(tmpdir), 'main_log.log'))
@@ -0,0 +1,26 @@
+import os
+
+import pytest
+
+from openshift_pool.openshift.templates import TemplateRegistry, TEMPLATES_DIR, templates
+
+
+def test_templates_api():
+    assert 'ocp_stack' in templates
+    assert set(templates.keys()) >= {'ocp_stack', 'pre_install_inventory', 'install_inventory'}
+    assert templates.pre_install_inventory is templates['pre_install_inventory']
+    with pytest.raises(AttributeError):
+        templates.no_such_template
+    with pytest.raises(KeyError):
+        templates['no_such_template']
+
+
+def test_lazy_compilation_and_bytecode_cache(tmpdir):
+    registry = TemplateRegistry(TEMPLATES_DIR, str(tmpdir))
+    assert registry._environment is None
+    rendered = registry.pre_install_inventory.render(host_names={'a': 'a.example.com'}, host_ips={'a': '10.0.0.1'})
+    assert 'a.example.com ansible_host=10.0.0.1' in rendered
+    assert len(os.listdir(str(tmpdir))) == 1
+    # A new registry (i.e. a new process) loads the cached bytecode
+    assert TemplateRegistry(TEMPLATES_DIR, str(tmpdir)).pre_install_inventory.render(
+        host_names={'a': 'a.example.com'}, host_ips={'a': '10.0.0.1'}) == rendered
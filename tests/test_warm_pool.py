@@ -0,0 +1,107 @@
+import os
+import socket
+import threading
+import subprocess
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+
+from config import CONFIG_DATA
+from openshift_pool.common import Singleton, NodeType
+from openshift_pool.pool_registry import PoolRegistry, topology_key
+from openshift_pool.openshift.metadata_store import MetadataStore
+from openshift_pool.warm_pool import WarmPool
+from openshift_pool.exceptions import StackCreationFailedException
+
+
+TOPOLOGY = [NodeType.MASTER, NodeType.INFRA, NodeType.COMPUTE]
+
+
+@pytest.yield_fixture
+def pool(monkeypatch, tmpdir):
+    monkeypatch.setattr(CONFIG_DATA, '_data', {'warm_pool': {'max_in_flight': 2, 'build_timeout': 60}})
+    Singleton._instances.pop(WarmPool, None)
+    warm_pool = WarmPool(PoolRegistry(mongomock.MongoClient().db.pool_clusters),
+                         MetadataStore(str(tmpdir.join('metadata.db'))))
+    warm_pool.gate = threading.Event()
+    warm_pool.built = []
+
+    def build(name, version, topology):
+        # Like the pool manager: the document moves to ready (or failed) once the cluster is created
+        warm_pool.gate.wait(5)
+        if name in warm_pool.failing:
+            warm_pool.registry.transition(name, PoolRegistry.STATE_FAILED, error='no quota')
+            raise StackCreationFailedException(name, 'no quota')
+        warm_pool.registry.transition(name, PoolRegistry.STATE_READY)
+        warm_pool.built.append(name)
+
+    warm_pool.failing = set()
+    monkeypatch.setattr(warm_pool, '_build', build)
+    yield warm_pool
+    warm_pool.gate.set()
+    Singleton._instances.pop(WarmPool, None)
+
+
+def states(pool):
+    return sorted(doc['state'] for doc in pool.registry.find(warm=True))
+
+
+def test_replenish_with_max_in_flight(pool):
+    pool.set_target('3.9', TOPOLOGY, 3)
+    assert len(pool.replenish()) == 2
+    assert pool.replenish() == []
+    pool.gate.set()
+    pool.wait()
+    assert len(pool.built) == 3
+    assert states(pool) == ['ready'] * 3
+
+
+def test_claim(pool):
+    pool.set_target('3.9', TOPOLOGY, 1)
+    pool.gate.set()
+    pool.replenish()
+    pool.wait()
+    assert pool.claim('3.10', TOPOLOGY) is None
+    cluster = pool.claim('3.9', TOPOLOGY, owner='user', replenish=False)
+    assert cluster.name == pool.built[0]
+    assert pool.registry.get(cluster.name)['owner'] == 'user'
+    assert [doc['name'] for doc in pool.metadata_store.clusters(owner='user')] == [cluster.name]
+    assert pool.claim('3.9', TOPOLOGY, replenish=False) is None
+    assert pool.stats['hits'] == 1 and pool.stats['misses'] == 2
+
+
+def test_failed_build_frees_its_slot(pool):
+    pool.set_target('3.9', TOPOLOGY, 1)
+    first = pool.replenish()[0]
+    pool.failing.add(first)
+    pool.gate.set()
+    pool.wait()
+    assert pool.registry.get(first)['state'] == PoolRegistry.STATE_FAILED
+    assert len(pool.replenish()) == 1
+    pool.wait()
+    assert states(pool) == ['failed', 'ready']
+
+
+def test_reclaim_build_of_dead_process(pool):
+    process = subprocess.Popen(['true'])
+    process.wait()
+    pool.registry.add('warm-39-dead', '3.9', topology_key(TOPOLOGY), warm=True,
+                      builder={'host': socket.gethostname(), 'pid': process.pid})
+    pool.registry.add('warm-39-alive', '3.9', topology_key(TOPOLOGY), warm=True,
+                      builder={'host': socket.gethostname(), 'pid': os.getppid()})
+    assert pool.reclaim() == ['warm-39-dead']
+    assert pool.registry.get('warm-39-dead')['state'] == PoolRegistry.STATE_FAILED
+
+
+def test_reclaim_timed_out_build(pool):
+    pool.registry.add('warm-39-old', '3.9', topology_key(TOPOLOGY), warm=True,
+                      builder={'host': 'other-host', 'pid': 1})
+    pool.registry.db.update_one({'name': 'warm-39-old'},
+                                {'$set': {'created_at': datetime.now() - timedelta(minutes=5)}})
+    pool.registry.add('warm-39-new', '3.9', topology_key(TOPOLOGY), warm=True,
+                      builder={'host': 'other-host', 'pid': 1})
+    pool.set_target('3.9', TOPOLOGY, 2)
+    # The timed out build is reclaimed, so one slot is free for a new build
+    assert len(pool.replenish()) == 1
+    assert pool.registry.get('warm-39-old')['state'] == PoolRegistry.STATE_FAILED